@@ -1,26 +1,104 @@
+from time import perf_counter
+BOOT_STARTED = perf_counter()  # début du démarrage, pour le détail des temps au boot
+
 import os
-import joblib
 import logging
+import math
+import threading
 import numpy as np
-from flask import Flask, jsonify, request
+import json
+from collections import namedtuple
+from flask import Flask, Response, g, request, stream_with_context
 from datetime import datetime
-from functools import lru_cache
-from flask_swagger_ui import get_swaggerui_blueprint
+from time import time
+
+from batching import MicroBatcher
+from cache import PredictionCache, redis_from_url
+from comparables import ComparablesIndex
+from drift import DriftMonitor, load_reference
+from forest import FeatureQuantizer, FlatForest, interval_stats
+from metrics import Metrics
+from registry import ModelRegistry, RegistryWatcher
+from schema import BOUNDS, FEATURES
+
+IMPORTS_DONE = perf_counter()
 
 # ============================================================
 # 1️⃣ CONFIGURATION
 # ============================================================
 class Config:
     MODEL_PATH = os.getenv('MODEL_PATH', 'model/housing_model.pkl')
+    # Forêt compilée, mappée en mémoire (prioritaire sur le pickle sklearn si présente)
+    FOREST_PATH = os.getenv('FOREST_PATH', 'model/housing_model.forest')
+    # Index k-NN des ventes passées (/comparables), mappé en mémoire
+    COMPARABLES_PATH = os.getenv('COMPARABLES_PATH', 'model/housing_model.comparables')
+    # Esquisses de référence du jeu d'entraînement, pour le suivi de dérive
+    REFERENCE_PATH = os.getenv('REFERENCE_PATH', 'model/housing_model.reference.json')
     MODEL_VERSION = os.getenv('MODEL_VERSION', '1.0.0')
+    # Registre de modèles versionnés (prioritaire sur MODEL_PATH/FOREST_PATH s'il a une version active)
+    MODEL_REGISTRY = os.getenv('MODEL_REGISTRY', 'model/registry')
+    # Période de relecture de CURRENT pour le rechargement à chaud (0 = désactivé)
+    REGISTRY_POLL_SECONDS = float(os.getenv('REGISTRY_POLL_SECONDS', 10))
+
+    # Chauffe : nombre de lignes du lot de prédictions représentatives
+    WARMUP_BATCH_SIZE = int(os.getenv('WARMUP_BATCH_SIZE', 256))
+    # True : le processus répond tout de suite, /health renvoie 503 "warming"
+    # jusqu'à la fin du chargement et de la chauffe (lancés par worker)
+    WARMUP_IN_BACKGROUND = os.getenv('WARMUP_IN_BACKGROUND', 'False').lower() == 'true'
     PORT = int(os.getenv('PORT', 8080))
     DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
 
-    # Limites pour validation
-    SURFACE_MIN = 0
-    SURFACE_MAX = 1000
-    CHAMBRES_MIN = 0
-    CHAMBRES_MAX = 10
+    # Limites pour validation (schema.BOUNDS, partagées avec l'entraînement)
+    SURFACE_MIN, SURFACE_MAX = BOUNDS["surface"]
+    CHAMBRES_MIN, CHAMBRES_MAX = BOUNDS["chambres"]
+    AGE_BIEN_MIN, AGE_BIEN_MAX = BOUNDS["age_bien"]
+    QUARTIER_SCORE_MIN, QUARTIER_SCORE_MAX = BOUNDS["quartier_score"]
+    DISTANCE_CENTRE_MIN, DISTANCE_CENTRE_MAX = BOUNDS["distance_centre"]
+
+    # /predict/batch : renvoyer chaque bien reçu dans la réponse ("input"),
+    # modifiable par requête avec ?echo=false
+    BATCH_ECHO_INPUT = os.getenv('BATCH_ECHO_INPUT', 'True').lower() == 'true'
+
+    # Micro-batching des requêtes /predict concurrentes (utile avec des workers gthread)
+    MICROBATCH_ENABLED = os.getenv('MICROBATCH_ENABLED', 'False').lower() == 'true'
+    MICROBATCH_MAX_SIZE = int(os.getenv('MICROBATCH_MAX_SIZE', 32))
+    MICROBATCH_MAX_WAIT_MS = float(os.getenv('MICROBATCH_MAX_WAIT_MS', 2))
+
+    # Cache des prédictions : L1 en mémoire, L2 Redis si REDIS_URL est défini
+    CACHE_MAXSIZE = int(os.getenv('CACHE_MAXSIZE', 100))
+    CACHE_TTL_SECONDS = float(os.getenv('CACHE_TTL_SECONDS', 3600))
+    CACHE_EVICTION = os.getenv('CACHE_EVICTION', 'lru')
+    REDIS_URL = os.getenv('REDIS_URL', '')
+    REDIS_TTL_SECONDS = int(os.getenv('REDIS_TTL_SECONDS', 86400))
+    # Clés de cache = intervalles entre seuils de split du modèle (résultat exact)
+    CACHE_QUANTIZE = os.getenv('CACHE_QUANTIZE', 'False').lower() == 'true'
+
+    # Serveur ASGI (asgi.py) : pool de threads de prédiction et file bornée
+    ASYNC_WORKERS = int(os.getenv('ASYNC_WORKERS', 4))
+    ASYNC_MAX_PENDING = int(os.getenv('ASYNC_MAX_PENDING', 64))
+
+    # /comparables : nombre de voisins par défaut et maximum, cellules sondées (0 = valeur de l'index)
+    COMPARABLES_K = int(os.getenv('COMPARABLES_K', 5))
+    COMPARABLES_MAX_K = int(os.getenv('COMPARABLES_MAX_K', 50))
+    COMPARABLES_N_PROBE = int(os.getenv('COMPARABLES_N_PROBE', 0))
+
+    # ?interval= sur /predict et /predict/batch : quantiles par défaut (?interval=true) et nombre maximal
+    INTERVAL_QUANTILES = os.getenv('INTERVAL_QUANTILES', '0.05,0.95')
+    INTERVAL_MAX_QUANTILES = int(os.getenv('INTERVAL_MAX_QUANTILES', 9))
+
+    # /predict/stream : nombre de lignes NDJSON prédites par appel au modèle
+    STREAM_CHUNK_SIZE = int(os.getenv('STREAM_CHUNK_SIZE', 1000))
+
+    # Dérive des entrées : histogrammes en ligne des biens prédits, PSI / KS dans /metrics
+    # (publiés à partir de DRIFT_MIN_ROWS valeurs observées par feature). La référence
+    # ne couvre que les biens du train dans les bornes de validation : si le train
+    # en contient peu, ses histogrammes sont grossiers (moins d'intervalles)
+    DRIFT_MONITORING = os.getenv('DRIFT_MONITORING', 'True').lower() == 'true'
+    DRIFT_MIN_ROWS = int(os.getenv('DRIFT_MIN_ROWS', 100))
+
+    # Métriques : répertoire partagé par les workers gunicorn pour l'agrégation
+    METRICS_DIR = os.getenv('METRICS_DIR', '')
+    METRICS_FLUSH_SECONDS = float(os.getenv('METRICS_FLUSH_SECONDS', 5))
 
 
 # ============================================================
@@ -29,20 +107,204 @@ class Config:
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+metrics = Metrics(directory=Config.METRICS_DIR, flush_interval=Config.METRICS_FLUSH_SECONDS)
+STAGE_LABELS = {
+    stage: (("stage", stage),)
+    for stage in ("validation", "cache", "predict", "explain", "comparables", "serialization")
+}
+CACHE_HIT, CACHE_MISS = (("result", "hit"),), (("result", "miss"),)
+
+
+def observe_stage(stage, started):
+    """Enregistre la durée d'une étape démarrée à perf_counter() = started."""
+    metrics.observe("housing_stage_duration_seconds", perf_counter() - started, STAGE_LABELS[stage])
+
+
+# ============================================================
+# 2️⃣ bis SÉRIALISATION JSON RAPIDE
+# ============================================================
+try:
+    import orjson
+
+    def dumps_json(payload):
+        """Sérialise en JSON UTF-8 (bytes) avec orjson, plusieurs fois plus rapide que json."""
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY)
+
+    loads_json = orjson.loads
+except ImportError:
+    def dumps_json(payload):
+        """Sérialise en JSON UTF-8 (bytes) ; repli sur json si orjson n'est pas installé."""
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+
+    loads_json = json.loads
+
+
+def json_response(payload, status=200):
+    """Réponse Flask JSON sans passer par jsonify (ni tri des clés, ni indentation)."""
+    return Response(dumps_json(payload), status=status, mimetype="application/json")
+
+
+_timestamp = (0, "")
+
+
+def utc_timestamp():
+    """
+    Horodatage ISO UTC à la milliseconde, mis en cache : il n'est recalculé
+    qu'une fois par milliseconde quel que soit le nombre de requêtes.
+    """
+    global _timestamp
+    ms = int(time() * 1000)
+    cached = _timestamp
+    if cached[0] != ms:
+        cached = (ms, datetime.utcfromtimestamp(ms / 1000).isoformat(timespec="milliseconds"))
+        _timestamp = cached
+    return cached[1]
+
 
 # ============================================================
 # 3️⃣ CHARGEMENT DU MODÈLE
 # ============================================================
-model = None
+# Modèle en service et tout ce qui en dépend, remplacé d'un bloc lors d'un
+# rechargement : une requête lit `served` une seule fois et garde le même
+# modèle, le même quantificateur et la même version de cache jusqu'au bout.
+ServedModel = namedtuple("ServedModel", ["model", "quantizer", "comparables", "drift", "version", "source",
+                                         "metadata", "loaded_at"])
+
+registry = ModelRegistry(Config.MODEL_REGISTRY)
+served = None
+
+# Biens représentatifs prédits avant la mise en service d'un modèle
+WARMUP_ROWS = np.array([
+    [75, 3, 10, 8, 5.5],
+    [45, 1, 5, 6, 3.5],
+    [150, 4, 20, 9, 1.2],
+    [80, 2, 50, 5, 8.0]
+], dtype=np.float64)
+
+
+def read_model(forest_path, pickle_path):
+    """
+    Charge la forêt compilée si elle existe, sinon le pickle sklearn.
+
+    La forêt compilée ne dépend que de NumPy : sklearn n'est importé (via
+    joblib) que pour le modèle de secours. Ses tableaux sont mappés en
+    mémoire, donc partagés entre tous les workers gunicorn du nœud.
+    """
+    if os.path.exists(forest_path):
+        model = FlatForest.load(forest_path)
+        logger.info(f"✅ Forêt compilée chargée ({model.n_trees} arbres, {model.node_count:,} nœuds)")
+        return model
+
+    import joblib
+    model = joblib.load(pickle_path)
+    # Une ligne par requête : le backend joblib multi-thread coûte plus qu'il ne rapporte
+    if hasattr(model, "n_jobs"):
+        model.set_params(n_jobs=1)
+    logger.info("✅ Modèle chargé avec succès")
+    return model
+
+
+def read_comparables(path):
+    """Index des ventes comparables s'il a été construit, sinon None (/comparables renvoie 503)."""
+    if not os.path.isdir(path):
+        logger.warning(f"⚠️ Index des comparables introuvable : {path}")
+        return None
+    index = ComparablesIndex.load(path)
+    logger.info(f"🏘️ Index des comparables chargé ({index.n_rows:,} ventes, {index.n_lists} cellules)")
+    return index
+
+
+def read_drift_monitor(path, version):
+    """Suivi de dérive sur les esquisses de référence du modèle, sinon None (pas de scores dans /metrics)."""
+    if not Config.DRIFT_MONITORING:
+        return None
+    if not os.path.isfile(path):
+        logger.warning(f"⚠️ Esquisses de référence introuvables : {path}")
+        return None
+    monitor = DriftMonitor(load_reference(path), FEATURES, version, metrics)
+    logger.info(f"📐 Suivi de dérive actif ({len(monitor.reference)} colonnes)")
+    return monitor
 
-def load_model():
-    global model
+
+def warm_up(model, comparables=None):
+    """
+    Prépare un modèle avant sa mise en service : pages des tableaux mappés
+    chargées, puis prédictions représentatives unitaires et par lot, pour
+    que la première vraie requête ne paie ni défauts de page ni
+    initialisation paresseuse (NumPy, sklearn).
+    """
+    if isinstance(model, FlatForest):
+        model.touch()
+    for row in WARMUP_ROWS:
+        model.predict(row[None, :])
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(WARMUP_ROWS), Config.WARMUP_BATCH_SIZE)
+    model.predict(WARMUP_ROWS[picks] * rng.uniform(0.5, 1.5, (len(picks), WARMUP_ROWS.shape[1])))
+    if isinstance(model, FlatForest) and model.contributions is not None:
+        model.explain(WARMUP_ROWS)
+    if comparables is not None:
+        comparables.touch()
+        comparables.query(WARMUP_ROWS, Config.COMPARABLES_K)
+
+
+def build_served_model(version=None, timings=None):
+    """
+    Charge une version du registre (ou, sans version, les fichiers locaux
+    FOREST_PATH / MODEL_PATH), prépare son quantificateur et la chauffe.
+    timings, s'il est fourni, reçoit la durée de chaque phase en ms.
+    """
+    timings = {} if timings is None else timings
+    started = perf_counter()
+    if version is not None:
+        path = registry.path(version)
+        model = read_model(os.path.join(path, ModelRegistry.FOREST), os.path.join(path, ModelRegistry.PICKLE))
+        comparables = read_comparables(os.path.join(path, ModelRegistry.COMPARABLES))
+        reference_path = os.path.join(path, ModelRegistry.REFERENCE)
+        source, metadata = "registry", registry.metadata(version)
+    else:
+        model = read_model(Config.FOREST_PATH, Config.MODEL_PATH)
+        comparables = read_comparables(Config.COMPARABLES_PATH)
+        reference_path = Config.REFERENCE_PATH
+        version, source, metadata = Config.MODEL_VERSION, "local", {}
+    drift = read_drift_monitor(reference_path, version)
+
+    timings["model"] = (perf_counter() - started) * 1000
+
+    started = perf_counter()
+    quantizer = FeatureQuantizer.from_model(model) if Config.CACHE_QUANTIZE else None
+    timings["quantizer"] = (perf_counter() - started) * 1000
+
+    started = perf_counter()
+    warm_up(model, comparables)
+    timings["warmup"] = (perf_counter() - started) * 1000
+    return ServedModel(model, quantizer, comparables, drift, version, source, metadata,
+                       datetime.utcnow().isoformat())
+
+
+def load_model(timings=None):
+    """Charge la version active du registre, sinon le modèle local."""
+    global served
     try:
-        model = joblib.load(Config.MODEL_PATH)
-        logger.info("✅ Modèle chargé avec succès")
+        served = build_served_model(registry.current(), timings)
+        logger.info(f"🏷️ Version en service : {served.version} ({served.source})")
     except Exception as e:
         logger.error(f"❌ Erreur lors du chargement du modèle : {e}")
-        model = None
+        served = None
+
+
+def swap_model(version):
+    """
+    Charge et chauffe une nouvelle version dans le thread de surveillance,
+    puis la met en service par une seule affectation. Les requêtes en cours
+    gardent leur référence à l'ancien modèle jusqu'à leur fin.
+    """
+    global served
+    started = perf_counter()
+    new = build_served_model(version)
+    served = new
+    prediction_cache.set_version(new.version)
+    explanation_cache.set_version(new.version)
+    logger.info(f"🔄 Modèle {new.version} en service (chargé en {perf_counter() - started:.2f} s)")
 
 
 # ============================================================
@@ -50,155 +312,733 @@ def load_model():
 # ============================================================
 app = Flask(__name__)
 logger.info("🚀 Démarrage de l'API...")
-load_model()
+
+batcher = None
+if Config.MICROBATCH_ENABLED:
+    batcher = MicroBatcher(
+        lambda model, X: model.predict(X),
+        max_batch_size=Config.MICROBATCH_MAX_SIZE,
+        max_wait_ms=Config.MICROBATCH_MAX_WAIT_MS
+    )
+    logger.info(f"📦 Micro-batching activé ({Config.MICROBATCH_MAX_SIZE} lignes / {Config.MICROBATCH_MAX_WAIT_MS} ms)")
 
 
 # ============================================================
 # 5️⃣ VALIDATION D’ENTRÉES
 # ============================================================
+
+
+# Schéma des features, dans l'ordre attendu par le modèle : (nom, conversion, min, max, libellé)
+SCHEMA = (
+    ("surface", float, Config.SURFACE_MIN, Config.SURFACE_MAX, "Surface"),
+    ("chambres", int, Config.CHAMBRES_MIN, Config.CHAMBRES_MAX, "Nombre de chambres"),
+    ("age_bien", float, Config.AGE_BIEN_MIN, Config.AGE_BIEN_MAX, "Âge du bien"),
+    ("quartier_score", float, Config.QUARTIER_SCORE_MIN, Config.QUARTIER_SCORE_MAX, "Score de quartier"),
+    ("distance_centre", float, Config.DISTANCE_CENTRE_MIN, Config.DISTANCE_CENTRE_MAX, "Distance au centre"),
+)
+
+
+def compile_schema(schema):
+    """
+    Prépare une fois pour toutes les tables du schéma (noms, conversions,
+    bornes, messages) et retourne parse(data) -> (row, error) : chaque champ
+    est converti une seule fois, row est le tuple typé dans l'ordre du
+    modèle, ou None avec le message d'erreur.
+    """
+    names = tuple(field[0] for field in schema)
+    casts = tuple((name, cast) for name, cast, *_ in schema)
+    bounds = tuple(
+        (low, high, f"{label} hors limites ({low}-{high})")
+        for _, _, low, high, label in schema
+    )
+    missing_messages = {name: f"Champ manquant : '{name}'" for name in names}
+
+    def parse(data):
+        # Un corps JSON valide peut être un nombre, une chaîne ou une liste
+        if not isinstance(data, dict):
+            return None, "Objet JSON attendu"
+        for name in names:
+            if name not in data:
+                return None, missing_messages[name]
+        try:
+            row = tuple([cast(data[name]) for name, cast in casts])
+        except (TypeError, ValueError, OverflowError):
+            # OverflowError : int() d'un infini (1e400, Infinity acceptés par le parseur JSON)
+            return None, "Types de données invalides"
+        if not all(map(math.isfinite, row)):
+            return None, "Types de données invalides"
+        for value, (low, high, message) in zip(row, bounds):
+            if not (low <= value <= high):
+                return None, message
+        return row, None
+
+    return parse
+
+
+parse_input = compile_schema(SCHEMA)
+
+
 def validate_input(data):
     """Vérifie que les entrées sont valides avant prédiction."""
-    required_fields = ["surface", "chambres", "age_bien", "quartier_score", "distance_centre"]
+    row, error = parse_input(data)
+    return row is not None, error
 
-    for field in required_fields:
-        if field not in data:
-            return False, f"Champ manquant : '{field}'"
 
-    try:
-        float(data["surface"])
-        int(data["chambres"])
-        float(data["age_bien"])
-        float(data["quartier_score"])
-        float(data["distance_centre"])
-    except ValueError:
-        return False, "Types de données invalides"
+def validate_batch(items):
+    """
+    Valide une liste de biens en une seule passe.
+
+    Retourne (X, errors) : X est une matrice float64 (n, 5) dans l'ordre de
+    FEATURES, errors associe l'index de chaque ligne invalide à son message.
+    Chaque ligne passe par le même parse_input que /predict : conversions,
+    bornes et messages sont ceux du schéma compilé.
+    """
+    X = np.full((len(items), len(FEATURES)), np.nan)
+    errors = {}
 
-    if not (Config.SURFACE_MIN <= float(data["surface"]) <= Config.SURFACE_MAX):
-        return False, f"Surface hors limites ({Config.SURFACE_MIN}-{Config.SURFACE_MAX})"
-    if not (Config.CHAMBRES_MIN <= int(data["chambres"]) <= Config.CHAMBRES_MAX):
-        return False, f"Nombre de chambres hors limites ({Config.CHAMBRES_MIN}-{Config.CHAMBRES_MAX})"
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors[i] = "Objet JSON attendu pour chaque bien"
+            continue
+        row, error = parse_input(item)
+        if row is None:
+            errors[i] = error
+        else:
+            X[i] = row
 
-    return True, None
+    return X, errors
 
 
 # ============================================================
 # 6️⃣ CACHING DES PRÉDICTIONS
 # ============================================================
-@lru_cache(maxsize=100)
-def predict_cached(surface, chambres, age_bien, quartier_score, distance_centre):
-    """Cache les prédictions pour améliorer les performances"""
-    features = np.array([[surface, chambres, age_bien, quartier_score, distance_centre]])
+prediction_cache = PredictionCache(
+    maxsize=Config.CACHE_MAXSIZE,
+    ttl=Config.CACHE_TTL_SECONDS,
+    eviction=Config.CACHE_EVICTION,
+    redis_client=redis_from_url(Config.REDIS_URL),
+    redis_ttl=Config.REDIS_TTL_SECONDS,
+    version=Config.MODEL_VERSION,
+    namespace="housing:qpred" if Config.CACHE_QUANTIZE else "housing:pred"
+)
+
+# Explications (/explain) : mêmes réglages et même Redis, espace de clés séparé
+explanation_cache = PredictionCache(
+    maxsize=Config.CACHE_MAXSIZE,
+    ttl=Config.CACHE_TTL_SECONDS,
+    eviction=Config.CACHE_EVICTION,
+    redis_client=prediction_cache.redis,
+    redis_ttl=Config.REDIS_TTL_SECONDS,
+    version=Config.MODEL_VERSION,
+    namespace="housing:qexplain" if Config.CACHE_QUANTIZE else "housing:explain"
+)
+
+watcher = None
+if Config.REGISTRY_POLL_SECONDS > 0:
+    watcher = RegistryWatcher(registry, swap_model, interval=Config.REGISTRY_POLL_SECONDS)
+
+
+def predict_row(row, model):
+    """Prédiction d'une ligne de features, via le micro-batching s'il est actif."""
+    if batcher is not None:
+        return batcher.predict(row, model)
+    features = np.array([row])
     return float(model.predict(features)[0])
 
 
-# ============================================================
-# 7️⃣ ENDPOINTS
-# ============================================================
+def parse_interval(value):
+    """
+    Valeur du paramètre ?interval= : retourne (quantiles, erreur).
+    Absent ou false → None (pas d'intervalle) ; true → INTERVAL_QUANTILES ;
+    sinon une liste de quantiles séparés par des virgules (ex. 0.1,0.5,0.9).
+    """
+    if value is None or value.lower() in ("", "0", "false", "no", "non"):
+        return None, None
+    if value.lower() in ("1", "true", "yes", "oui"):
+        value = Config.INTERVAL_QUANTILES
+    try:
+        quantiles = tuple(float(q) for q in value.split(","))
+    except ValueError:
+        return None, "Quantiles invalides (ex. ?interval=0.05,0.95)"
+    if len(quantiles) > Config.INTERVAL_MAX_QUANTILES or not all(0 <= q <= 1 for q in quantiles):
+        return None, f"Au plus {Config.INTERVAL_MAX_QUANTILES} quantiles, compris entre 0 et 1"
+    return quantiles, None
 
-@app.route("/", methods=["GET"])
-def root():
-    """Endpoint racine : infos générales"""
-    return jsonify({
-        "message": "API Housing Price Prediction",
-        "version": Config.MODEL_VERSION,
-        "status": "running",
-        "endpoints": {
-            "health": "/health",
-            "predict": "/predict (POST)",
-            "predict_batch": "/predict/batch (POST)",
-            "model_info": "/model/info",
-            "metrics": "/metrics",
-            "docs": "/docs"
-        },
-        "timestamp": datetime.utcnow().isoformat()
-    })
 
+def predict_interval(model, X, quantiles):
+    """
+    Prédiction avec dispersion entre arbres : (moyenne, écart-type, quantiles).
 
-@app.route("/health", methods=["GET"])
-def health():
-    """Vérifie la santé du modèle"""
-    status = "healthy" if model is not None else "degraded"
-    return jsonify({
-        "status": status,
-        "model_loaded": model is not None,
-        "timestamp": datetime.utcnow().isoformat(),
-        "version": Config.MODEL_VERSION
-    })
+    La forêt compilée collecte les feuilles de tous les arbres en un seul
+    parcours vectorisé ; le modèle sklearn de secours interroge ses arbres
+    un par un.
+    """
+    if isinstance(model, FlatForest):
+        return model.predict_interval(X, quantiles)
+    X = np.asarray(X, dtype=np.float32)
+    return interval_stats(np.stack([tree.predict(X) for tree in model.estimators_]), quantiles)
 
 
-@app.route("/predict", methods=["POST"])
-def predict():
-    """Prédiction pour un seul bien."""
-    if model is None:
-        return jsonify({"error": "Le modèle n’est pas chargé."}), 500
+def interval_payload(std, bounds, quantiles):
+    """Intervalle d'un bien pour la réponse JSON (bounds : une valeur par quantile)."""
+    return {
+        "ecart_type": round(std, 2),
+        "quantiles": {f"{q:g}": round(value, 2) for q, value in zip(quantiles, bounds)}
+    }
+
+
+def predict_cached(surface, chambres, age_bien, quartier_score, distance_centre, current=None):
+    """Cache les prédictions (L1 + L2 Redis) pour améliorer les performances"""
+    current = current or served
+    row = (surface, chambres, age_bien, quartier_score, distance_centre)
+    key = current.quantizer.transform(row) if current.quantizer is not None else row
+
+    started = perf_counter()
+    prix = prediction_cache.get(key, version=current.version)
+    observe_stage("cache", started)
+    if prix is not None:
+        metrics.inc("housing_cache_requests_total", CACHE_HIT)
+        return prix
+    metrics.inc("housing_cache_requests_total", CACHE_MISS)
+
+    started = perf_counter()
+    prix = predict_row(row, current.model)
+    observe_stage("predict", started)
+    prediction_cache.set(key, prix, version=current.version)
+    return prix
+
+
+def predict_items(items, current=None, quantiles=None):
+    """
+    Valide et prédit une liste de biens avec un seul appel au modèle.
+
+    Retourne (prix, errors, intervals) : prix[i] est None pour une ligne
+    invalide, dont le message est dans errors[i]. Avec quantiles,
+    intervals[i] est l'intervalle de chaque ligne valide (sinon intervals
+    est None).
+    """
+    current = current or served
+    started = perf_counter()
+    X, errors = validate_batch(items)
+    valid = np.ones(len(items), dtype=bool)
+    valid[list(errors)] = False
+    observe_stage("validation", started)
+
+    started = perf_counter()
+    prix = [None] * len(items)
+    intervals = None if quantiles is None else [None] * len(items)
+    if valid.any():
+        rows = np.flatnonzero(valid).tolist()
+        if quantiles is None:
+            for i, value in zip(rows, current.model.predict(X[valid]).tolist()):
+                prix[i] = value
+        else:
+            mean, std, bounds = predict_interval(current.model, X[valid], quantiles)
+            for i, value, spread, row_bounds in zip(rows, mean.tolist(), std.tolist(), bounds.T.tolist()):
+                prix[i] = value
+                intervals[i] = interval_payload(spread, row_bounds, quantiles)
+        if current.drift is not None:
+            current.drift.observe_batch(X[valid], [prix[i] for i in rows])
+    observe_stage("predict", started)
+    return prix, errors, intervals
+
+
+def iter_ndjson_chunks(stream, chunk_size):
+    """
+    Lit un flux NDJSON ligne à ligne et produit des lots d'au plus
+    chunk_size biens. Une ligne qui n'est pas du JSON valide est remplacée
+    par None et signalée dans le dictionnaire d'erreurs du lot.
+    """
+    items, parse_errors = [], {}
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            items.append(loads_json(line))
+        except ValueError:
+            parse_errors[len(items)] = "JSON invalide"
+            items.append(None)
+        if len(items) >= chunk_size:
+            yield items, parse_errors
+            items, parse_errors = [], {}
+    if items:
+        yield items, parse_errors
+
+
+def predict_ndjson(stream, chunk_size, current=None):
+    """
+    Générateur de /predict/stream : une ligne de résultat par bien, dans
+    l'ordre d'entrée, émise dès que son lot est prédit. La mémoire utilisée
+    ne dépend que de chunk_size, pas de la taille totale du flux. Tout le
+    flux est prédit par le même modèle, même si une version arrive en cours.
+    """
+    current = current or served
+    index = 0
+    for items, parse_errors in iter_ndjson_chunks(stream, chunk_size):
+        yield predict_ndjson_chunk(items, parse_errors, index, current)
+        index += len(items)
+
+
+def predict_ndjson_chunk(items, parse_errors, index, current):
+    """Prédit un lot de /predict/stream ; retourne ses lignes NDJSON (index à partir de index)."""
+    metrics.observe("housing_batch_size", len(items))
+    prix, errors, _ = predict_items(items, current)
+    errors.update(parse_errors)
+
+    lines = []
+    for i in range(len(items)):
+        if prix[i] is not None:
+            lines.append(dumps_json({"index": index + i, "prix_estime": round(prix[i], 2)}))
+        else:
+            lines.append(dumps_json({"index": index + i, "error": errors[i]}))
+    return b"\n".join(lines) + b"\n"
+
+
+def model_unavailable():
+    """Réponse sans modèle servi : 503 pendant le chargement, 500 s'il a échoué."""
+    if startup["state"] in ("starting", "warming"):
+        return {"error": "Modèle en cours de chargement, réessayez plus tard."}, 503
+    return {"error": "Le modèle n’est pas chargé."}, 500
+
 
-    data = request.get_json()
+def parse_k(value, default):
+    """
+    Nombre de voisins demandé (?k= ou ?comparables=) : retourne (k, erreur).
+    Absent → default ; borné à COMPARABLES_MAX_K.
+    """
+    if value is None or value == "":
+        return default, None
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        return None, "Nombre de comparables invalide"
+    if not 0 <= k <= Config.COMPARABLES_MAX_K:
+        return None, f"Nombre de comparables hors limites (0-{Config.COMPARABLES_MAX_K})"
+    return k, None
+
+
+def predict_one(data, comparables=None, interval=None):
+    """
+    Logique de /predict, indépendante du serveur (Flask ou ASGI).
+    Avec comparables=k (?comparables=k), la réponse contient aussi les k
+    ventes passées les plus proches ; avec interval (?interval=), la
+    dispersion entre arbres (calculée sans passer par le cache).
+    Retourne (payload, code HTTP).
+    """
+    current = served
+    if current is None:
+        return model_unavailable()
     if not data:
-        return jsonify({"error": "Aucune donnée reçue."}), 400
+        return {"error": "Aucune donnée reçue."}, 400
+    k, error_msg = parse_k(comparables, 0)
+    if error_msg is None:
+        quantiles, error_msg = parse_interval(interval)
+    if error_msg is not None:
+        return {"error": error_msg}, 400
 
-    is_valid, error_msg = validate_input(data)
-    if not is_valid:
-        return jsonify({"error": error_msg}), 400
+    started = perf_counter()
+    row, error_msg = parse_input(data)
+    observe_stage("validation", started)
+    if row is None:
+        return {"error": error_msg}, 400
 
     try:
-        prix = predict_cached(
-            float(data["surface"]),
-            int(data["chambres"]),
-            float(data["age_bien"]),
-            float(data["quartier_score"]),
-            float(data["distance_centre"])
-        )
+        if quantiles is None:
+            prix = predict_cached(*row, current=current)
+        else:
+            started = perf_counter()
+            mean, std, bounds = predict_interval(current.model, np.array([row]), quantiles)
+            observe_stage("predict", started)
+            prix = float(mean[0])
+        if current.drift is not None:
+            current.drift.observe_row(row, prix)
 
         logger.info(f"✅ Prédiction réussie : {prix}")
 
-        return jsonify({
+        payload = {
             "prix_estime": round(prix, 2),
-            "timestamp": datetime.utcnow().isoformat(),
-            "model_version": Config.MODEL_VERSION,
+            "timestamp": utc_timestamp(),
+            "model_version": current.version,
             "input": data
-        })
+        }
+        if quantiles is not None:
+            payload["intervalle"] = interval_payload(float(std[0]), bounds[:, 0].tolist(), quantiles)
+        if k and current.comparables is not None:
+            payload["comparables"] = current.comparables.comparables(
+                np.array([row]), k, Config.COMPARABLES_N_PROBE or None
+            )[0]
+        return payload, 200
 
     except Exception as e:
         logger.error(f"Erreur de prédiction : {e}")
-        return jsonify({"error": "Erreur interne de prédiction."}), 500
+        return {"error": "Erreur interne de prédiction."}, 500
 
 
-@app.route('/predict/batch', methods=['POST'])
-def predict_batch():
-    """Prédire pour plusieurs biens à la fois"""
+def parse_echo(value):
+    """Valeur du paramètre ?echo= : None si absent (défaut de Config), sinon booléen."""
+    if value is None:
+        return None
+    return value.lower() not in ("0", "false", "no", "non")
+
+
+def predict_many(data, echo_input=None, interval=None):
+    """
+    Logique de /predict/batch, indépendante du serveur (Flask ou ASGI).
+
+    Toute la liste est validée en une passe puis prédite avec un seul appel
+    à model.predict. Une ligne invalide ne fait pas échouer le lot : elle est
+    renvoyée avec son message d'erreur à sa position. Avec echo_input=False,
+    les biens reçus ne sont pas recopiés dans la réponse (moins à sérialiser).
+    Avec interval (?interval=), chaque prédiction porte la dispersion entre
+    arbres, calculée dans le même parcours de la forêt.
+    """
+    if echo_input is None:
+        echo_input = Config.BATCH_ECHO_INPUT
+    current = served
+    if current is None:
+        return model_unavailable()
+    if not isinstance(data, list):
+        return {'error': 'Attendu : liste de biens'}, 400
+    quantiles, error_msg = parse_interval(interval)
+    if error_msg is not None:
+        return {'error': error_msg}, 400
+
     try:
-        data = request.get_json()
-        if not isinstance(data, list):
-            return jsonify({'error': 'Attendu : liste de biens'}), 400
+        metrics.observe("housing_batch_size", len(data))
+        prix, errors, intervals = predict_items(data, current, quantiles)
 
         predictions = []
-        for item in data:
-            is_valid, error_msg = validate_input(item)
-            if not is_valid:
-                return jsonify({'error': error_msg}), 400
-
-            prix = predict_cached(
-                float(item["surface"]),
-                int(item["chambres"]),
-                float(item["age_bien"]),
-                float(item["quartier_score"]),
-                float(item["distance_centre"])
-            )
-
-            predictions.append({
-                'input': item,
-                'prix_estime': round(prix, 2)
-            })
-
-        return jsonify({
+        for i, item in enumerate(data):
+            if prix[i] is not None:
+                prediction = {'prix_estime': round(prix[i], 2)}
+                if intervals is not None:
+                    prediction['intervalle'] = intervals[i]
+            else:
+                prediction = {'error': errors[i]}
+            if echo_input:
+                prediction['input'] = item
+            predictions.append(prediction)
+
+        return {
             'predictions': predictions,
             'count': len(predictions),
-            'timestamp': datetime.utcnow().isoformat()
-        }), 200
+            'errors': len(errors),
+            'model_version': current.version,
+            'timestamp': utc_timestamp()
+        }, 200
 
     except Exception as e:
         logger.error(f"Erreur batch : {e}")
-        return jsonify({'error': str(e)}), 500
+        return {'error': str(e)}, 500
+
+
+def map_items(data, current, compute, **extra):
+    """
+    Squelette commun de /comparables et /explain : data est un bien ou une
+    liste de biens. Les lignes valides sont traitées en un seul appel
+    compute(X), qui retourne un dictionnaire par ligne ; pour une liste,
+    une ligne invalide est renvoyée avec son message d'erreur à sa position.
+    extra (ex. k) est ajouté à la réponse. Retourne (payload, code HTTP).
+    """
+    single = isinstance(data, dict)
+    items = [data] if single else data
+    if not isinstance(items, list) or not items:
+        return {"error": "Attendu : un bien ou une liste de biens"}, 400
+
+    started = perf_counter()
+    X, errors = validate_batch(items)
+    observe_stage("validation", started)
+    if single and errors:
+        return {"error": errors[0]}, 400
+
+    valid = np.ones(len(items), dtype=bool)
+    valid[list(errors)] = False
+    computed = compute(X[valid]) if valid.any() else []
+    stamp = {**extra, "model_version": current.version, "timestamp": utc_timestamp()}
+
+    if single:
+        return {**computed[0], **stamp}, 200
+
+    results, computed = [], iter(computed)
+    for i in range(len(items)):
+        results.append(next(computed) if i not in errors else {"error": errors[i]})
+    return {"results": results, "count": len(results), "errors": len(errors), **stamp}, 200
+
+
+def find_comparables(data, k=None):
+    """
+    Logique de /comparables, indépendante du serveur (Flask ou ASGI).
+
+    data est un bien ou une liste de biens ; toutes les lignes valides sont
+    cherchées en un seul appel à l'index. Pour une liste, une ligne
+    invalide est renvoyée avec son message d'erreur à sa position.
+    Retourne (payload, code HTTP).
+    """
+    current = served
+    if current is None:
+        return model_unavailable()
+    if current.comparables is None:
+        return {"error": "Index des comparables non disponible pour ce modèle."}, 503
+    k, error_msg = parse_k(k, Config.COMPARABLES_K)
+    if error_msg is not None or k == 0:
+        return {"error": error_msg or "Au moins un comparable attendu"}, 400
+
+    def compute(X):
+        started = perf_counter()
+        found = current.comparables.comparables(X, k, Config.COMPARABLES_N_PROBE or None)
+        observe_stage("comparables", started)
+        return [{"comparables": neighbours} for neighbours in found]
+
+    return map_items(data, current, compute, k=k)
+
+
+def explain_rows(X, current):
+    """
+    Explications (base, contributions par feature) des lignes de X.
+
+    Chaque ligne est d'abord cherchée dans le cache des explications (même
+    clé que le cache des prédictions) ; les manquantes sont expliquées en un
+    seul appel vectorisé, puis mises en cache, et leur prédiction (identique
+    à predict) alimente aussi le cache des prédictions.
+    """
+    keys, values, missing = [], [], []
+    for i, row in enumerate(X.tolist()):
+        key = current.quantizer.transform(row) if current.quantizer is not None else row
+        value = explanation_cache.get(key, version=current.version)
+        keys.append(key)
+        values.append(value)
+        if value is None:
+            missing.append(i)
+
+    if missing:
+        started = perf_counter()
+        prix, base, contributions = current.model.explain(X[missing])
+        observe_stage("explain", started)
+        for i, row_prix, row_contributions in zip(missing, prix.tolist(), contributions.tolist()):
+            values[i] = (row_prix, base, *row_contributions)
+            explanation_cache.set(keys[i], values[i], version=current.version)
+            prediction_cache.set(keys[i], row_prix, version=current.version)
+
+    return [
+        {
+            "prix_estime": round(value[0], 2),
+            "base": round(value[1], 2),
+            "contributions": {name: round(c, 2) for name, c in zip(FEATURES, value[2:])}
+        }
+        for value in values
+    ]
+
+
+def find_explanations(data):
+    """
+    Logique de /explain, indépendante du serveur (Flask ou ASGI).
+
+    Décompose le prix estimé en base (prix moyen du train) + une
+    contribution par feature, à partir des contributions par nœud
+    précalculées à l'entraînement. data est un bien ou une liste de biens ;
+    pour une liste, une ligne invalide est renvoyée avec son message
+    d'erreur à sa position. Retourne (payload, code HTTP).
+    """
+    current = served
+    if current is None:
+        return model_unavailable()
+    if getattr(current.model, "contributions", None) is None:
+        return {"error": "Explications non disponibles pour ce modèle (forêt compilée sans contributions)."}, 503
+
+    return map_items(data, current, lambda X: explain_rows(X, current))
+
+
+def health_status():
+    """
+    Contenu de /health, partagé par les serveurs Flask et ASGI.
+    Retourne (payload, code HTTP) : 503 tant que le modèle n'est pas chauffé.
+    """
+    current = served
+    if startup["state"] in ("starting", "warming"):
+        status = "warming"
+    else:
+        status = "healthy" if current is not None else "degraded"
+    return {
+        "status": status,
+        "model_loaded": current is not None,
+        "timestamp": utc_timestamp(),
+        "version": current.version if current is not None else Config.MODEL_VERSION,
+        "startup_ms": startup["timings_ms"],
+        "cache": prediction_cache.info(),
+        "explanation_cache": explanation_cache.info()
+    }, 503 if status == "warming" else 200
+
+
+def drift_gauges(counters):
+    """Scores de dérive du modèle en service, sur les compteurs agrégés de tous les workers."""
+    current = served
+    if current is None or current.drift is None:
+        return {}
+    return current.drift.gauges(counters, Config.DRIFT_MIN_ROWS)
+
+
+def model_info():
+    """Contenu de /model/info : modèle en service et état du registre."""
+    current = served
+    if current is None:
+        return model_unavailable()
+
+    model = current.model
+    if isinstance(model, FlatForest):
+        structure = {"type": "FlatForest", "n_trees": model.n_trees, "node_count": model.node_count,
+                     "explanations": model.contributions is not None}
+    else:
+        structure = {"type": type(model).__name__, "n_trees": len(getattr(model, "estimators_", []))}
+
+    comparables = current.comparables
+    if comparables is not None:
+        structure["comparables"] = {"n_rows": comparables.n_rows, "n_lists": comparables.n_lists,
+                                    "n_probe": Config.COMPARABLES_N_PROBE or comparables.n_probe}
+    if current.drift is not None:
+        structure["drift"] = {"columns": list(current.drift.reference), "min_rows": Config.DRIFT_MIN_ROWS}
+
+    return {
+        "version": current.version,
+        "source": current.source,
+        "loaded_at": current.loaded_at,
+        "features": FEATURES,
+        **structure,
+        "metadata": current.metadata,
+        "registry": {
+            "path": Config.MODEL_REGISTRY,
+            "current": registry.current(),
+            "versions": registry.versions(),
+            "poll_seconds": Config.REGISTRY_POLL_SECONDS
+        }
+    }, 200
+
+
+# ============================================================
+# 7️⃣ ENDPOINTS
+# ============================================================
+
+@app.before_request
+def start_timer():
+    g.request_started = perf_counter()
+    start_background_tasks()
+
+
+@app.after_request
+def record_request(response):
+    """Compte la requête et sa durée par endpoint, puis flush périodique."""
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    metrics.inc("housing_requests_total", (("endpoint", endpoint), ("status", str(response.status_code))))
+    if "request_started" in g:
+        metrics.observe("housing_request_duration_seconds", perf_counter() - g.request_started, (("endpoint", endpoint),))
+    metrics.maybe_flush()
+    return response
+
+
+def root_info(docs=True):
+    """Contenu de l'endpoint racine ; docs=False pour le serveur ASGI, qui ne sert pas Swagger."""
+    endpoints = {
+        "health": "/health",
+        "predict": "/predict (POST)",
+        "predict_batch": "/predict/batch (POST)",
+        "predict_stream": "/predict/stream (POST, NDJSON)",
+        "comparables": "/comparables (POST, ?k=)",
+        "explain": "/explain (POST)",
+        "model_info": "/model/info",
+        "metrics": "/metrics"
+    }
+    if docs:
+        endpoints["docs"] = "/docs"
+    return {
+        "message": "API Housing Price Prediction",
+        "version": served.version if served is not None else Config.MODEL_VERSION,
+        "status": "running",
+        "endpoints": endpoints,
+        "timestamp": utc_timestamp()
+    }
+
+
+@app.route("/", methods=["GET"])
+def root():
+    """Endpoint racine : infos générales"""
+    return json_response(root_info())
+
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Vérifie la santé du modèle"""
+    payload, status = health_status()
+    return json_response(payload, status)
+
+
+@app.route("/predict", methods=["POST"])
+def predict():
+    """
+    Prédiction pour un seul bien (?comparables=k : avec les k ventes les plus
+    proches ; ?interval=true ou ?interval=0.1,0.9 : avec la dispersion entre arbres).
+    """
+    args = request.args
+    payload, status = predict_one(request.get_json(), args.get("comparables"), args.get("interval"))
+    started = perf_counter()
+    response = json_response(payload, status)
+    observe_stage("serialization", started)
+    return response
+
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    """Prédire pour plusieurs biens à la fois (?echo=false : sans recopier les biens reçus ; ?interval=)"""
+    args = request.args
+    payload, status = predict_many(request.get_json(), parse_echo(args.get("echo")), args.get("interval"))
+    started = perf_counter()
+    response = json_response(payload, status)
+    observe_stage("serialization", started)
+    return response
+
+
+@app.route('/predict/stream', methods=['POST'])
+def predict_stream():
+    """
+    Prédictions en masse au format NDJSON (un bien JSON par ligne).
+
+    Le corps est lu par lots de STREAM_CHUNK_SIZE lignes, chaque lot est
+    prédit en un appel vectorisé, et les résultats sont renvoyés en NDJSON
+    au fil de l'eau : {"index": i, "prix_estime": ...} ou {"index": i, "error": ...}.
+    """
+    current = served
+    if current is None:
+        payload, status = model_unavailable()
+        return json_response(payload, status)
+
+    generator = predict_ndjson(request.stream, Config.STREAM_CHUNK_SIZE, current)
+    return Response(stream_with_context(generator), mimetype="application/x-ndjson")
+
+
+@app.route("/explain", methods=["POST"])
+def explain_endpoint():
+    """Contribution de chaque feature au prix estimé, pour un bien ou une liste de biens."""
+    payload, status = find_explanations(request.get_json())
+    return json_response(payload, status)
+
+
+@app.route("/comparables", methods=["POST"])
+def comparables_endpoint():
+    """Les k ventes passées les plus proches d'un bien ou de chaque bien d'une liste (?k=)."""
+    payload, status = find_comparables(request.get_json(), request.args.get("k"))
+    return json_response(payload, status)
+
+
+@app.route("/model/info", methods=["GET"])
+def model_info_endpoint():
+    """Version en service, structure du modèle, métadonnées d'entraînement et registre."""
+    payload, status = model_info()
+    return json_response(payload, status)
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Métriques au format Prometheus, agrégées sur tous les workers (scores de dérive compris)."""
+    return Response(metrics.render(drift_gauges), mimetype="text/plain; version=0.0.4")
 
 
 # ============================================================
@@ -206,12 +1046,91 @@ def predict_batch():
 # ============================================================
 SWAGGER_URL = '/docs'
 API_URL = '/static/swagger.json'  # Fichier swagger.json à placer dans /static/
-swaggerui_blueprint = get_swaggerui_blueprint(SWAGGER_URL, API_URL)
-app.register_blueprint(swaggerui_blueprint, url_prefix=SWAGGER_URL)
+
+
+class LazyDocs:
+    """
+    Middleware WSGI : flask_swagger_ui n'est importé, et son application
+    construite, qu'à la première requête sur /docs. Les autres chemins vont
+    directement à l'application principale.
+    """
+
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
+        self.docs_app = None
+        self._lock = threading.Lock()
+
+    def _get_docs_app(self):
+        with self._lock:
+            if self.docs_app is None:
+                from flask_swagger_ui import get_swaggerui_blueprint
+                docs_app = Flask("docs")
+                docs_app.register_blueprint(get_swaggerui_blueprint(SWAGGER_URL, API_URL), url_prefix=SWAGGER_URL)
+                self.docs_app = docs_app
+        return self.docs_app
+
+    def __call__(self, environ, start_response):
+        if environ.get("PATH_INFO", "").startswith(SWAGGER_URL):
+            return self._get_docs_app()(environ, start_response)
+        return self.wsgi_app(environ, start_response)
+
+
+app.wsgi_app = LazyDocs(app.wsgi_app)
+
+
+# ============================================================
+# 9️⃣ DÉMARRAGE : CHARGEMENT ET CHAUFFE DU MODÈLE
+# ============================================================
+startup = {"state": "starting", "pid": None, "timings_ms": {}}
+startup_lock = threading.Lock()
+
+
+def initialize():
+    """
+    Charge et chauffe le modèle, puis déclare le processus prêt (/health
+    passe de 503 "warming" à 200) et journalise le détail du démarrage.
+    """
+    startup["state"] = "warming"
+    timings = {"imports": (IMPORTS_DONE - BOOT_STARTED) * 1000}
+    load_model(timings)
+    if served is not None:
+        prediction_cache.set_version(served.version)
+        explanation_cache.set_version(served.version)
+        if watcher is not None:
+            watcher.version = served.version
+        if served.quantizer is not None:
+            logger.info(f"🧮 Quantification du cache : {[len(t) for t in served.quantizer.thresholds]} seuils par feature")
+    timings["total"] = (perf_counter() - BOOT_STARTED) * 1000
+
+    startup["timings_ms"] = {name: round(ms, 1) for name, ms in timings.items()}
+    startup["state"] = "ready" if served is not None else "degraded"
+    logger.info("⏱️ Démarrage : " + " | ".join(f"{name} {ms:.0f} ms" for name, ms in startup["timings_ms"].items()))
+
+
+def start_background_tasks():
+    """
+    À appeler dans chaque processus qui sert des requêtes (worker gunicorn
+    après fork, lifespan ASGI, premier appel Flask) : lance la chauffe en
+    arrière-plan si elle n'a pas eu lieu, et la surveillance du registre.
+    """
+    if startup["state"] in ("starting", "warming") and startup["pid"] != os.getpid():
+        with startup_lock:
+            if startup["state"] in ("starting", "warming") and startup["pid"] != os.getpid():
+                startup["pid"] = os.getpid()
+                threading.Thread(target=initialize, name="warmup", daemon=True).start()
+    if watcher is not None:
+        watcher.ensure_started()
+
+
+if not Config.WARMUP_IN_BACKGROUND:
+    # Chargement bloquant à l'import (dans le master gunicorn avec preload_app)
+    startup["pid"] = os.getpid()
+    initialize()
 
 
 # ============================================================
-# 9️⃣ LANCEMENT
+# 🔟 LANCEMENT
 # ============================================================
 if __name__ == "__main__":
+    start_background_tasks()
     app.run(host="0.0.0.0", port=Config.PORT, debug=Config.DEBUG)
\ No newline at end of file
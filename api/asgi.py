@@ -0,0 +1,188 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.parse import parse_qs
+
+import app as core
+
+# ============================================================
+# SERVEUR ASGI : MÊME CONTRAT QUE L'API FLASK
+# ============================================================
+# Lancement : uvicorn asgi:application --host 0.0.0.0 --port 8080
+# Plusieurs workers : gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:application
+# (avec « uvicorn --workers N », les sockets hérités n'ont pas TCP_NODELAY :
+# chaque réponse prend ~40 ms d'attente Nagle / ACK retardé, mesuré par
+# tests/benchmark.py load)
+#
+# La boucle asyncio ne fait que lire les requêtes et écrire les réponses ;
+# validation et prédiction (predict_one / predict_many de app.py) tournent
+# dans un pool de threads borné. Au-delà de ASYNC_MAX_PENDING requêtes en
+# cours, le serveur répond 503 immédiatement plutôt que d'empiler.
+#
+# Seul Swagger (/docs, /swagger.json) n'est servi que par l'API Flask.
+
+executor = ThreadPoolExecutor(max_workers=core.Config.ASYNC_WORKERS, thread_name_prefix="predict")
+pending = 0
+
+ROUTES = {
+    ("GET", "/"): None,
+    ("GET", "/health"): None,
+    ("GET", "/model/info"): None,
+    ("GET", "/metrics"): None,
+    ("POST", "/predict/stream"): None,
+    ("POST", "/predict"): core.predict_one,
+    ("POST", "/predict/batch"): core.predict_many,
+    ("POST", "/comparables"): core.find_comparables,
+    ("POST", "/explain"): core.find_explanations,
+}
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return body
+
+
+async def send_body(send, body, status, content_type):
+    headers = [(b"content-type", content_type), (b"content-length", str(len(body)).encode())]
+    if status == 503:
+        headers.append((b"retry-after", b"1"))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_json(send, payload, status):
+    await send_body(send, core.dumps_json(payload), status, b"application/json")
+
+
+async def stream_predictions(receive, send):
+    """
+    /predict/stream : le corps NDJSON est lu message par message, chaque lot
+    de STREAM_CHUNK_SIZE lignes est prédit dans le pool de threads et ses
+    résultats sont envoyés aussitôt (more_body). Comme avec Flask, la mémoire
+    ne dépend que de la taille des lots et tout le flux est prédit par le
+    même modèle. Retourne le code HTTP.
+    """
+    current = core.served
+    if current is None:
+        payload, status = core.model_unavailable()
+        await send_json(send, payload, status)
+        return status
+
+    loop = asyncio.get_running_loop()
+    chunk_size = core.Config.STREAM_CHUNK_SIZE
+    await send({"type": "http.response.start", "status": 200,
+                "headers": [(b"content-type", b"application/x-ndjson")]})
+
+    index, lines, tail, more_body = 0, [], b"", True
+    while more_body:
+        message = await receive()
+        more_body = message.get("more_body", False)
+        data = tail + message.get("body", b"")
+        complete = data.split(b"\n")
+        # Dernière ligne incomplète : gardée pour le message suivant
+        tail = complete.pop() if more_body else b""
+        lines += complete
+        if len(lines) < chunk_size and more_body:
+            continue
+        for items, parse_errors in core.iter_ndjson_chunks(lines, chunk_size):
+            body = await loop.run_in_executor(executor, core.predict_ndjson_chunk, items, parse_errors, index, current)
+            index += len(items)
+            await send({"type": "http.response.body", "body": body, "more_body": True})
+        lines = []
+
+    await send({"type": "http.response.body", "body": b"", "more_body": False})
+    return 200
+
+
+async def handle_lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            core.start_background_tasks()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def dispatch(route, scope, receive):
+    """Route la requête et retourne (payload, code HTTP)."""
+    global pending
+
+    if route not in ROUTES:
+        return {"error": "Endpoint introuvable"}, 404
+    if route == ("GET", "/"):
+        return core.root_info(docs=False), 200
+    if route == ("GET", "/health"):
+        return core.health_status()
+    if route == ("GET", "/model/info"):
+        return core.model_info()
+
+    try:
+        data = core.loads_json(await read_body(receive) or b"null")
+    except ValueError:
+        return {"error": "JSON invalide"}, 400
+
+    if pending >= core.Config.ASYNC_MAX_PENDING:
+        return {"error": "Serveur saturé, réessayez plus tard."}, 503
+
+    pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        query = parse_qs(scope.get("query_string", b"").decode())
+        if route == ("POST", "/predict/batch"):
+            args = (data, core.parse_echo(query.get("echo", [None])[0]), query.get("interval", [None])[0])
+        elif route == ("POST", "/predict"):
+            args = (data, query.get("comparables", [None])[0], query.get("interval", [None])[0])
+        elif route == ("POST", "/comparables"):
+            args = (data, query.get("k", [None])[0])
+        else:
+            args = (data,)
+        return await loop.run_in_executor(executor, ROUTES[route], *args)
+    finally:
+        pending -= 1
+
+
+async def serve_stream(receive, send):
+    """/predict/stream sous la même limite ASYNC_MAX_PENDING que les autres prédictions."""
+    global pending
+
+    if pending >= core.Config.ASYNC_MAX_PENDING:
+        await send_json(send, {"error": "Serveur saturé, réessayez plus tard."}, 503)
+        return 503
+    pending += 1
+    try:
+        return await stream_predictions(receive, send)
+    finally:
+        pending -= 1
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await handle_lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    started = perf_counter()
+    route = (scope["method"], scope["path"].rstrip("/") or "/")
+    if route == ("POST", "/predict/stream"):
+        status = await serve_stream(receive, send)
+    elif route == ("GET", "/metrics"):
+        # Lecture des fichiers de tous les workers : hors de la boucle asyncio
+        text = await asyncio.get_running_loop().run_in_executor(executor, core.metrics.render, core.drift_gauges)
+        status = 200
+        await send_body(send, text.encode(), status, b"text/plain; version=0.0.4")
+    else:
+        payload, status = await dispatch(route, scope, receive)
+        await send_json(send, payload, status)
+
+    endpoint = scope["path"] if status != 404 else "unmatched"
+    core.metrics.inc("housing_requests_total", (("endpoint", endpoint), ("status", str(status))))
+    core.metrics.observe("housing_request_duration_seconds", perf_counter() - started, (("endpoint", endpoint),))
+    core.metrics.maybe_flush()
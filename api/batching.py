@@ -0,0 +1,92 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+# ============================================================
+# MICRO-BATCHING DES PRÉDICTIONS UNITAIRES
+# ============================================================
+class MicroBatcher:
+    """
+    Regroupe les prédictions unitaires concurrentes en un seul appel au modèle.
+
+    Chaque requête dépose sa ligne de features dans une file, avec le
+    modèle qui doit la prédire. Un thread dédié vide la file jusqu'à
+    max_batch_size lignes, ou attend au plus max_wait_ms après la première
+    ligne, puis lance un predict_fn(model, X) par modèle présent dans le lot
+    (un seul hors rechargement) et renvoie chaque résultat à son appelant
+    via un Future. Une requête commencée avant une bascule de version est
+    ainsi prédite par l'ancien modèle, comme sans micro-batching.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=32, max_wait_ms=2.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+
+    def _ensure_worker(self):
+        """Démarre le thread de traitement (et le redémarre après un fork)."""
+        if self._worker is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._worker is None or self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._worker = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+                self._worker.start()
+
+    def submit(self, row, model):
+        """Ajoute une ligne de features à prédire par model et retourne son Future."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((row, model, future))
+        return future
+
+    def predict(self, row, model, timeout=None):
+        """Prédiction bloquante d'une ligne via le lot courant."""
+        return self.submit(row, model).result(timeout)
+
+    def _collect(self):
+        """Attend une première ligne puis complète le lot jusqu'à la taille ou au délai max."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups = {}
+            for row, model, future in batch:
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault(id(model), (model, []))[1].append((row, future))
+            for model, pending in groups.values():
+                self._predict_group(model, pending)
+
+    def _predict_group(self, model, pending):
+        rows = np.array([row for row, _ in pending], dtype=np.float64)
+        futures = [future for _, future in pending]
+        try:
+            preds = self.predict_fn(model, rows)
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future, pred in zip(futures, preds):
+            future.set_result(float(pred))
@@ -0,0 +1,160 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# CACHE DE PRÉDICTIONS À DEUX NIVEAUX
+# ============================================================
+def redis_from_url(url):
+    """
+    Crée un client Redis à partir d'une URL, ou None si Redis est indisponible.
+
+    Le module redis n'est importé que si une URL est configurée.
+    """
+    if not url:
+        return None
+    try:
+        import redis
+        client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.2)
+        client.ping()
+        logger.info(f"🗄️ Cache L2 Redis connecté : {url}")
+        return client
+    except Exception as e:
+        logger.warning(f"⚠️ Cache L2 Redis désactivé : {e}")
+        return None
+
+
+class PredictionCache:
+    """
+    Cache de prédictions : L1 en mémoire du processus, L2 Redis partagé.
+
+    - L1 : dictionnaire ordonné borné (maxsize), entrées expirées après
+      ttl secondes, éviction "lru" (la moins récemment lue) ou "fifo".
+    - L2 : tout client exposant get(key) / set(key, value, ex=ttl), par
+      exemple redis.Redis ; une erreur L2 est comptée puis ignorée.
+
+    Les clés contiennent la version du modèle : changer de version via
+    set_version() vide le L1 et rend les entrées L2 de l'ancienne version
+    inaccessibles, sans jamais servir un prix périmé. get/set acceptent
+    aussi une version explicite, pour qu'une requête commencée avec un
+    modèle reste sur son espace de clés pendant un rechargement à chaud.
+
+    Une valeur est un prix (float) ou un tuple de floats (explication :
+    base + contributions), sérialisé "v1,v2,..." dans le L2.
+    """
+
+    EVICTION_POLICIES = ("lru", "fifo")
+
+    def __init__(self, maxsize=100, ttl=3600, eviction="lru", redis_client=None,
+                 redis_ttl=86400, version="1.0.0", namespace="housing:pred"):
+        if eviction not in self.EVICTION_POLICIES:
+            raise ValueError(f"Politique d'éviction inconnue : {eviction}")
+        self.maxsize = int(maxsize)
+        self.ttl = float(ttl)
+        self.eviction = eviction
+        self.redis = redis_client
+        self.redis_ttl = int(redis_ttl)
+        self.namespace = namespace
+        self.version = str(version)
+        self._l1 = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0, "evictions": 0, "l2_errors": 0}
+
+    def _key(self, features, version=None):
+        """Clé normalisée : version du modèle + tuple de features en float."""
+        version = self.version if version is None else version
+        return f"{self.namespace}:{version}:" + "|".join(repr(float(x)) for x in features)
+
+    def set_version(self, version):
+        """Change la version du modèle ; le L1 est vidé si elle diffère."""
+        version = str(version)
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._l1.clear()
+
+    def clear(self):
+        with self._lock:
+            self._l1.clear()
+
+    def get(self, features, version=None):
+        """Retourne la prédiction en cache, ou None."""
+        key = self._key(features, version)
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    if self.eviction == "lru":
+                        self._l1.move_to_end(key)
+                    self.stats["l1_hits"] += 1
+                    return value
+                del self._l1[key]
+
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(key)
+            except Exception:
+                raw = None
+                self._count("l2_errors")
+            if raw is not None:
+                value = self._decode(raw)
+                self._set_l1(key, value)
+                self._count("l2_hits")
+                return value
+
+        self._count("misses")
+        return None
+
+    def set(self, features, value, version=None):
+        key = self._key(features, version)
+        self._set_l1(key, value)
+        if self.redis is not None:
+            try:
+                self.redis.set(key, self._encode(value), ex=self.redis_ttl)
+            except Exception:
+                self._count("l2_errors")
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, (tuple, list)):
+            return ",".join(repr(float(v)) for v in value)
+        return repr(float(value))
+
+    @staticmethod
+    def _decode(raw):
+        text = raw.decode() if isinstance(raw, bytes) else str(raw)
+        if "," in text:
+            return tuple(float(v) for v in text.split(","))
+        return float(text)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _set_l1(self, key, value):
+        with self._lock:
+            self._l1[key] = (time.monotonic() + self.ttl, value)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self.maxsize:
+                self._l1.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def info(self):
+        """Compteurs de hits/misses et taille courante du L1."""
+        hits = self.stats["l1_hits"] + self.stats["l2_hits"]
+        total = hits + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_ratio": round(hits / total, 4) if total else 0.0,
+            "l1_size": len(self._l1),
+            "l1_maxsize": self.maxsize,
+            "l2_enabled": self.redis is not None,
+            "version": self.version
+        }
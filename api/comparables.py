@@ -0,0 +1,191 @@
+import numpy as np
+
+from forest import load_arrays, read_meta, save_arrays, touch_arrays
+
+
+# ============================================================
+# INDEX DES VENTES COMPARABLES (k plus proches voisins)
+# ============================================================
+class ComparablesIndex:
+    """
+    Index IVF (inverted file) des ventes passées, pour trouver les k biens
+    les plus proches d'un bien donné.
+
+    Les features sont standardisées (moyenne / écart-type du jeu nettoyé)
+    puis regroupées en n_lists cellules par k-means. Les points sont triés
+    par cellule et stockés en float32 : une cellule est une tranche contiguë
+    offsets[l]:offsets[l + 1] de points. Une requête ne parcourt que les
+    n_probe cellules dont le centroïde est le plus proche, au lieu de tout
+    le jeu ; avec n_probe >= n_lists la recherche est exacte.
+
+    Comme FlatForest, l'index est un répertoire de .npy mappés en mémoire :
+    tous les workers d'un nœud partagent les mêmes pages.
+    """
+
+    ARRAYS = ("mean", "scale", "centroids", "offsets", "points", "norms", "rows")
+
+    def __init__(self, mean, scale, centroids, offsets, points, norms, rows, columns, n_probe=8):
+        # Vues ndarray des tableaux mappés : mêmes pages, sans le surcoût
+        # de np.memmap à chaque indexation dans la boucle des cellules
+        self.mean = np.asarray(mean)
+        self.scale = np.asarray(scale)
+        self.centroids = np.asarray(centroids)
+        self.offsets = np.asarray(offsets)
+        self.points = np.asarray(points)
+        self.norms = np.asarray(norms)
+        self.rows = np.asarray(rows)
+        self.columns = list(columns)
+        self.n_probe = int(n_probe)
+        self._bounds = self.offsets.tolist()
+        self._centroid_norms = np.einsum("ij,ij->i", self.centroids, self.centroids)
+
+    @property
+    def n_lists(self):
+        return len(self.centroids)
+
+    @property
+    def n_rows(self):
+        return len(self.rows)
+
+    @property
+    def n_features(self):
+        return self.points.shape[1]
+
+    @classmethod
+    def build(cls, X, target, columns, n_lists=None, n_probe=8, seed=0):
+        """
+        Construit l'index sur les features X (n, d) ; target (le prix) et les
+        features brutes sont conservés pour être renvoyés avec chaque voisin.
+        Par défaut n_lists ≈ √n cellules (~√n points par cellule).
+        """
+        from sklearn.cluster import MiniBatchKMeans
+
+        X = np.asarray(X, dtype=np.float64)
+        target = np.asarray(target, dtype=np.float64)
+        mean = X.mean(axis=0)
+        scale = X.std(axis=0)
+        scale[scale == 0] = 1.0
+        Z = ((X - mean) / scale).astype(np.float32)
+
+        n_lists = int(n_lists or np.clip(np.sqrt(len(Z)), 1, 4096))
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, batch_size=4096, n_init=3, random_state=seed).fit(Z)
+        labels = kmeans.labels_
+
+        order = np.argsort(labels, kind="stable")
+        counts = np.bincount(labels, minlength=n_lists)
+        points = np.ascontiguousarray(Z[order])
+        return cls(
+            mean=mean,
+            scale=scale,
+            centroids=kmeans.cluster_centers_.astype(np.float32),
+            offsets=np.concatenate([[0], np.cumsum(counts)]).astype(np.int64),
+            points=points,
+            norms=np.einsum("ij,ij->i", points, points),
+            rows=np.column_stack([X[order], target[order]]),
+            columns=columns,
+            n_probe=n_probe
+        )
+
+    def query(self, X, k=5, n_probe=None):
+        """
+        Cherche les k voisins de chaque ligne de X (n, d) en une passe.
+
+        Les couples (requête, cellule sondée) sont triés par cellule : chaque
+        cellule est lue une seule fois et comparée d'un bloc, par produit
+        matriciel, à toutes les requêtes qui la sondent ; on garde ses k
+        meilleurs points pour chaque couple, puis les k meilleurs de chaque
+        requête sur ses n_probe cellules. Retourne (distances, indices) de
+        forme (n, k), triés par distance croissante ; indice -1 (distance
+        inf) s'il y a moins de k candidats.
+        """
+        Z = ((np.asarray(X, dtype=np.float64) - self.mean) / self.scale).astype(np.float32)
+        if Z.ndim != 2 or Z.shape[1] != self.n_features:
+            raise ValueError(f"X doit avoir la forme (n, {self.n_features})")
+        n_queries = len(Z)
+        if n_queries == 0:
+            return np.empty((0, k), dtype=np.float32), np.empty((0, k), dtype=np.int64)
+        n_probe = max(1, min(n_probe or self.n_probe, self.n_lists))
+
+        # Cellules sondées : les n_probe centroïdes les plus proches. |z|² est
+        # constant pour une requête : il n'est ajouté qu'aux k distances finales
+        to_centroids = self._centroid_norms - 2 * Z @ self.centroids.T
+        if n_probe < self.n_lists:
+            probes = np.argpartition(to_centroids, n_probe - 1, axis=1)[:, :n_probe]
+        else:
+            probes = np.broadcast_to(np.arange(self.n_lists), (n_queries, self.n_lists))
+
+        # Couple p = (requête p // n_probe, p-ième cellule sondée) → ses k meilleurs points
+        dist = np.full((n_queries * n_probe, k), np.inf, dtype=np.float32)
+        index = np.full((n_queries * n_probe, k), -1, dtype=np.int64)
+        cells = probes.ravel()
+        order = np.argsort(cells, kind="stable")
+        cells = cells[order]
+        starts = np.flatnonzero(np.r_[True, cells[1:] != cells[:-1]])
+        ends = np.r_[starts[1:], len(cells)]
+
+        for start, end in zip(starts.tolist(), ends.tolist()):
+            cell = int(cells[start])
+            low, high = self._bounds[cell], self._bounds[cell + 1]
+            if low == high:
+                continue
+            pairs = order[start:end]
+            queries = pairs // n_probe
+            d = self.norms[low:high] - 2 * (Z[queries] @ self.points[low:high].T)
+            if high - low > k:
+                keep = np.argpartition(d, k - 1, axis=1)[:, :k]
+                dist[pairs] = np.take_along_axis(d, keep, axis=1)
+                index[pairs] = keep + low
+            else:
+                dist[pairs, :high - low] = d
+                index[pairs, :high - low] = np.arange(low, high)
+
+        dist = dist.reshape(n_queries, n_probe * k)
+        index = index.reshape(n_queries, n_probe * k)
+        if n_probe > 1:
+            keep = np.argpartition(dist, k - 1, axis=1)[:, :k]
+            dist = np.take_along_axis(dist, keep, axis=1)
+            index = np.take_along_axis(index, keep, axis=1)
+        order = np.argsort(dist, axis=1)
+        # Arrondis du développement |z|² - 2 z·p + |p|² : une distance n'est jamais négative
+        dist = np.take_along_axis(dist, order, axis=1) + np.einsum("ij,ij->i", Z, Z)[:, None]
+        distances = np.sqrt(np.maximum(dist, 0))
+        return distances, np.take_along_axis(index, order, axis=1)
+
+    def comparables(self, X, k=5, n_probe=None):
+        """
+        Voisins de chaque ligne de X sous forme de dictionnaires
+        (features et prix de la vente, distance standardisée).
+        """
+        distances, indices = self.query(X, k, n_probe)
+        results = []
+        for row_dist, row_idx in zip(distances.tolist(), indices.tolist()):
+            neighbours = []
+            for dist, idx in zip(row_dist, row_idx):
+                if idx < 0:
+                    break
+                sale = {name: round(value, 2) for name, value in zip(self.columns, self.rows[idx].tolist())}
+                sale["distance"] = round(dist, 4)
+                neighbours.append(sale)
+            results.append(neighbours)
+        return results
+
+    def touch(self, page_size=4096):
+        """Charge les pages mappées de l'index avant la première requête (voir FlatForest.touch)."""
+        return touch_arrays([getattr(self, name) for name in self.ARRAYS], page_size)
+
+    def save(self, path):
+        """Sauvegarde l'index (un .npy par tableau + meta.json), chaque fichier par renommage atomique."""
+        meta = {
+            "format": 1,
+            "columns": self.columns,
+            "n_rows": self.n_rows,
+            "n_lists": self.n_lists,
+            "n_probe": self.n_probe
+        }
+        save_arrays(path, {name: getattr(self, name) for name in self.ARRAYS}, meta)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """Charge un index sauvegardé par save(), mappé en lecture seule par défaut."""
+        meta = read_meta(path)
+        return cls(columns=meta["columns"], n_probe=meta["n_probe"], **load_arrays(path, cls.ARRAYS, mmap_mode))
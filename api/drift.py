@@ -0,0 +1,162 @@
+import json
+import math
+import os
+from bisect import bisect_right
+
+import numpy as np
+
+DRIFT_COUNTER = "housing_drift_bin_total"
+
+
+# ============================================================
+# ESQUISSES DE RÉFÉRENCE (ENTRAÎNEMENT)
+# ============================================================
+def build_reference(columns, n_bins=20, min_per_bin=10):
+    """
+    Esquisse de référence de chaque colonne : bornes aux quantiles
+    1/n_bins, ..., (n_bins-1)/n_bins des données d'entraînement, et nombre
+    de valeurs par intervalle. Une feature discrète (chambres) a moins
+    d'intervalles : les bornes en double sont fusionnées. Une colonne de
+    peu de valeurs a au plus une borne par min_per_bin valeurs.
+
+    columns : dictionnaire nom → tableau de valeurs. Le résultat tient en
+    quelques centaines de nombres et se sérialise en JSON.
+    """
+    features = {}
+    for name, values in columns.items():
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        bins = max(2, min(n_bins, len(values) // min_per_bin))
+        edges = np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+        counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+        features[name] = {"edges": edges.tolist(), "counts": counts.tolist()}
+    return {"format": 1, "n_bins": n_bins, "features": features}
+
+
+def save_reference(reference, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(reference, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def load_reference(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+# ============================================================
+# SCORES DE DÉRIVE
+# ============================================================
+def psi(reference_counts, live_counts, epsilon=1e-4):
+    """
+    Population Stability Index entre deux histogrammes de mêmes intervalles :
+    Σ (p_live - p_ref) × ln(p_live / p_ref). Usuellement < 0,1 : stable,
+    0,1 à 0,25 : dérive modérée, > 0,25 : dérive forte.
+    """
+    ref_total, live_total = sum(reference_counts), sum(live_counts)
+    score = 0.0
+    for ref, live in zip(reference_counts, live_counts):
+        p_ref = max(ref / ref_total, epsilon)
+        p_live = max(live / live_total, epsilon)
+        score += (p_live - p_ref) * math.log(p_live / p_ref)
+    return score
+
+
+def ks(reference_counts, live_counts):
+    """Statistique de Kolmogorov-Smirnov sur les histogrammes : écart max entre fonctions de répartition."""
+    ref_total, live_total = sum(reference_counts), sum(live_counts)
+    ref_cdf = live_cdf = 0.0
+    score = 0.0
+    for ref, live in zip(reference_counts, live_counts):
+        ref_cdf += ref / ref_total
+        live_cdf += live / live_total
+        score = max(score, abs(live_cdf - ref_cdf))
+    return score
+
+
+# ============================================================
+# ESQUISSES EN LIGNE (API)
+# ============================================================
+class DriftMonitor:
+    """
+    Compare les biens prédits par l'API aux esquisses de référence du modèle.
+
+    Chaque valeur reçue incrémente le compteur de son intervalle
+    (housing_drift_bin_total{feature, bin, version}) dans le registre de
+    métriques : la mémoire est fixe (n_bins compteurs par feature), une
+    ligne coûte un bisect par feature, et les compteurs des workers sont
+    fusionnés par Metrics comme les autres. Les scores PSI / KS sont
+    calculés à la lecture de /metrics sur les compteurs fusionnés, depuis
+    le démarrage ; pour une fenêtre glissante, Prometheus peut recalculer
+    à partir de increase() des compteurs.
+
+    Les prix servis sont comparés à la référence "prix_estime" (prédictions
+    du modèle sur le jeu de test) : les prédictions d'une forêt sont plus
+    resserrées que les prix réels.
+    """
+
+    def __init__(self, reference, features, version, metrics):
+        self.version = str(version)
+        self.metrics = metrics
+        self.features = list(features)
+        sketches = reference["features"]
+        # Colonnes suivies dans l'ordre des lignes reçues, puis le prix estimé ;
+        # les autres esquisses (prix réel des anciennes références) ne sont
+        # jamais observées par l'API et sont ignorées
+        self.columns = [name for name in self.features if name in sketches]
+        self.positions = [self.features.index(name) for name in self.columns]
+        self.target = "prix_estime" if "prix_estime" in sketches else None
+        monitored = self.columns + ([self.target] if self.target else [])
+        self.edges = {name: sketches[name]["edges"] for name in monitored}
+        self.reference = {name: sketches[name]["counts"] for name in monitored}
+        self._labels = {
+            name: [((("feature", name), ("bin", str(i)), ("version", self.version))) for i in range(len(counts))]
+            for name, counts in self.reference.items()
+        }
+
+    def observe_row(self, row, prix=None):
+        """Une ligne (dans l'ordre de features) et son prix estimé : un bisect par colonne."""
+        inc = self.metrics.inc
+        for name, position in zip(self.columns, self.positions):
+            inc(DRIFT_COUNTER, self._labels[name][bisect_right(self.edges[name], row[position])])
+        if prix is not None and self.target is not None:
+            inc(DRIFT_COUNTER, self._labels[self.target][bisect_right(self.edges[self.target], prix)])
+
+    def observe_batch(self, X, prix=None):
+        """Un lot (n, n_features) : un searchsorted et un bincount par colonne."""
+        columns = [(name, X[:, position]) for name, position in zip(self.columns, self.positions)]
+        if prix is not None and self.target is not None:
+            columns.append((self.target, np.asarray(prix, dtype=np.float64)))
+        for name, values in columns:
+            bins = np.searchsorted(self.edges[name], values, side="right")
+            counts = np.bincount(bins, minlength=len(self.reference[name]))
+            for i in np.flatnonzero(counts).tolist():
+                self.metrics.inc(DRIFT_COUNTER, self._labels[name][i], int(counts[i]))
+
+    def live_counts(self, counters):
+        """Histogrammes en ligne de cette version, reconstruits depuis les compteurs agrégés."""
+        live = {name: [0] * len(counts) for name, counts in self.reference.items()}
+        for name, labels_list in self._labels.items():
+            for i, labels in enumerate(labels_list):
+                live[name][i] = counters.get((DRIFT_COUNTER, labels), 0)
+        return live
+
+    def gauges(self, counters, min_rows=100):
+        """
+        Jauges Prometheus (PSI, KS et nombre de valeurs observées par
+        feature) ; les scores ne sont publiés qu'au-delà de min_rows valeurs.
+        """
+        psi_series, ks_series, rows_series = [], [], []
+        for name, live in self.live_counts(counters).items():
+            labels = (("feature", name), ("version", self.version))
+            observed = sum(live)
+            rows_series.append((labels, observed))
+            if observed >= min_rows:
+                psi_series.append((labels, round(psi(self.reference[name], live), 6)))
+                ks_series.append((labels, round(ks(self.reference[name], live), 6)))
+        return {
+            "housing_drift_observed_rows": (rows_series, "Valeurs observées par feature pour le calcul de dérive"),
+            "housing_drift_psi": (psi_series, "Population Stability Index par feature (vs entraînement)"),
+            "housing_drift_ks": (ks_series, "Statistique de Kolmogorov-Smirnov par feature (vs entraînement)"),
+        }
@@ -0,0 +1,394 @@
+import json
+import os
+from bisect import bisect_left
+
+import numpy as np
+
+
+# ============================================================
+# FORÊT COMPILÉE EN TABLEAUX PLATS
+# ============================================================
+class FlatForest:
+    """
+    Forêt aléatoire aplatie dans des tableaux NumPy contigus.
+
+    Tous les arbres d'un RandomForestRegressor sont concaténés dans les mêmes
+    tableaux (feature, threshold, children, value), avec des indices de nœuds
+    globaux ; children[i] = (fils gauche, fils droit) est stocké entrelacé
+    pour qu'un seul accès mémoire donne le nœud suivant. Les feuilles pointent
+    sur elles-mêmes, ce qui permet de parcourir tous les arbres pour tout un
+    lot de lignes en max_depth étapes vectorisées, sans importer sklearn au
+    moment de la prédiction.
+
+    Les sorties sont identiques bit à bit à RandomForestRegressor.predict
+    (n_jobs=1) : les entrées sont converties en float32 comme dans sklearn,
+    et les valeurs des arbres sont sommées dans l'ordre des estimateurs.
+    Avec value_dtype=float32 (profil serving), les valeurs de feuilles
+    prennent deux fois moins de place au prix d'un écart relatif ~1e-7.
+
+    contributions (optionnel, calculé à l'entraînement) donne pour chaque
+    nœud la somme, par feature, des variations de valeur moyenne le long
+    du chemin depuis la racine : c'est ce qui permet d'expliquer une
+    prédiction (explain) sans reparcourir les chemins de décision.
+    """
+
+    ARRAYS = ("feature", "threshold", "children", "value", "roots")
+    OPTIONAL_ARRAYS = ("contributions",)
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, n_features, contributions=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.n_features = int(n_features)
+        self.contributions = contributions
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def node_count(self):
+        return len(self.value)
+
+    @classmethod
+    def from_sklearn(cls, model, value_dtype=np.float64, with_contributions=False):
+        """
+        Aplatit un RandomForestRegressor (ou un arbre de régression) entraîné ;
+        with_contributions=True précalcule aussi les contributions par nœud.
+        """
+        estimators = getattr(model, "estimators_", [model])
+        features, thresholds, children, values, roots = [], [], [], [], []
+        offset = 0
+        max_depth = 0
+
+        for estimator in estimators:
+            tree = estimator.tree_
+            if tree.n_outputs != 1:
+                raise ValueError("Seuls les modèles à une sortie sont supportés")
+
+            nodes = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            feature = np.where(is_leaf, 0, tree.feature)
+            left = np.where(is_leaf, nodes, tree.children_left)
+            right = np.where(is_leaf, nodes, tree.children_right)
+
+            features.append(feature)
+            thresholds.append(tree.threshold)
+            children.append(np.column_stack([left, right]) + offset)
+            values.append(tree.value[:, 0, 0])
+            roots.append(offset)
+
+            offset += tree.node_count
+            max_depth = max(max_depth, tree.max_depth)
+
+        # 2 * nœud + 1 doit tenir dans le type d'index (accès à children à plat)
+        index_dtype = np.int32 if 2 * offset < np.iinfo(np.int32).max else np.int64
+        forest = cls(
+            feature=np.concatenate(features).astype(np.int32),
+            threshold=np.concatenate(thresholds).astype(np.float64),
+            children=np.concatenate(children).astype(index_dtype),
+            value=np.concatenate(values).astype(value_dtype),
+            roots=np.asarray(roots, dtype=index_dtype),
+            max_depth=max_depth,
+            n_features=estimators[0].n_features_in_
+        )
+        if with_contributions:
+            # Calculées sur les valeurs float64 de sklearn, stockées en float32 :
+            # n_features valeurs par nœud, l'écart (~1e-7 relatif) est sans effet
+            # sur une explication et la prédiction reste calculée sur value
+            exact = np.concatenate(values).astype(np.float64)
+            forest.contributions = forest.path_contributions(exact).astype(np.float32)
+        return forest
+
+    def path_contributions(self, value=None):
+        """
+        Contributions par nœud, shape (node_count, n_features), niveau par
+        niveau depuis les racines de tous les arbres à la fois : un fils
+        hérite du vecteur de son parent, et la variation de valeur moyenne
+        (fils - parent) est ajoutée à la feature du split du parent
+        (décomposition de Saabas).
+        """
+        value = np.asarray(self.value if value is None else value, dtype=np.float64)
+        children = np.asarray(self.children)
+        feature = np.asarray(self.feature)
+        contributions = np.zeros((self.node_count, self.n_features), dtype=np.float64)
+
+        nodes = np.asarray(self.roots)
+        while len(nodes):
+            internal = nodes[children[nodes, 0] != nodes]
+            for side in (0, 1):
+                child = children[internal, side]
+                contributions[child] = contributions[internal]
+                contributions[child, feature[internal]] += value[child] - value[internal]
+            nodes = children[internal].ravel()
+        return contributions
+
+    def apply(self, X, block_size=1 << 15):
+        """
+        Retourne l'indice global de la feuille atteinte, shape (n_trees, n_rows).
+
+        Les arbres sont parcourus par blocs d'environ block_size couples
+        (arbre, ligne) : les nœuds d'un bloc d'arbres restent en cache d'un
+        niveau à l'autre, alors qu'un gros lot parcouru sur toute la forêt
+        relit plusieurs Mo de tableaux à chaque niveau. Un petit lot tient
+        dans un seul bloc. Dès que la moitié des couples actifs est arrivée
+        sur une feuille, ils sont retirés du parcours, qui s'arrête quand
+        il n'en reste plus : un bloc ne paie plus max_depth niveaux pour
+        quelques chemins profonds.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"X doit avoir la forme (n, {self.n_features})")
+
+        # Vues NumPy simples (pas de surcoût np.memmap par appel), indices en
+        # intp : np.take n'a pas à les convertir à chaque niveau
+        feature, threshold = np.asarray(self.feature), np.asarray(self.threshold)
+        children = np.asarray(self.children).ravel()
+        values = X.ravel()
+        row_offsets = np.arange(X.shape[0]) * X.shape[1]
+        leaves = np.empty((self.n_trees, X.shape[0]), dtype=children.dtype)
+        trees_per_block = max(1, block_size // max(X.shape[0], 1))
+        for start in range(0, self.n_trees, trees_per_block):
+            roots = np.asarray(self.roots[start:start + trees_per_block], dtype=np.intp)
+            out = leaves[start:start + len(roots)].reshape(-1)
+            node = np.repeat(roots, X.shape[0])
+            offsets = np.tile(row_offsets, len(roots))
+            pairs = np.arange(len(node))
+            for _ in range(self.max_depth):
+                # Même test que sklearn : x <= seuil → gauche, sinon (NaN compris) → droite
+                go_right = ~(np.take(values, offsets + np.take(feature, node)) <= np.take(threshold, node))
+                child = np.take(children, 2 * node + go_right).astype(np.intp)
+                # Les feuilles pointent sur elles-mêmes : un couple immobile est arrivé
+                moving = child != node
+                node = child
+                n_moving = np.count_nonzero(moving)
+                if 2 * n_moving <= len(node):
+                    out[pairs] = node
+                    pairs, offsets, node = pairs[moving], offsets[moving], node[moving]
+                    if not n_moving:
+                        break
+            out[pairs] = node
+        return leaves
+
+    def touch(self, page_size=4096):
+        """
+        Lit un octet par page de chaque tableau : les pages mappées sont
+        chargées avant la première requête plutôt que pendant. Retourne le
+        nombre d'octets parcourus.
+        """
+        return touch_arrays([getattr(self, name) for name in self._saved_arrays()], page_size)
+
+    def split_thresholds(self):
+        """Seuils de split distincts et triés, pour chaque feature."""
+        internal = self.children[:, 0] != np.arange(self.node_count)
+        feature = np.asarray(self.feature)[internal]
+        threshold = np.asarray(self.threshold)[internal]
+        return [np.unique(threshold[feature == f]) for f in range(self.n_features)]
+
+    def tree_predictions(self, X):
+        """Prédiction de chaque arbre, shape (n_trees, n_rows)."""
+        return self.value[self.apply(X)]
+
+    def predict(self, X):
+        """Moyenne des valeurs de feuilles sur tous les arbres (accumulée en float64)."""
+        return tree_mean(self.tree_predictions(X))
+
+    def predict_interval(self, X, quantiles=(0.05, 0.95)):
+        """
+        Prédiction et dispersion entre arbres en un seul parcours de la
+        forêt : retourne (moyenne, écart-type, quantiles), voir interval_stats.
+        """
+        return interval_stats(self.tree_predictions(X), quantiles)
+
+    def explain(self, X):
+        """
+        Décomposition additive de chaque prédiction : retourne
+        (prédiction, base, contributions) avec
+        prédiction ≈ base + contributions.sum(axis=1) (aux arrondis près).
+
+        prédiction est identique à predict ; base est la moyenne des valeurs
+        racines (prix moyen du train) ; contributions (n_rows, n_features)
+        est la moyenne sur les arbres du vecteur précalculé de la feuille
+        atteinte. Un seul parcours de la forêt, puis une lecture de
+        n_features valeurs par arbre et par ligne.
+        """
+        if self.contributions is None:
+            raise ValueError("Contributions non précalculées (from_sklearn(..., with_contributions=True))")
+        leaves = self.apply(X)
+        table = np.asarray(self.contributions)
+        if leaves.size <= 1 << 16:
+            # Petit lot : une seule lecture groupée pour tous les arbres
+            contributions = table[leaves].sum(axis=0, dtype=np.float64)
+        else:
+            # Gros lot : arbre par arbre, la mémoire reste en O(n_rows × n_features)
+            contributions = np.zeros((leaves.shape[1], self.n_features), dtype=np.float64)
+            for tree_leaves in leaves:
+                contributions += table[tree_leaves]
+        contributions /= self.n_trees
+        base = float(np.mean(np.asarray(self.value)[self.roots], dtype=np.float64))
+        return tree_mean(self.value[leaves]), base, contributions
+
+    def _saved_arrays(self):
+        return self.ARRAYS + tuple(name for name in self.OPTIONAL_ARRAYS if getattr(self, name) is not None)
+
+    def save(self, path):
+        """
+        Sauvegarde la forêt dans un répertoire : un .npy non compressé par
+        tableau, plus meta.json.
+
+        Chaque fichier est écrit sous un nom temporaire puis renommé, pour ne
+        jamais modifier les pages déjà mappées par des workers en cours.
+        """
+        meta = {
+            "format": 1,
+            "max_depth": self.max_depth,
+            "n_features": self.n_features,
+            "n_trees": self.n_trees,
+            "node_count": self.node_count,
+            "value_dtype": str(self.value.dtype),
+            "contributions": self.contributions is not None
+        }
+        save_arrays(path, {name: getattr(self, name) for name in self._saved_arrays()}, meta)
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Charge une forêt sauvegardée par save().
+
+        Avec mmap_mode="r" (défaut), les tableaux sont mappés en lecture seule :
+        tous les processus d'un nœud partagent les mêmes pages physiques.
+        """
+        meta = read_meta(path)
+        names = cls.ARRAYS + tuple(name for name in cls.OPTIONAL_ARRAYS if meta.get(name))
+        return cls(
+            max_depth=meta["max_depth"],
+            n_features=meta["n_features"],
+            **load_arrays(path, names, mmap_mode)
+        )
+
+
+# ============================================================
+# RÉPERTOIRES DE TABLEAUX .npy MAPPABLES
+# ============================================================
+# Format commun de FlatForest et de ComparablesIndex : un .npy non
+# compressé par tableau, plus meta.json.
+
+def save_arrays(path, arrays, meta):
+    """
+    Écrit chaque tableau (nom → ndarray) et meta.json dans le répertoire
+    path. Chaque fichier est écrit sous un nom temporaire puis renommé, pour
+    ne jamais modifier les pages déjà mappées par des workers en cours.
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        tmp_path = os.path.join(path, f".{name}.npy.tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, np.ascontiguousarray(array))
+        os.replace(tmp_path, os.path.join(path, f"{name}.npy"))
+
+    tmp_path = os.path.join(path, ".meta.json.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, "meta.json"))
+
+
+def read_meta(path):
+    with open(os.path.join(path, "meta.json")) as f:
+        return json.load(f)
+
+
+def load_arrays(path, names, mmap_mode="r"):
+    """Charge les tableaux names du répertoire path, mappés en lecture seule par défaut."""
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in names}
+
+
+def touch_arrays(arrays, page_size=4096):
+    """
+    Lit un octet par page de chaque tableau : les pages mappées sont
+    chargées avant la première requête plutôt que pendant. Retourne le
+    nombre d'octets parcourus.
+    """
+    total = 0
+    for array in arrays:
+        raw = np.asarray(array).reshape(-1).view(np.uint8)
+        int(raw[::page_size].sum())
+        total += raw.nbytes
+    return total
+
+
+# ============================================================
+# RÉDUCTIONS SUR LES PRÉDICTIONS PAR ARBRE
+# ============================================================
+def tree_mean(leaf_values):
+    """
+    Moyenne des prédictions par arbre (n_trees, n_rows), accumulée en
+    float64 dans l'ordre des arbres comme RandomForestRegressor.predict.
+    """
+    y_hat = np.zeros(leaf_values.shape[1], dtype=np.float64)
+    for tree_values in leaf_values:
+        y_hat += tree_values
+    y_hat /= len(leaf_values)
+    return y_hat
+
+
+def interval_stats(leaf_values, quantiles=(0.05, 0.95)):
+    """
+    Réductions NumPy sur les prédictions par arbre (n_trees, n_rows) :
+    moyenne (identique à predict), écart-type et quantiles entre arbres,
+    de forme (len(quantiles), n_rows).
+
+    C'est la dispersion des arbres autour de l'estimation, une mesure de
+    l'incertitude du modèle, pas un intervalle de confiance calibré sur
+    le prix.
+    """
+    mean = tree_mean(leaf_values)
+    # Une ligne par bien, les arbres contigus : std et tri réduisent l'axe rapide
+    values = np.array(leaf_values.T, dtype=np.float64)
+    std = values.std(axis=1)
+
+    # Quantiles par interpolation linéaire (méthode par défaut de np.quantile)
+    # sur les valeurs triées : un seul tri, sans le surcoût fixe de np.quantile
+    values.sort(axis=1)
+    position = np.asarray(quantiles, dtype=np.float64) * (len(leaf_values) - 1)
+    low = np.floor(position).astype(np.intp)
+    high = np.minimum(low + 1, len(leaf_values) - 1)
+    weight = position - low
+    bounds = values[:, low] * (1 - weight) + values[:, high] * weight
+    return mean, std, bounds.T
+
+
+# ============================================================
+# QUANTIFICATION DES FEATURES SUR LES SEUILS DU MODÈLE
+# ============================================================
+class FeatureQuantizer:
+    """
+    Projette chaque feature sur l'intervalle entre deux seuils de split.
+
+    Un arbre ne compare une feature qu'à ses seuils de split : deux entrées
+    qui tombent dans le même intervalle pour chaque feature prennent les
+    mêmes décisions dans tous les arbres et ont donc exactement la même
+    prédiction. Le tuple d'intervalles sert de clé de cache exacte.
+    """
+
+    def __init__(self, thresholds):
+        self.thresholds = [list(map(float, t)) for t in thresholds]
+
+    @classmethod
+    def from_model(cls, model):
+        """Construit le quantificateur depuis une FlatForest ou un modèle sklearn."""
+        forest = model if isinstance(model, FlatForest) else FlatForest.from_sklearn(model)
+        return cls(forest.split_thresholds())
+
+    def transform(self, row):
+        """
+        Retourne, pour chaque feature, le nombre de seuils strictement
+        inférieurs à la valeur (convertie en float32 comme dans les arbres).
+        """
+        return tuple(
+            bisect_left(thresholds, float(np.float32(x)))
+            for thresholds, x in zip(self.thresholds, row)
+        )
@@ -0,0 +1,33 @@
+import glob
+import os
+
+# ============================================================
+# CONFIGURATION GUNICORN
+# ============================================================
+bind = f"0.0.0.0:{os.getenv('PORT', 8080)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+
+# Le modèle est chargé une seule fois dans le master avant le fork :
+# les workers héritent de ses pages en copy-on-write (et des tableaux
+# mappés en mémoire de la forêt compilée) au lieu de le recharger chacun.
+preload_app = True
+
+# Répertoire où chaque worker dépose ses métriques pour l'agrégation /metrics
+metrics_dir = os.environ.setdefault('METRICS_DIR', '/tmp/housing-metrics')
+
+
+def post_worker_init(worker):
+    """
+    Démarre dans chaque worker la surveillance du registre et, si
+    WARMUP_IN_BACKGROUND est actif, le chargement et la chauffe du modèle.
+    """
+    import app
+    app.start_background_tasks()
+
+
+def on_starting(server):
+    """Repart de compteurs vides à chaque démarrage du master."""
+    os.makedirs(metrics_dir, exist_ok=True)
+    for path in glob.glob(os.path.join(metrics_dir, "metrics_*.json")):
+        os.remove(path)
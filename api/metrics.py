@@ -0,0 +1,201 @@
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+
+# ============================================================
+# MÉTRIQUES PROMETHEUS À FAIBLE SURCOÛT
+# ============================================================
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BATCH_SIZE_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 50000)
+
+# Nom de l'histogramme → (bornes des buckets, description)
+HISTOGRAMS = {
+    "housing_request_duration_seconds": (LATENCY_BUCKETS, "Durée totale des requêtes par endpoint"),
+    "housing_stage_duration_seconds": (LATENCY_BUCKETS, "Durée par étape : validation, cache, predict, serialization"),
+    "housing_batch_size": (BATCH_SIZE_BUCKETS, "Nombre de biens par requête batch"),
+}
+COUNTERS = {
+    "housing_requests_total": "Nombre de requêtes par endpoint et code HTTP",
+    "housing_cache_requests_total": "Lectures du cache de prédictions par résultat (hit/miss)",
+    "housing_drift_bin_total": "Valeurs reçues par intervalle des esquisses de référence (feature, bin, version)",
+}
+
+
+class _Shard:
+    """Compteurs d'un seul thread : mis à jour sans verrou."""
+    __slots__ = ("counters", "histograms")
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+
+class Metrics:
+    """
+    Registre de métriques par worker, agrégé entre workers gunicorn.
+
+    Chaque thread écrit dans son propre shard (pas de verrou sur le chemin
+    chaud : un observe() coûte un bisect et deux additions). Si un
+    répertoire est configuré, chaque worker y écrit périodiquement son
+    instantané (metrics_<pid>.json) et /metrics fusionne tous les fichiers,
+    quel que soit le worker qui reçoit la requête de scrape.
+    """
+
+    def __init__(self, directory="", flush_interval=5.0):
+        self.directory = directory
+        self.flush_interval = float(flush_interval)
+        self._lock = threading.Lock()
+        self._reset()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._local = threading.local()
+        self._shards = []
+        self._last_flush = 0.0
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+        return shard
+
+    def inc(self, name, labels=(), amount=1):
+        """Incrémente un compteur ; labels est un tuple de paires (clé, valeur)."""
+        counters = self._shard().counters
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        """Ajoute une observation à un histogramme déclaré dans HISTOGRAMS."""
+        histograms = self._shard().histograms
+        key = (name, labels)
+        data = histograms.get(key)
+        if data is None:
+            buckets = HISTOGRAMS[name][0]
+            # Un compteur par bucket + le bucket +Inf, puis la somme des valeurs
+            data = histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+        data[bisect_left(HISTOGRAMS[name][0], value)] += 1
+        data[-1] += value
+
+    # ---------- Agrégation ----------
+    def snapshot(self):
+        """Fusionne les shards des threads de ce processus."""
+        counters, histograms = {}, {}
+        for shard in list(self._shards):
+            for key, value in list(shard.counters.items()):
+                counters[key] = counters.get(key, 0) + value
+            for key, data in list(shard.histograms.items()):
+                merged = histograms.setdefault(key, [0] * (len(data) - 1) + [0.0])
+                for i, value in enumerate(data):
+                    merged[i] += value
+        return {"counters": counters, "histograms": histograms}
+
+    def flush(self):
+        """Écrit l'instantané de ce worker dans le répertoire partagé."""
+        if not self.directory:
+            return
+        snap = self.snapshot()
+        payload = {
+            "counters": [[name, labels, value] for (name, labels), value in snap["counters"].items()],
+            "histograms": [[name, labels, data] for (name, labels), data in snap["histograms"].items()],
+        }
+        path = os.path.join(self.directory, f"metrics_{os.getpid()}.json")
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        """Flush au plus une fois par flush_interval (appelé après chaque requête)."""
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def collect(self):
+        """Instantané agrégé sur tous les workers (ou ce processus seul)."""
+        if not self.directory:
+            return self.snapshot()
+
+        self.flush()
+        counters, histograms = {}, {}
+        for path in glob.glob(os.path.join(self.directory, "metrics_*.json")):
+            try:
+                with open(path) as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in payload["counters"]:
+                key = (name, tuple(map(tuple, labels)))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, data in payload["histograms"]:
+                key = (name, tuple(map(tuple, labels)))
+                merged = histograms.setdefault(key, [0] * (len(data) - 1) + [0.0])
+                for i, value in enumerate(data):
+                    merged[i] += value
+        return {"counters": counters, "histograms": histograms}
+
+    # ---------- Exposition ----------
+    def render(self, gauges=None):
+        """
+        Texte au format d'exposition Prometheus, avec des jauges optionnelles :
+        {nom: (valeur, description)}, la valeur pouvant être une liste de
+        séries (labels, valeur). gauges peut aussi être une fonction qui les
+        calcule à partir des compteurs agrégés de tous les workers.
+        """
+        snap = self.collect()
+        if callable(gauges):
+            gauges = gauges(snap["counters"])
+        lines = []
+
+        for name, description in COUNTERS.items():
+            series = sorted((k, v) for k, v in snap["counters"].items() if k[0] == name)
+            if not series:
+                continue
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+            for (_, labels), value in series:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for name, (buckets, description) in HISTOGRAMS.items():
+            series = sorted((k, v) for k, v in snap["histograms"].items() if k[0] == name)
+            if not series:
+                continue
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+            for (_, labels), data in series:
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ["+Inf"], data[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {data[-1]}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+        gauges = dict(gauges or {})
+        hits = snap["counters"].get(("housing_cache_requests_total", (("result", "hit"),)), 0)
+        misses = snap["counters"].get(("housing_cache_requests_total", (("result", "miss"),)), 0)
+        if hits + misses:
+            gauges["housing_cache_hit_ratio"] = (hits / (hits + misses), "Ratio de hits du cache de prédictions")
+
+        for name, (value, description) in gauges.items():
+            series = value if isinstance(value, list) else [((), value)]
+            if not series:
+                continue
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+            lines += [f"{name}{_format_labels(labels)} {v}" for labels, v in series]
+
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
@@ -0,0 +1,180 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================
+# REGISTRE DE MODÈLES SUR DISQUE
+# ============================================================
+class ModelRegistry:
+    """
+    Registre de modèles versionnés sur un système de fichiers partagé.
+
+    Arborescence :
+        <root>/<version>/housing_model.pkl
+        <root>/<version>/housing_model.forest/   (forêt compilée, optionnelle)
+        <root>/<version>/housing_model.comparables/  (index k-NN, optionnel)
+        <root>/<version>/metadata.json
+        <root>/CURRENT                           (version active)
+
+    Une version est préparée dans un répertoire temporaire puis renommée :
+    un lecteur ne voit jamais de version incomplète. CURRENT est remplacé
+    atomiquement (os.replace), c'est le seul fichier que l'API surveille.
+    """
+
+    CURRENT = "CURRENT"
+    METADATA = "metadata.json"
+    PICKLE = "housing_model.pkl"
+    FOREST = "housing_model.forest"
+    COMPARABLES = "housing_model.comparables"
+    REFERENCE = "housing_model.reference.json"
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, version):
+        return os.path.join(self.root, version)
+
+    def current(self):
+        """Version active, ou None si le registre est vide."""
+        try:
+            with open(os.path.join(self.root, self.CURRENT)) as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def versions(self):
+        """Versions publiées, de la plus ancienne à la plus récente."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if not name.startswith(".") and os.path.isfile(os.path.join(self.root, name, self.METADATA))
+        )
+
+    def metadata(self, version):
+        with open(os.path.join(self.path(version), self.METADATA)) as f:
+            return json.load(f)
+
+    def publish(self, model_path, forest_path=None, metadata=None, activate=True, keep=5,
+                comparables_path=None, reference_path=None):
+        """
+        Publie un modèle entraîné (pickle + forêt compilée + index des
+        comparables + esquisses de référence pour la dérive) comme nouvelle
+        version, l'active si activate=True, et ne garde que les keep dernières
+        versions (la version active n'est jamais supprimée).
+        """
+        with open(model_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        version = f"{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{digest[:8]}"
+
+        os.makedirs(self.root, exist_ok=True)
+        staging = os.path.join(self.root, f".staging-{version}")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        shutil.copy2(model_path, os.path.join(staging, self.PICKLE))
+        if forest_path and os.path.isdir(forest_path):
+            shutil.copytree(forest_path, os.path.join(staging, self.FOREST))
+        if comparables_path and os.path.isdir(comparables_path):
+            shutil.copytree(comparables_path, os.path.join(staging, self.COMPARABLES))
+        if reference_path and os.path.isfile(reference_path):
+            shutil.copy2(reference_path, os.path.join(staging, self.REFERENCE))
+
+        meta = {
+            "version": version,
+            "created_at": datetime.utcnow().isoformat(),
+            "sha256": digest,
+            **(metadata or {})
+        }
+        with open(os.path.join(staging, self.METADATA), "w") as f:
+            json.dump(meta, f, indent=2, default=float)
+        os.rename(staging, self.path(version))
+
+        if activate:
+            self.activate(version)
+        self.prune(keep)
+        return version
+
+    def activate(self, version):
+        """Rend version active (publication ou retour arrière) de façon atomique."""
+        if not os.path.isdir(self.path(version)):
+            raise KeyError(f"Version inconnue : {version}")
+        tmp_path = os.path.join(self.root, f".{self.CURRENT}.tmp")
+        with open(tmp_path, "w") as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, self.CURRENT))
+
+    def prune(self, keep=5):
+        """
+        Ne garde que les keep versions les plus récentes, plus la version
+        active si elle est plus ancienne (retour arrière) ; keep=0 garde
+        tout. Les fichiers encore mappés par un worker restent lisibles
+        jusqu'à ce qu'il les libère (sémantique POSIX).
+        """
+        current = self.current()
+        versions = self.versions()
+        recent = set(versions[-keep:]) if keep else set(versions)
+        old = [v for v in versions if v not in recent and v != current]
+        for version in old:
+            shutil.rmtree(self.path(version), ignore_errors=True)
+
+
+# ============================================================
+# SURVEILLANCE DE LA VERSION ACTIVE
+# ============================================================
+class RegistryWatcher:
+    """
+    Thread qui relit CURRENT toutes les interval secondes et appelle
+    on_change(version) quand la version active change.
+
+    Comme MicroBatcher, le thread est démarré paresseusement et redémarré
+    après un fork (gunicorn preload_app) : chaque worker a le sien. Une
+    version dont le chargement échoue n'est pas retentée tant que CURRENT
+    ne change pas de nouveau.
+    """
+
+    def __init__(self, registry, on_change, interval=10.0, version=None):
+        self.registry = registry
+        self.on_change = on_change
+        self.interval = float(interval)
+        self.version = version
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def ensure_started(self):
+        """Démarre le thread de surveillance (et le redémarre après un fork)."""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="registry-watcher", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def check(self):
+        """Un tour de surveillance ; retourne True si une nouvelle version a été chargée."""
+        version = self.registry.current()
+        if version is None or version == self.version:
+            return False
+        previous, self.version = self.version, version
+        try:
+            self.on_change(version)
+            return True
+        except Exception as e:
+            logger.error(f"❌ Échec du chargement de la version {version} (on garde {previous}) : {e}")
+            return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
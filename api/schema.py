@@ -0,0 +1,26 @@
+import numpy as np
+
+# ============================================================
+# FEATURES DU MODÈLE ET BORNES ACCEPTÉES PAR L'API
+# ============================================================
+# Partagé par l'API (validation des entrées) et par l'entraînement, qui
+# construit les esquisses de référence de la dérive sur les seuls biens que
+# l'API accepte.
+FEATURES = ["surface", "chambres", "age_bien", "quartier_score", "distance_centre"]
+
+# Nom → (min, max) inclus ; hors de ces bornes, l'API répond 400
+BOUNDS = {
+    "surface": (0, 1000),
+    "chambres": (0, 10),
+    "age_bien": (0, 200),
+    "quartier_score": (0, 10),
+    "distance_centre": (0, 100),
+}
+
+
+def in_bounds(X):
+    """Masque des lignes de X (n, 5), colonnes dans l'ordre de FEATURES, acceptées par l'API."""
+    X = np.asarray(X, dtype=np.float64)
+    low = np.array([BOUNDS[name][0] for name in FEATURES])
+    high = np.array([BOUNDS[name][1] for name in FEATURES])
+    return ((X >= low) & (X <= high)).all(axis=1)
@@ -0,0 +1,112 @@
+import argparse
+import http.client
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# ======================
+#     BENCHMARK : GUNICORN (SYNC) VS ASGI (UVICORN)
+# ======================
+
+API_DIR = os.path.join(os.path.dirname(__file__), "..", "api")
+
+PAYLOAD = json.dumps({
+    "surface": 75, "chambres": 3, "age_bien": 10, "quartier_score": 8, "distance_centre": 5.5
+})
+
+SERVERS = {
+    "flask-gunicorn": lambda port, workers: [
+        sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+        "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "app:app"
+    ],
+    "asgi-uvicorn": lambda port, workers: [
+        sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "-k", "uvicorn.workers.UvicornWorker",
+        "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "asgi:application"
+    ],
+}
+
+
+def wait_until_ready(port, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/health")
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise TimeoutError(f"Le serveur du port {port} ne répond pas")
+
+
+def run_client(port, n_requests, path, body):
+    """Un client HTTP keep-alive qui enchaîne n_requests requêtes."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    latencies, errors = [], 0
+    for _ in range(n_requests):
+        started = time.perf_counter()
+        conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - started)
+        errors += response.status != 200
+    return latencies, errors
+
+
+def bench(port, concurrency, n_requests, path, body):
+    per_client = max(1, n_requests // concurrency)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda _: run_client(port, per_client, path, body), range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies = np.concatenate([r[0] for r in results]) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": int(sum(r[1] for r in results)),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare le serveur Flask/gunicorn et le serveur ASGI.")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=0, help="0 = /predict, sinon /predict/batch")
+    parser.add_argument("--port", type=int, default=8090)
+    args = parser.parse_args()
+
+    path, body = "/predict", PAYLOAD
+    if args.batch_size:
+        path, body = "/predict/batch", "[" + ",".join([PAYLOAD] * args.batch_size) + "]"
+
+    results = {}
+    for i, (name, command) in enumerate(SERVERS.items()):
+        port = args.port + i
+        print(f"🚀 {name} sur le port {port}...")
+        process = subprocess.Popen(command(port, args.workers), cwd=API_DIR,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_ready(port)
+            bench(port, args.concurrency, args.concurrency * 5, path, body)  # échauffement
+            results[name] = bench(port, args.concurrency, args.requests, path, body)
+        finally:
+            process.terminate()
+            process.wait()
+        print(f"   {results[name]}")
+
+    print("\n📊 Résultats :")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,52 +1,97 @@
 import pandas as pd
 import os
+import zlib
 import numpy as np
 from datetime import datetime
- 
+
 URL = "https://data.ct.gov/resource/5mzw-sjtu.csv?$limit=500000"
- 
-OUTPUT_DIR = "./data"
+
+# Source configurable : URL HTTP (ex. serveur local de test) ou chemin de fichier CSV
+SOURCE = os.getenv("DATA_URL", URL)
+
+OUTPUT_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 OUTPUT_FILE = os.path.join(OUTPUT_DIR, "housing_data.csv")
- 
-def main():
-    print("📥 Téléchargement des données...")
-    df = pd.read_csv(URL)
-    print(f"✅ Données téléchargées : {len(df):,} lignes")
- 
-    # Nettoyage de base
-    df = df.drop_duplicates().dropna(how="all")
-    df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
- 
-    # --- Création des 6 colonnes du TP ---
- 
+
+# Une partition par année de mise en vente (listyear) : data/raw/listyear=2021.csv
+RAW_DIR = os.path.join(OUTPUT_DIR, "raw")
+PARTITION_COL = "listyear"
+
+
+def build_features(df, seed):
+    """Crée les 6 colonnes du TP ; la graine dépend de la partition pour rester stable."""
+    rng = np.random.RandomState(seed)
+    df = df.copy()
+
     # 1️⃣ Surface : simulation entre 500 et 4000 sqft
-    np.random.seed(42)
-    df["surface"] = np.random.randint(500, 10000, size=len(df))
- 
+    df["surface"] = rng.randint(500, 10000, size=len(df))
+
     # 2️⃣ Chambres : fonction de la surface
-    df["chambres"] = np.random.randint(1, 8, size=len(df))
- 
+    df["chambres"] = rng.randint(1, 8, size=len(df))
+
     # 3️⃣ Age du bien : simulation entre 0 et 100 ans
-    df["age_bien"] = np.random.randint(0, 150, size=len(df))
- 
+    df["age_bien"] = rng.randint(0, 150, size=len(df))
+
     # 4️⃣ Quartier_score : Note de 1 à 10 aléatoirement
-    df["quartier_score"] = np.random.randint(1.0, 10.0, size=len(df))
- 
+    df["quartier_score"] = rng.randint(1.0, 10.0, size=len(df))
+
     # 5️⃣ Distance au centre : simulation
-    df["distance_centre"] = np.random.randint(0, 20, size=len(df))
- 
+    df["distance_centre"] = rng.randint(0, 20, size=len(df))
+
     # 6️⃣ Prix : utiliser saleamount
     df["prix"] = pd.to_numeric(df.get("saleamount"), errors="coerce").fillna(100000)
- 
+
     # Sélection finale des colonnes
-    df_final = df[["surface", "chambres", "age_bien", "quartier_score", "distance_centre", "prix"]]
- 
-    # Sauvegarde
-    df_final.to_csv(OUTPUT_FILE, index=False)
-    print(f"💾 Fichier final sauvegardé : {OUTPUT_FILE}")
+    return df[["surface", "chambres", "age_bien", "quartier_score", "distance_centre", "prix"]]
+
+
+def write_if_changed(df, path):
+    """Écrit le CSV seulement si son contenu change ; retourne True s'il a été écrit."""
+    content = df.to_csv(index=False).encode()
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            if f.read() == content:
+                return False
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+    return True
+
+
+def main():
+    print(f"📥 Téléchargement des données depuis {SOURCE}...")
+    df = pd.read_csv(SOURCE)
+    print(f"✅ Données téléchargées : {len(df):,} lignes")
+
+    # Nettoyage de base
+    df = df.drop_duplicates().dropna(how="all")
+    df.columns = [c.strip().lower().replace(" ", "_") for c in df.columns]
+
+    # --- Création des 6 colonnes du TP, partition par partition ---
+    os.makedirs(RAW_DIR, exist_ok=True)
+    if PARTITION_COL in df.columns:
+        keys = df[PARTITION_COL].fillna(0).astype(int).astype(str)
+    else:
+        keys = pd.Series("all", index=df.index)
+
+    partitions, changed = [], []
+    for key, part in df.groupby(keys, sort=True):
+        part_final = build_features(part, seed=zlib.crc32(key.encode()))
+        partitions.append(part_final)
+        if write_if_changed(part_final, os.path.join(RAW_DIR, f"{PARTITION_COL}={key}.csv")):
+            changed.append(key)
+
+    print(f"🗂️ {len(partitions)} partitions, {len(changed)} nouvelles ou modifiées : {changed}")
+
+    # Fichier complet, toujours utilisé par l'exploration et l'optimisation
+    df_final = pd.concat(partitions, ignore_index=True)
+    if write_if_changed(df_final, OUTPUT_FILE):
+        print(f"💾 Fichier final sauvegardé : {OUTPUT_FILE}")
+    else:
+        print(f"✅ Fichier final inchangé : {OUTPUT_FILE}")
     print("✅ Aperçu :")
     print(df_final.head())
- 
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
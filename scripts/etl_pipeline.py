@@ -1,4 +1,10 @@
 import os
+import sys
+import json
+import time
+import glob
+import hashlib
+import argparse
 import pandas as pd
 import numpy as np
 import joblib
@@ -6,47 +12,251 @@ from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+from comparables import ComparablesIndex
+from drift import build_reference, save_reference
+from forest import FlatForest
+from registry import ModelRegistry
+from schema import FEATURES, in_bounds
+from scheduler import cpu_budget, limit_blas_threads
+
 # ======================
 #     FONCTION 1 : LOAD & CLEAN
 # ======================
 
-def load_and_clean_data(csv_path):
+EXPECTED_COLS = ["surface", "chambres", "age_bien", "quartier_score", "distance_centre", "prix"]
+
+# Types compacts : les features en float32 (sklearn convertit de toute façon
+# X en float32 pour les arbres, l'entraînement est donc inchangé), le prix
+# reste en float64 pour ne pas perdre de précision sur les gros montants.
+COMPACT_DTYPES = {
+    "surface": np.float32,
+    "chambres": np.float32,
+    "age_bien": np.float32,
+    "quartier_score": np.float32,
+    "distance_centre": np.float32,
+    "prix": np.float64,
+}
+
+
+def _cache_paths(csv_path):
+    base = os.path.splitext(csv_path)[0]
+    return base + ".clean.parquet", base + ".clean.json"
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {"source": os.path.abspath(csv_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def _read_cache(csv_path):
+    """Retourne le DataFrame nettoyé en cache s'il correspond au CSV source."""
+    parquet_path, meta_path = _cache_paths(csv_path)
+    if not (os.path.exists(parquet_path) and os.path.exists(meta_path)):
+        return None
+    with open(meta_path) as f:
+        if json.load(f) != _source_signature(csv_path):
+            return None
+    try:
+        return pd.read_parquet(parquet_path)
+    except ImportError:
+        return None
+
+
+def _write_cache(csv_path, df):
+    parquet_path, meta_path = _cache_paths(csv_path)
+    try:
+        df.to_parquet(parquet_path, index=False)
+    except ImportError:
+        print("⚠️ pyarrow absent : pas de cache Parquet")
+        return
+    with open(meta_path, "w") as f:
+        json.dump(_source_signature(csv_path), f)
+    print(f"💾 Cache Parquet écrit : {parquet_path}")
+
+
+def load_and_clean_data(csv_path, chunksize=250_000, use_cache=True):
     """
     Charge le fichier CSV, nettoie les données :
       - supprime les doublons
       - gère les valeurs manquantes
       - vérifie les types de données
+
+    Le CSV est lu par morceaux de chunksize lignes, chaque morceau étant
+    converti aussitôt en types compacts (COMPACT_DTYPES). Les doublons sont
+    détectés par hachage des lignes (8 octets par ligne) au lieu d'un
+    drop_duplicates sur tout le fichier, et la médiane d'imputation est
+    calculée en seconde passe sur les colonnes compactes. Le résultat est
+    mis en cache en Parquet à côté du CSV et relu tant que le CSV ne change pas.
     """
+    if use_cache:
+        df = _read_cache(csv_path)
+        if df is not None:
+            print(f"⚡ {len(df):,} lignes nettoyées chargées depuis le cache Parquet")
+            return df
+
     print("📂 Chargement des données...")
-    df = pd.read_csv(csv_path, low_memory=False)
-    print(f"✅ {len(df):,} lignes chargées")
+    chunks, hashes = [], []
+    n_rows = 0
+    missing_before = 0
+
+    for chunk in pd.read_csv(csv_path, chunksize=chunksize, low_memory=False):
+        # Normaliser les noms de colonnes
+        chunk.columns = chunk.columns.str.lower().str.strip()
+
+        # Vérification des colonnes attendues
+        missing_cols = [col for col in EXPECTED_COLS if col not in chunk.columns]
+        if missing_cols:
+            raise KeyError(f"Colonnes manquantes : {missing_cols}")
+
+        # Convertir les types en numériques compacts
+        chunk = pd.DataFrame({
+            col: pd.to_numeric(chunk[col], errors="coerce").astype(dtype)
+            for col, dtype in COMPACT_DTYPES.items()
+        })
+        n_rows += len(chunk)
+        missing_before += int(chunk.isna().sum().sum())
+
+        chunk = chunk.dropna(subset=["prix"], how="any")
+        chunks.append(chunk)
+        hashes.append(pd.util.hash_pandas_object(chunk, index=False).to_numpy())
+
+    print(f"✅ {n_rows:,} lignes chargées")
+
+    # Supprimer les doublons : on garde la première occurrence de chaque hachage
+    all_hashes = np.concatenate(hashes) if hashes else np.empty(0, dtype=np.uint64)
+    keep = np.zeros(len(all_hashes), dtype=bool)
+    keep[np.unique(all_hashes, return_index=True)[1]] = True
+    del all_hashes, hashes
+
+    kept, start = [], 0
+    while chunks:
+        chunk = chunks.pop(0)
+        kept.append(chunk[keep[start:start + len(chunk)]])
+        start += len(chunk)
+    df = pd.concat(kept, ignore_index=True) if kept else pd.DataFrame(columns=EXPECTED_COLS)
+    del kept
+
+    # Gestion des valeurs manquantes : médiane calculée colonne par colonne
+    for col in EXPECTED_COLS:
+        if df[col].isna().any():
+            df[col] = df[col].fillna(df[col].median())
+    missing_after = int(df.isna().sum().sum())
+
+    print(f"🧹 Valeurs manquantes avant : {missing_before} → après : {missing_after}")
 
-    # Normaliser les noms de colonnes
-    df.columns = df.columns.str.lower().str.strip()
+    # Nombre de chambres : entier sur 16 bits quand toutes les valeurs sont entières
+    chambres = df["chambres"]
+    if len(chambres) and (chambres == np.round(chambres)).all() and chambres.abs().max() < np.iinfo(np.int16).max:
+        df["chambres"] = chambres.astype(np.int16)
 
-    # Vérification des colonnes attendues
-    expected_cols = ["surface", "chambres", "age_bien", "quartier_score", "distance_centre", "prix"]
-    missing_cols = [col for col in expected_cols if col not in df.columns]
-    if missing_cols:
-        raise KeyError(f"Colonnes manquantes : {missing_cols}")
+    print(f"✅ Données nettoyées avec succès ({df.memory_usage(index=False).sum() / 1e6:.1f} Mo)")
 
-    # Supprimer les doublons
-    df = df.drop_duplicates()
+    if use_cache:
+        _write_cache(csv_path, df)
+    return df
 
-    # Gestion des valeurs manquantes
-    missing_before = df.isna().sum().sum()
-    df = df.dropna(subset=["prix"], how="any")
-    df = df.fillna(df.median(numeric_only=True))
-    missing_after = df.isna().sum().sum()
 
-    print(f"🧹 Valeurs manquantes avant : {missing_before} → après : {missing_after}")
+# ======================
+#     FONCTION 1 BIS : STOCKAGE INCRÉMENTAL
+# ======================
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+RAW_DIR = os.path.join(DATA_DIR, "raw")
+CLEAN_DIR = os.path.join(DATA_DIR, "clean")
+MODEL_PATH = os.path.join(os.path.dirname(__file__), "..", "api", "model", "housing_model.pkl")
+REGISTRY_DIR = os.getenv("MODEL_REGISTRY", os.path.join(os.path.dirname(__file__), "..", "api", "model", "registry"))
+
+
+def file_hash(path, block_size=1 << 20):
+    """Empreinte SHA-256 du contenu d'un fichier, lu par blocs."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def update_clean_store(raw_dir=RAW_DIR, clean_dir=CLEAN_DIR):
+    """
+    Met à jour le stockage nettoyé partition par partition.
+
+    Le manifeste clean_dir/_manifest.json associe chaque partition brute
+    (data/raw/*.csv, écrites par download_data.py) à l'empreinte de son
+    contenu. Seules les partitions nouvelles ou modifiées sont nettoyées et
+    réécrites en Parquet ; les partitions disparues sont supprimées. Un
+    Parquet absent (exécution interrompue, stockage nettoyé à la main) est
+    reconstruit s'il reste une partition brute, ignoré sinon.
+    Retourne la liste des partitions modifiées.
+    """
+    os.makedirs(clean_dir, exist_ok=True)
+    manifest_path = os.path.join(clean_dir, "_manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    changed = []
+    current = {}
+    for raw_path in sorted(glob.glob(os.path.join(raw_dir, "*.csv"))):
+        partition = os.path.splitext(os.path.basename(raw_path))[0]
+        current[partition] = file_hash(raw_path)
+        clean_path = os.path.join(clean_dir, f"{partition}.parquet")
+        if manifest.get(partition) == current[partition] and os.path.exists(clean_path):
+            continue
+
+        print(f"🔄 Partition {partition} nouvelle ou modifiée")
+        df = load_and_clean_data(raw_path, use_cache=False)
+        df.to_parquet(clean_path + ".tmp", index=False)
+        os.replace(clean_path + ".tmp", clean_path)
+        changed.append(partition)
+
+    for partition in set(manifest) - set(current):
+        print(f"🗑️ Partition {partition} supprimée")
+        clean_path = os.path.join(clean_dir, f"{partition}.parquet")
+        if os.path.exists(clean_path):
+            os.remove(clean_path)
+        changed.append(partition)
+
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(current, f, indent=2, sort_keys=True)
+    os.replace(manifest_path + ".tmp", manifest_path)
+
+    print(f"🗂️ {len(current)} partitions, {len(changed)} mises à jour")
+    return changed
+
+
+def clean_store_digest(clean_dir=CLEAN_DIR):
+    """
+    Empreinte du contenu du stockage nettoyé (hachage du manifeste), publiée
+    dans les métadonnées du modèle : c'est elle, et non le manifeste, qui
+    indique sur quelles partitions le modèle en service a été entraîné.
+    """
+    with open(os.path.join(clean_dir, "_manifest.json")) as f:
+        manifest = json.load(f)
+    return hashlib.sha256(json.dumps(manifest, sort_keys=True).encode()).hexdigest()
+
+
+def trained_data_digest(registry_dir=REGISTRY_DIR):
+    """Empreinte des données de la version active du registre (None si inconnue)."""
+    registry = ModelRegistry(registry_dir)
+    version = registry.current()
+    if version is None:
+        return None
+    return registry.metadata(version).get("data_digest")
 
-    # Convertir les types en numériques si besoin
-    numeric_cols = ["surface", "chambres", "age_bien", "quartier_score", "distance_centre", "prix"]
-    for col in numeric_cols:
-        df[col] = pd.to_numeric(df[col], errors="coerce")
 
-    print("✅ Données nettoyées avec succès")
+def load_clean_store(clean_dir=CLEAN_DIR):
+    """
+    Concatène les partitions nettoyées. Les doublons sont déjà retirés
+    dans chaque partition ; ceux qui traversent deux partitions le sont ici.
+    """
+    paths = sorted(glob.glob(os.path.join(clean_dir, "*.parquet")))
+    df = pd.concat([pd.read_parquet(path) for path in paths], ignore_index=True)
+    duplicated = pd.util.hash_pandas_object(df, index=False).duplicated().to_numpy()
+    if duplicated.any():
+        df = df[~duplicated].reset_index(drop=True)
+    print(f"✅ {len(df):,} lignes nettoyées chargées depuis {len(paths)} partitions")
     return df
 
 
@@ -60,11 +270,14 @@ def explore_data(df):
       - affiche les statistiques descriptives
       - calcule les corrélations
       - identifie les outliers
+
+    Retourne ces résultats dans un dictionnaire (mis en cache par pipeline_dag.py).
     """
     print("\n🔍 Exploration des données")
 
     print("\n📊 Statistiques descriptives :")
-    print(df.describe().transpose())
+    describe = df.describe().transpose()
+    print(describe)
 
     print("\n📈 Corrélations (top 5 avec le prix) :")
     corr = df.corr(numeric_only=True)["prix"].sort_values(ascending=False).head(5)
@@ -77,12 +290,52 @@ def explore_data(df):
     outliers = df[(df["prix"] < q1 - 1.5 * iqr) | (df["prix"] > q3 + 1.5 * iqr)]
     print(f"\n⚠️ Outliers détectés : {len(outliers):,} lignes ({len(outliers)/len(df)*100:.2f}%)")
 
+    return {"describe": describe, "correlations": corr, "outliers": len(outliers)}
+
 
 # ======================
 #     FONCTION 3 : TRAIN MODEL
 # ======================
 
-def train_model(df):
+# Profil "serving" : forêt compacte pour l'API (taille, chargement et latence bornés)
+SERVING_MAX_NODES = 100_000        # budget total de nœuds pour toute la forêt
+SERVING_PRUNE_TOLERANCE = 0.005    # +0,5 % de MSE de validation toléré par l'élagage
+DISTILL_TREES = 20                 # forêt élève de la distillation
+DISTILL_MAX_DEPTH = 12
+
+
+def prune_trees(model, X_val, y_val, tolerance=SERVING_PRUNE_TOLERANCE):
+    """
+    Retire les arbres qui n'apportent rien à la forêt.
+
+    Sélection gloutonne : on ajoute à chaque étape l'arbre qui réduit le plus
+    la MSE de validation de la moyenne, puis on garde le plus petit ensemble
+    dont la MSE est à tolerance près de la meilleure rencontrée.
+    """
+    tree_preds = FlatForest.from_sklearn(model).tree_predictions(X_val.to_numpy())
+    y = np.asarray(y_val, dtype=np.float64)
+    remaining = list(range(len(tree_preds)))
+    chosen, errors = [], []
+    total = np.zeros(len(y))
+    while remaining:
+        mse = (((total + tree_preds[remaining]) / (len(chosen) + 1) - y) ** 2).mean(axis=1)
+        best = int(np.argmin(mse))
+        tree = remaining.pop(best)
+        chosen.append(tree)
+        total += tree_preds[tree]
+        errors.append(mse[best])
+
+    errors = np.asarray(errors)
+    n_keep = int(np.argmax(errors <= errors.min() * (1 + tolerance))) + 1
+    keep = sorted(chosen[:n_keep])
+    model.estimators_ = [model.estimators_[i] for i in keep]
+    model.n_estimators = len(keep)
+    print(f"✂️ Élagage : {len(keep)}/{len(tree_preds)} arbres conservés "
+          f"(MSE validation {errors[n_keep - 1]:,.0f} vs {errors[-1]:,.0f} avec tous les arbres)")
+    return model
+
+
+def train_model(df, profile="accuracy", max_nodes=SERVING_MAX_NODES, distill=False):
     """
     Entraîne un modèle Random Forest pour prédire le prix.
 
@@ -101,6 +354,15 @@ def train_model(df):
       • max_depth=20         → Profondeur maximale
       • min_samples_split=5  → Échantillons min pour split
       • random_state=42      → Reproductibilité
+
+    -----
+    4.3 Profil "serving" (profile="serving")
+      • max_leaf_nodes       → Budget total de max_nodes nœuds réparti entre les arbres
+      • Élagage              → Suppression des arbres qui n'améliorent pas la validation
+      • distill=True         → Forêt élève plus petite (DISTILL_TREES arbres de
+                               profondeur DISTILL_MAX_DEPTH) entraînée sur les
+                               prédictions du modèle
+      • Feuilles en float32  → Forêt compilée deux fois plus légère
     """
     print("\n🤖 Entraînement du modèle Random Forest...")
 
@@ -115,33 +377,149 @@ def train_model(df):
     )
 
     # 3. Entraînement du modèle
+    params = {"n_estimators": 100, "max_depth": 20, "min_samples_split": 5}
+    X_fit, y_fit = X_train, y_train
+    if profile == "serving":
+        # Une feuille de plus = deux nœuds de plus : max_nodes ≈ n_arbres × (2 × feuilles - 1)
+        params["max_leaf_nodes"] = max(2, (max_nodes // params["n_estimators"] + 1) // 2)
+        # Validation interne pour l'élagage, prise sur le train (le test reste intact)
+        X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.1, random_state=42)
+
     model = RandomForestRegressor(
-        n_estimators=100,
-        max_depth=20,
-        min_samples_split=5,
+        **params,
         random_state=42,
-        n_jobs=-1
+        n_jobs=cpu_budget()  # respecte la limite CPU du pod (cgroup)
     )
-    model.fit(X_train, y_train)
-
-    print(f"✅ Modèle Random Forest entraîné avec {len(X_train):,} échantillons")
+    with limit_blas_threads(1):
+        model.fit(X_fit, y_fit)
+
+        if profile == "serving":
+            model = prune_trees(model, X_val, y_val)
+            if distill:
+                # L'élève ne doit pas dépasser la taille du professeur déjà élagué
+                student_nodes = min(max_nodes, sum(t.tree_.node_count for t in model.estimators_))
+                student = RandomForestRegressor(
+                    n_estimators=DISTILL_TREES,
+                    max_depth=DISTILL_MAX_DEPTH,
+                    max_leaf_nodes=max(2, (student_nodes // DISTILL_TREES + 1) // 2),
+                    random_state=42,
+                    n_jobs=cpu_budget()
+                )
+                # L'élève apprend la fonction lissée du professeur, pas le bruit des prix
+                student.fit(X_fit, model.predict(X_fit))
+                model = prune_trees(student, X_val, y_val)
+                print(f"🎓 Distillation en {model.n_estimators} arbres de profondeur ≤ {DISTILL_MAX_DEPTH}")
+
+    print(f"✅ Modèle Random Forest ({profile}) entraîné avec {len(X_fit):,} échantillons")
 
     # 6. Sauvegarde du modèle
-    model_path = os.path.join(os.path.dirname(__file__), "..", "api", "model", "housing_model.pkl")
+    model_path = MODEL_PATH
     os.makedirs(os.path.dirname(model_path), exist_ok=True)
     joblib.dump(model, model_path)
     print(f"💾 Modèle sauvegardé dans : {model_path}")
 
+    # 7. Export de la forêt compilée pour l'API (inférence NumPy sans sklearn)
+    value_dtype = np.float32 if profile == "serving" else np.float64
+    # Contributions par nœud précalculées pour /explain (décomposition de Saabas)
+    forest = FlatForest.from_sklearn(model, value_dtype=value_dtype, with_contributions=True)
+    forest_path = model_path.replace(".pkl", ".forest")
+    forest.save(forest_path)
+    print(f"🌲 Forêt compilée ({forest.node_count:,} nœuds) exportée dans : {forest_path}")
+
+    # 8. Index des ventes comparables (/comparables), sur tout le jeu nettoyé
+    build_comparables_index(df, model_path.replace(".pkl", ".comparables"))
+
+    # 9. Esquisses de référence pour le suivi de dérive des entrées de l'API
+    build_drift_reference(model, X_train, X_test, model_path.replace(".pkl", ".reference.json"))
+
     return model, X_test, y_test
 
 
+def build_comparables_index(df, index_path):
+    """
+    Construit l'index k-NN des ventes passées (features standardisées,
+    cellules k-means) et l'enregistre à côté du modèle, en .npy mappables.
+    """
+    features = ["surface", "chambres", "age_bien", "quartier_score", "distance_centre"]
+    started = time.perf_counter()
+    index = ComparablesIndex.build(df[features].to_numpy(), df["prix"].to_numpy(), columns=features + ["prix"])
+    index.save(index_path)
+    print(f"🏘️ Index des comparables ({index.n_rows:,} ventes, {index.n_lists} cellules) "
+          f"construit en {time.perf_counter() - started:.1f} s : {index_path}")
+    return index
+
+
+def build_drift_reference(model, X_train, X_test, reference_path):
+    """
+    Enregistre les histogrammes de référence (bornes aux quantiles du train)
+    des cinq features et du prix estimé sur le jeu de test : l'API y compare
+    les biens qu'elle prédit (PSI / KS dans /metrics). Seuls les biens dans
+    les bornes de validation de l'API (schema.BOUNDS) sont pris en compte :
+    les autres ne peuvent jamais être reçus et fausseraient la référence.
+    """
+    train = X_train[in_bounds(X_train[FEATURES].to_numpy())]
+    test = X_test[in_bounds(X_test[FEATURES].to_numpy())]
+    if len(train) < len(X_train):
+        print(f"⚠️ Esquisses de référence sur {len(train):,} biens du train sur {len(X_train):,} "
+              f"(les autres sont hors des bornes de l'API)")
+    columns = {name: train[name].to_numpy() for name in FEATURES}
+    columns["prix_estime"] = model.predict(test)
+    reference = build_reference(columns)
+    save_reference(reference, reference_path)
+    n_values = sum(len(sketch["counts"]) for sketch in reference["features"].values())
+    print(f"📐 Esquisses de référence ({len(columns)} colonnes, {n_values} intervalles) : {reference_path}")
+    return reference
+
+
 # ======================
 #     FONCTION 4 : TEST MODEL
 # ======================
 
-def test_model_predictions(model, X_test, y_test):
+def _path_size(path):
+    """Taille sur disque d'un fichier ou d'un répertoire (forêt compilée), en octets."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path)
+
+
+def _median_seconds(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return float(np.median(timings))
+
+
+def measure_serving_cost(model, X_test, model_path=MODEL_PATH, batch_size=1000):
+    """
+    Coût de service du modèle tel que l'API le charge : taille et temps de
+    chargement du pickle et de la forêt compilée, latence de FlatForest
+    sur une ligne et sur un lot, écart maximal avec sklearn.
     """
-    Évalue le modèle sur l’échantillon de test et affiche les métriques.
+    forest_path = model_path.replace(".pkl", ".forest")
+    X = X_test.to_numpy(dtype=np.float64)
+
+    cost = {"pkl_mb": _path_size(model_path) / 1e6}
+    cost["pkl_load_s"] = _median_seconds(lambda: joblib.load(model_path), repeat=1)
+    if os.path.isdir(forest_path):
+        cost["forest_mb"] = _path_size(forest_path) / 1e6
+        # Chargement complet (np.load sans mmap) pour mesurer la lecture réelle
+        cost["forest_load_s"] = _median_seconds(lambda: FlatForest.load(forest_path, mmap_mode=None), repeat=3)
+        forest = FlatForest.load(forest_path)
+        cost["latency_1_ms"] = _median_seconds(lambda: forest.predict(X[:1]), repeat=200) * 1000
+        batch = X[:batch_size]
+        cost["batch_size"] = len(batch)
+        cost["latency_batch_ms"] = _median_seconds(lambda: forest.predict(batch), repeat=10) * 1000
+        cost["max_abs_diff"] = float(np.max(np.abs(forest.predict(batch) - model.predict(X_test[:batch_size]))))
+        cost["node_count"] = forest.node_count
+    return cost
+
+
+def test_model_predictions(model, X_test, y_test, model_path=MODEL_PATH):
+    """
+    Évalue le modèle sur l’échantillon de test et affiche les métriques,
+    ainsi que son coût de service (taille, chargement, latence).
     """
     print("\n🧪 Évaluation du modèle...")
 
@@ -157,6 +535,16 @@ def test_model_predictions(model, X_test, y_test):
     print(f"📉 RMSE : {rmse:,.2f}")
     print(f"📈 R²   : {r2:.3f}")
 
+    cost = measure_serving_cost(model, X_test, model_path) if os.path.exists(model_path) else {}
+    if cost:
+        print(f"📦 Taille : pickle {cost['pkl_mb']:.1f} Mo ({cost['pkl_load_s']:.2f} s de chargement)")
+    if "forest_mb" in cost:
+        print(f"🌲 Forêt compilée : {cost['node_count']:,} nœuds, {cost['forest_mb']:.1f} Mo "
+              f"({cost['forest_load_s'] * 1000:.1f} ms de chargement)")
+        print(f"⚡ Latence : {cost['latency_1_ms']:.3f} ms / ligne, "
+              f"{cost['latency_batch_ms']:.2f} ms / lot de {cost['batch_size']} "
+              f"(écart max avec sklearn : {cost['max_abs_diff']:.2e})")
+
     # ======================
     #     TESTER DES PRÉDICTIONS MANUELLES
     # ======================
@@ -174,31 +562,83 @@ def test_model_predictions(model, X_test, y_test):
           .round(2)
           .to_string(index=False))
 
-    return {"MAE": mae, "RMSE": rmse, "R2": r2}
+    return {"MAE": mae, "RMSE": rmse, "R2": r2, **cost}
+
+
+# ======================
+#     FONCTION 5 : PUBLICATION DANS LE REGISTRE
+# ======================
+
+def publish_model(model_path, scores, **metadata):
+    """
+    Publie le modèle (pickle + forêt compilée + index des comparables +
+    esquisses de référence) comme nouvelle version active du registre ; l'API la charge à chaud sans
+    redémarrage.
+    """
+    registry = ModelRegistry(REGISTRY_DIR)
+    version = registry.publish(
+        model_path,
+        forest_path=model_path.replace(".pkl", ".forest"),
+        comparables_path=model_path.replace(".pkl", ".comparables"),
+        reference_path=model_path.replace(".pkl", ".reference.json"),
+        metadata={**metadata, "metrics": scores}
+    )
+    print(f"🏷️ Version {version} publiée dans le registre : {registry.root}")
+    return version
 
 
 # ======================
 #     MAIN PIPELINE
 # ======================
 
-def main():
-    """Pipeline complet ETL + entraînement modèle Random Forest."""
-    data_path = os.path.join(os.path.dirname(__file__), "..", "data", "housing_data.csv")
+def main(force=False, profile="accuracy", max_nodes=SERVING_MAX_NODES, distill=False):
+    """
+    Pipeline complet ETL + entraînement modèle Random Forest.
+
+    Si download_data.py a produit des partitions brutes (data/raw), seules
+    les partitions nouvelles ou modifiées sont nettoyées, et le
+    réentraînement est sauté quand la version active du registre a été
+    entraînée sur ce même stockage (sauf force=True). La comparaison porte
+    sur l'empreinte publiée avec le modèle : une exécution interrompue après
+    le nettoyage, ou un nettoyage lancé par pipeline_dag.py, n'empêche pas
+    le réentraînement suivant.
+    """
+    data_path = os.path.join(DATA_DIR, "housing_data.csv")
 
     # Étape 1 : Extraction & nettoyage
-    df = load_and_clean_data(data_path)
+    data_digest = None
+    if glob.glob(os.path.join(RAW_DIR, "*.csv")):
+        update_clean_store()
+        data_digest = clean_store_digest()
+        if data_digest == trained_data_digest() and not force:
+            print("\n✅ Aucune donnée nouvelle depuis le modèle en service : réentraînement inutile.")
+            return
+        df = load_clean_store()
+    else:
+        df = load_and_clean_data(data_path)
 
     # Étape 2 : Exploration
     explore_data(df)
 
     # Étape 3 : Entraînement du modèle
-    model, X_test, y_test = train_model(df)
+    model, X_test, y_test = train_model(df, profile=profile, max_nodes=max_nodes, distill=distill)
 
     # Étape 4 : Évaluation et test de prédictions
-    test_model_predictions(model, X_test, y_test)
+    scores = test_model_predictions(model, X_test, y_test)
+
+    # Étape 5 : Publication de la nouvelle version pour l'API
+    publish_model(MODEL_PATH, scores, script="etl_pipeline", profile=profile, n_rows=len(df),
+                  data_digest=data_digest)
 
     print("\n🎉 Pipeline ETL terminé avec succès !")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Pipeline ETL + entraînement.")
+    parser.add_argument("--force", action="store_true", help="Réentraîner même sans donnée nouvelle")
+    parser.add_argument("--profile", choices=["accuracy", "serving"], default="accuracy",
+                        help="serving : forêt compacte (budget de nœuds, élagage, feuilles float32)")
+    parser.add_argument("--max-nodes", type=int, default=SERVING_MAX_NODES, help="Budget de nœuds du profil serving")
+    parser.add_argument("--distill", action="store_true", help="Profil serving : distiller en une forêt plus petite")
+    args = parser.parse_args()
+    main(force=args.force, profile=args.profile, max_nodes=args.max_nodes, distill=args.distill)
\ No newline at end of file
@@ -1,66 +1,210 @@
 import os
-import pandas as pd
+import sys
+import json
+import time
+import argparse
+import hashlib
+import numpy as np
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.model_selection import train_test_split, GridSearchCV, ParameterGrid
 from sklearn.metrics import mean_squared_error, r2_score
 import joblib
+from joblib import Parallel, delayed
+
+from etl_pipeline import build_comparables_index, build_drift_reference, load_and_clean_data, publish_model
+from scheduler import FitTimings, cpu_budget, limit_blas_threads, split_budget
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+from forest import FlatForest
 
 # ======================
 #     OPTIMISATION RANDOM FOREST
 # ======================
 
-def main():
-    print("📂 Chargement des données...")
-    data_path = os.path.join(os.path.dirname(__file__), "..", "data", "housing_data.csv")
-    df = pd.read_csv(data_path)
-
-    # Vérification basique
-    if "prix" not in df.columns:
-        raise KeyError("La colonne cible 'prix' est manquante dans le dataset.")
-
-    # Séparation features / target
-    X = df.drop("prix", axis=1)
-    y = df["prix"]
+# Grille d’hyperparamètres
+PARAM_GRID = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [10, 20, 30],
+    "min_samples_split": [2, 5, 10]
+}
 
-    # Train/test split
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
-    )
+DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "housing_data.csv")
+MODEL_DIR = os.path.join(os.path.dirname(__file__), "..", "api", "model")
+CHECKPOINT_PATH = os.path.join(os.path.dirname(__file__), "..", "data", ".optimize_checkpoint.joblib")
+TIMINGS_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "optimize_timings.json")
 
-    print("🔍 Lancement du Grid Search pour Random Forest...")
 
-    # Grille d’hyperparamètres
-    param_grid = {
-        "n_estimators": [50, 100, 200],
-        "max_depth": [10, 20, 30],
-        "min_samples_split": [2, 5, 10]
-    }
+def grid_search(X_train, y_train, budget, outer=None, timings=None):
+    """
+    Recherche exhaustive : 27 combinaisons × 3 folds = 81 entraînements,
+    répartis sur outer processus de inner threads chacun.
+    """
+    outer_jobs, inner_jobs = split_budget(budget, len(ParameterGrid(PARAM_GRID)) * 3, outer)
+    print(f"🔍 Lancement du Grid Search pour Random Forest ({outer_jobs} fits × {inner_jobs} threads)...")
 
     # Modèle de base
-    rf = RandomForestRegressor(random_state=42, n_jobs=-1)
+    rf = RandomForestRegressor(random_state=42, n_jobs=inner_jobs)
 
     # Grid Search
     grid_search = GridSearchCV(
         estimator=rf,
-        param_grid=param_grid,
+        param_grid=PARAM_GRID,
         cv=3,
         scoring="r2",
         verbose=2,
-        n_jobs=-1
+        n_jobs=outer_jobs
     )
 
     grid_search.fit(X_train, y_train)
 
+    if timings is not None:
+        results = grid_search.cv_results_
+        n_samples = len(X_train) * 2 // 3
+        for i, params in enumerate(results["params"]):
+            for split in range(3):
+                timings.record(params, results["mean_fit_time"][i], n_samples, fold=split,
+                               outer_jobs=outer_jobs, inner_jobs=inner_jobs,
+                               r2=float(results[f"split{split}_test_score"][i]))
+    return grid_search.best_estimator_, grid_search.best_params_, grid_search.best_score_
+
+
+def _fit_candidate(forest, n_estimators, X, y, X_val, y_val):
+    """Ajoute des arbres à une forêt (warm_start) et la score ; exécuté dans un worker."""
+    started = time.perf_counter()
+    forest.set_params(n_estimators=n_estimators)
+    forest.fit(X, y)
+    seconds = time.perf_counter() - started
+    return forest, r2_score(y_val, forest.predict(X_val)), seconds
+
+
+def successive_halving_search(X_train, y_train, budget, outer=None, timings=None,
+                              factor=3, checkpoint_path=CHECKPOINT_PATH, resume=True):
+    """
+    Successive halving : toutes les combinaisons (max_depth, min_samples_split)
+    démarrent avec peu d'arbres sur un petit échantillon ; à chaque tour,
+    seul le meilleur tiers (factor) est conservé, l'échantillon est agrandi
+    et les forêts survivantes reçoivent des arbres supplémentaires
+    (warm_start) au lieu d'être réentraînées. n_estimators sert de budget :
+    le tour r entraîne jusqu'à PARAM_GRID["n_estimators"][r] arbres.
+
+    Les candidats d'un tour sont entraînés en parallèle : le budget CPU est
+    réparti entre candidats (outer) et arbres de chaque forêt (inner).
+
+    Le score est le R² sur un jeu de validation fixe tiré du train. Un
+    checkpoint est écrit après chaque tour : une recherche interrompue
+    reprend au tour suivant. Le meilleur candidat est enfin réentraîné sur
+    tout le train avec le plus grand n_estimators.
+    """
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.2, random_state=42)
+    budgets = sorted(PARAM_GRID["n_estimators"])
+    candidates = list(ParameterGrid({k: v for k, v in PARAM_GRID.items() if k != "n_estimators"}))
+    n_rungs = len(budgets)
+
+    signature = hashlib.sha256(json.dumps(
+        {"grid": PARAM_GRID, "factor": factor, "n": len(X_train), "y": float(np.sum(y_train))}, sort_keys=True
+    ).encode()).hexdigest()
+
+    # Reprise depuis le checkpoint s'il correspond à la même recherche
+    state = {"signature": signature, "rung": 0, "survivors": list(range(len(candidates))),
+             "forests": {}, "history": []}
+    if resume and os.path.exists(checkpoint_path):
+        saved = joblib.load(checkpoint_path)
+        if saved["signature"] == signature:
+            state = saved
+            print(f"⏩ Reprise au tour {state['rung'] + 1}/{n_rungs} ({len(state['survivors'])} candidats)")
+
+    while state["rung"] < n_rungs:
+        rung = state["rung"]
+        # Taille d'échantillon : n / factor^(tours restants), tout le jeu au dernier tour
+        n_samples = max(1, len(X_fit) // factor ** (n_rungs - 1 - rung))
+        X_rung, y_rung = X_fit.iloc[:n_samples], y_fit.iloc[:n_samples]
+        print(f"\n🔁 Tour {rung + 1}/{n_rungs} : {len(state['survivors'])} candidats, "
+              f"{n_samples:,} échantillons, {budgets[rung]} arbres")
+
+        outer_jobs, inner_jobs = split_budget(budget, len(state["survivors"]), outer)
+        forests = []
+        for idx in state["survivors"]:
+            forest = state["forests"].get(idx)
+            if forest is None:
+                forest = RandomForestRegressor(warm_start=True, random_state=42, **candidates[idx])
+            forests.append(forest.set_params(n_jobs=inner_jobs))
+
+        results = Parallel(n_jobs=outer_jobs)(
+            delayed(_fit_candidate)(forest, budgets[rung], X_rung, y_rung, X_val, y_val) for forest in forests
+        )
+
+        scores = {}
+        for idx, (forest, score, seconds) in zip(state["survivors"], results):
+            state["forests"][idx] = forest
+            scores[idx] = score
+            state["history"].append({"rung": rung, "params": candidates[idx], "r2": score})
+            if timings is not None:
+                timings.record({**candidates[idx], "n_estimators": budgets[rung]}, seconds, n_samples,
+                               rung=rung, outer_jobs=outer_jobs, inner_jobs=inner_jobs, r2=score)
+            print(f"   {candidates[idx]} → R² {score:.4f} ({seconds:.1f} s)")
+
+        # On garde le meilleur 1/factor (au moins un candidat)
+        n_keep = max(1, len(scores) // factor) if rung < n_rungs - 1 else 1
+        survivors = sorted(scores, key=scores.get, reverse=True)[:n_keep]
+        state = {**state, "rung": rung + 1, "survivors": survivors,
+                 "forests": {idx: state["forests"][idx] for idx in survivors},
+                 "best_score": scores[survivors[0]]}
+        joblib.dump(state, checkpoint_path)
+
+    best_params = {**candidates[state["survivors"][0]], "n_estimators": budgets[-1]}
+    print(f"\n🏁 Réentraînement du meilleur candidat sur tout le train : {best_params}")
+    best_model = RandomForestRegressor(random_state=42, n_jobs=budget, **best_params)
+    started = time.perf_counter()
+    best_model.fit(X_train, y_train)
+    if timings is not None:
+        timings.record(best_params, time.perf_counter() - started, len(X_train), refit=True, inner_jobs=budget)
+
+    os.remove(checkpoint_path)
+    return best_model, best_params, state["best_score"]
+
+
+def main(search="halving", resume=True, cpus=None, outer=None, timings_path=TIMINGS_PATH,
+         data_path=DATA_PATH, model_dir=MODEL_DIR, checkpoint_path=CHECKPOINT_PATH):
+    # Même nettoyage que etl_pipeline (doublons, valeurs manquantes) : l'index
+    # des comparables et les esquisses de référence refusent les NaN
+    df = load_and_clean_data(data_path)
+
+    # Séparation features / target
+    X = df.drop("prix", axis=1)
+    y = df["prix"]
+
+    # Train/test split
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42
+    )
+
+    # Budget CPU (cgroup du pod compris) ; BLAS limité à 1 thread, le parallélisme
+    # est porté uniquement par les candidats et les arbres
+    budget = cpu_budget(cpus)
+    timings = FitTimings(timings_path, budget, search=search)
+    print(f"🧮 Budget CPU : {budget} cœurs")
+
+    started = time.perf_counter()
+    with limit_blas_threads(1):
+        if search == "grid":
+            best_model, best_params, best_score = grid_search(X_train, y_train, budget, outer, timings)
+        else:
+            best_model, best_params, best_score = successive_halving_search(
+                X_train, y_train, budget, outer, timings, checkpoint_path=checkpoint_path, resume=resume
+            )
+    elapsed = time.perf_counter() - started
+
     # Résultats du tuning
     print("\n🏆 Meilleurs paramètres trouvés :")
-    print(grid_search.best_params_)
-    print(f"⭐ Meilleur score R² (CV) : {grid_search.best_score_:.3f}")
+    print(best_params)
+    print(f"⭐ Meilleur score R² ({'CV' if search == 'grid' else 'validation'}) : {best_score:.3f}")
+    print(f"⏱️ Durée de la recherche : {elapsed:.1f} s")
+    print(f"🕒 Durées par entraînement enregistrées dans : {timings.save(elapsed)}")
 
     # Évaluation sur le test set
-    best_model = grid_search.best_estimator_
     y_pred = best_model.predict(X_test)
 
-    rmse = mean_squared_error(y_test, y_pred, squared=False)
+    rmse = np.sqrt(mean_squared_error(y_test, y_pred))
     r2 = r2_score(y_test, y_pred)
 
     print("\n📊 Évaluation sur le jeu de test :")
@@ -68,13 +212,34 @@ def main():
     print(f"R²   : {r2:.3f}")
 
     # Sauvegarde du modèle optimisé
-    model_dir = os.path.join(os.path.dirname(__file__), "..", "api", "model")
     os.makedirs(model_dir, exist_ok=True)
     model_path = os.path.join(model_dir, "housing_model_optimized.pkl")
 
     joblib.dump(best_model, model_path)
     print(f"\n💾 Modèle sauvegardé dans : {model_path}")
 
+    # Export de la forêt compilée, chargeable en mmap par l'API
+    forest_path = model_path.replace(".pkl", ".forest")
+    FlatForest.from_sklearn(best_model, with_contributions=True).save(forest_path)
+    print(f"🌲 Forêt compilée exportée dans : {forest_path}")
+    build_comparables_index(df, model_path.replace(".pkl", ".comparables"))
+    build_drift_reference(best_model, X_train, X_test, model_path.replace(".pkl", ".reference.json"))
+
+    # Publication dans le registre : l'API bascule à chaud sur ce modèle
+    publish_model(model_path, {"RMSE": rmse, "R2": r2}, script="optimize_model",
+                  search=search, params=best_params)
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Optimisation des hyperparamètres du Random Forest.")
+    parser.add_argument("--search", choices=["halving", "grid"], default="halving",
+                        help="halving : successive halving avec warm start (défaut) ; grid : GridSearchCV exhaustif")
+    parser.add_argument("--no-resume", action="store_true", help="Ignorer un checkpoint existant")
+    parser.add_argument("--cpus", type=int, default=None,
+                        help="Budget CPU (défaut : CPU_BUDGET, sinon affinité et limite du cgroup)")
+    parser.add_argument("--outer-jobs", type=int, default=None,
+                        help="Entraînements simultanés ; le reste du budget va aux arbres de chaque forêt")
+    parser.add_argument("--timings", default=TIMINGS_PATH, help="Fichier JSON des durées par entraînement")
+    args = parser.parse_args()
+    main(search=args.search, resume=not args.no_resume, cpus=args.cpus, outer=args.outer_jobs,
+         timings_path=args.timings)
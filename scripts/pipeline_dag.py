@@ -0,0 +1,280 @@
+import argparse
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import resource
+import time
+
+import joblib
+
+import etl_pipeline
+import explore_custom
+from registry import ModelRegistry
+
+# ======================
+#     PIPELINE EN GRAPHE D'ÉTAPES (DAG)
+# ======================
+# Exemples :
+#   python pipeline_dag.py                 # tout : exploration, histogrammes, entraînement, évaluation
+#   python pipeline_dag.py explore         # seulement nettoyage + exploration
+#   python pipeline_dag.py train --force   # recalcule même si le cache est valide
+#
+# Chaque étape déclare ses entrées (étapes amont) et ses paramètres. Son
+# résultat est mis en cache sur disque sous une clé qui dépend de la source
+# de données, du code, des paramètres et des clés des étapes amont : une
+# étape n'est recalculée que si l'une de ces entrées change. Les étapes
+# indépendantes (exploration, histogrammes, entraînement) tournent en
+# parallèle, chacune dans son propre processus, ce qui permet de mesurer
+# son pic mémoire réel.
+#
+# train et evaluate ont des effets de bord (fichiers du modèle, publication
+# dans le registre) : leur résultat en cache n'est réutilisé que si ces
+# fichiers et la version active du registre sont toujours ceux qu'elles ont
+# produits ; sinon l'étape et ses étapes aval sont recalculées.
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+API_DIR = os.path.join(SCRIPTS_DIR, "..", "api")
+CACHE_DIR = os.path.join(etl_pipeline.DATA_DIR, ".dag_cache")
+
+# Code exécuté par les étapes : scripts et modules de l'API utilisés à l'entraînement
+CODE_FILES = [os.path.join(SCRIPTS_DIR, name) for name in
+              ("etl_pipeline.py", "explore_custom.py", "pipeline_dag.py", "scheduler.py")]
+CODE_FILES += [os.path.join(API_DIR, name) for name in
+               ("forest.py", "comparables.py", "drift.py", "registry.py", "schema.py")]
+
+
+# ---------- Fonctions des étapes (exécutées dans des processus séparés) ----------
+
+def stage_clean():
+    if glob.glob(os.path.join(etl_pipeline.RAW_DIR, "*.csv")):
+        etl_pipeline.update_clean_store()
+        return etl_pipeline.load_clean_store()
+    return etl_pipeline.load_and_clean_data(os.path.join(etl_pipeline.DATA_DIR, "housing_data.csv"))
+
+
+def stage_explore(df):
+    return etl_pipeline.explore_data(df)
+
+
+def stage_histograms(df):
+    return explore_custom.generate_histograms(df)
+
+
+def stage_train(df):
+    return etl_pipeline.train_model(df)
+
+
+def stage_evaluate(trained):
+    model, X_test, y_test = trained
+    scores = etl_pipeline.test_model_predictions(model, X_test, y_test)
+    # Même empreinte que etl_pipeline.main : il ne réentraîne pas un stockage déjà publié
+    data_digest = etl_pipeline.clean_store_digest() if glob.glob(os.path.join(etl_pipeline.RAW_DIR, "*.csv")) else None
+    etl_pipeline.publish_model(etl_pipeline.MODEL_PATH, scores, script="pipeline_dag", data_digest=data_digest)
+    return scores
+
+
+def stage_all(exploration, histograms_path, scores):
+    return {"outliers": exploration["outliers"], "histograms": histograms_path, **scores}
+
+
+# Nom → (fonction, étapes amont, paramètres)
+STAGES = {
+    "clean": (stage_clean, (), {}),
+    "explore": (stage_explore, ("clean",), {}),
+    "histograms": (stage_histograms, ("clean",), {}),
+    "train": (stage_train, ("clean",), {}),
+    "evaluate": (stage_evaluate, ("train",), {}),
+    "all": (stage_all, ("explore", "histograms", "evaluate"), {}),
+}
+
+
+# ---------- Clés de cache ----------
+
+def source_fingerprint():
+    """Empreinte des données sources : partitions brutes, sinon housing_data.csv."""
+    paths = sorted(glob.glob(os.path.join(etl_pipeline.RAW_DIR, "*.csv")))
+    if not paths:
+        paths = [os.path.join(etl_pipeline.DATA_DIR, "housing_data.csv")]
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        digest.update(etl_pipeline.file_hash(path).encode())
+    return digest.hexdigest()
+
+
+def code_fingerprint():
+    """Empreinte du code des étapes : modifier un script ou un module de l'API utilisé invalide le cache."""
+    digest = hashlib.sha256()
+    for path in CODE_FILES:
+        digest.update(etl_pipeline.file_hash(path).encode())
+    return digest.hexdigest()
+
+
+# ---------- Fichiers produits par les étapes ----------
+
+def path_digest(path):
+    """Empreinte d'un fichier ou d'un répertoire (forêt compilée, index), None s'il n'existe pas."""
+    if os.path.isfile(path):
+        return etl_pipeline.file_hash(path)
+    if not os.path.isdir(path):
+        return None
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full_path = os.path.join(root, name)
+            digest.update(os.path.relpath(full_path, path).encode())
+            digest.update(etl_pipeline.file_hash(full_path).encode())
+    return digest.hexdigest()
+
+
+def train_artifacts():
+    """Fichiers écrits par train_model : pickle, forêt compilée, index des comparables, esquisses de référence."""
+    model_path = etl_pipeline.MODEL_PATH
+    paths = [model_path] + [model_path.replace(".pkl", suffix)
+                            for suffix in (".forest", ".comparables", ".reference.json")]
+    return {path: path_digest(path) for path in paths}
+
+
+def evaluate_artifacts():
+    """Version publiée par evaluate : elle doit rester la version active du registre."""
+    registry = ModelRegistry(etl_pipeline.REGISTRY_DIR)
+    version = registry.current()
+    return {"version": version, "sha256": registry.metadata(version).get("sha256") if version else None}
+
+
+# Étape → fonction décrivant ses effets de bord, enregistrée avec son résultat
+ARTIFACTS = {
+    "train": train_artifacts,
+    "evaluate": evaluate_artifacts,
+}
+
+
+def dependencies(target):
+    """Étapes nécessaires pour target, dans un ordre topologique."""
+    order = []
+
+    def visit(name):
+        if name not in STAGES:
+            raise KeyError(f"Étape inconnue : {name} (disponibles : {list(STAGES)})")
+        for upstream in STAGES[name][1]:
+            visit(upstream)
+        if name not in order:
+            order.append(name)
+
+    visit(target)
+    return order
+
+
+def stage_keys(order):
+    """Clé de chaque étape : hachage du code, des paramètres et des clés amont."""
+    base = {"source": source_fingerprint(), "code": code_fingerprint()}
+    keys = {}
+    for name in order:
+        _, upstream, params = STAGES[name]
+        payload = {"stage": name, "params": params, "inputs": [keys[u] for u in upstream]}
+        if not upstream:
+            payload.update(base)
+        keys[name] = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+    return keys
+
+
+def cache_path(name, key):
+    return os.path.join(CACHE_DIR, f"{name}-{key}.joblib")
+
+
+def artifacts_path(name, key):
+    return os.path.join(CACHE_DIR, f"{name}-{key}.artifacts.json")
+
+
+def artifacts_current(name, key):
+    """True si les effets de bord enregistrés avec le résultat en cache sont toujours en place."""
+    if name not in ARTIFACTS:
+        return True
+    if not os.path.exists(artifacts_path(name, key)):
+        return False
+    with open(artifacts_path(name, key)) as f:
+        return json.load(f) == ARTIFACTS[name]()
+
+
+# ---------- Exécution ----------
+
+def _execute(name, input_paths, output_path):
+    """Exécute une étape dans un processus neuf : charge ses entrées, écrit sa sortie."""
+    func, _, params = STAGES[name]
+    started = time.perf_counter()
+    inputs = [joblib.load(path) for path in input_paths]
+    result = func(*inputs, **params)
+    if name in ARTIFACTS:
+        # Écrit avant le résultat : un résultat en cache a toujours ses effets de bord décrits
+        manifest_path = output_path.replace(".joblib", ".artifacts.json")
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(ARTIFACTS[name](), f, indent=2)
+        os.replace(manifest_path + ".tmp", manifest_path)
+    joblib.dump(result, output_path + ".tmp")
+    os.replace(output_path + ".tmp", output_path)
+    wall = time.perf_counter() - started
+    # ru_maxrss est en Ko sous Linux ; le processus ne sert qu'à cette étape
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return name, wall, peak_mb
+
+
+def run(target="all", force=False, workers=None):
+    """Exécute target et ses dépendances ; retourne le résultat de target."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    order = dependencies(target)
+    keys = stage_keys(order)
+    done = set()
+
+    for name in order:
+        upstream = STAGES[name][1]
+        # Une étape amont recalculée peut avoir réécrit des fichiers : l'aval est recalculé aussi
+        if force or not os.path.exists(cache_path(name, keys[name])) or not all(u in done for u in upstream):
+            continue
+        if not artifacts_current(name, keys[name]):
+            print(f"♻️ {name:<11} en cache, mais ses fichiers ou le registre ont changé : recalcul")
+            continue
+        print(f"⚡ {name:<11} en cache ({keys[name]})")
+        done.add(name)
+
+    # Un processus forké par étape (maxtasksperchild=1) : démarrage quasi immédiat
+    # (modules déjà importés) et pic mémoire mesuré propre à l'étape
+    context = multiprocessing.get_context("fork")
+    with context.Pool(processes=workers or os.cpu_count(), maxtasksperchild=1) as pool:
+        running = {}
+        while len(done) < len(order):
+            for name in order:
+                upstream = STAGES[name][1]
+                if name in done or name in running or not all(u in done for u in upstream):
+                    continue
+                print(f"▶️ {name:<11} démarrée")
+                inputs = [cache_path(u, keys[u]) for u in upstream]
+                running[name] = pool.apply_async(_execute, (name, inputs, cache_path(name, keys[name])))
+
+            finished = [name for name, result in running.items() if result.ready()]
+            if not finished:
+                time.sleep(0.05)
+            for name in finished:
+                _, wall, peak_mb = running.pop(name).get()
+                done.add(name)
+                print(f"⏱️ {name:<11} {wall:8.2f} s | pic mémoire {peak_mb:,.0f} Mo")
+
+    return joblib.load(cache_path(target, keys[target]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exécute le pipeline ETL sous forme de DAG avec cache.")
+    parser.add_argument("target", nargs="?", default="all", choices=list(STAGES))
+    parser.add_argument("--force", action="store_true", help="Ignorer le cache des étapes")
+    parser.add_argument("--workers", type=int, default=None, help="Étapes exécutées en parallèle")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    run(args.target, force=args.force, workers=args.workers)
+    print(f"\n🎉 Étape '{args.target}' terminée en {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
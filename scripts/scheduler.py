@@ -0,0 +1,122 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+# ======================
+#     BUDGET CPU ET ORDONNANCEMENT DES ENTRAÎNEMENTS
+# ======================
+# Une recherche d'hyperparamètres a deux niveaux de parallélisme : les
+# candidats/folds (niveau externe) et la construction des arbres d'une
+# forêt (niveau interne). Mettre n_jobs=-1 aux deux niveaux lance
+# cœurs × cœurs threads, auxquels s'ajoutent les pools BLAS/OpenMP de
+# NumPy. Ce module calcule un budget CPU réel (cgroup du pod compris), le
+# répartit entre les deux niveaux et borne les threads BLAS.
+
+BLAS_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+                 "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+
+def cgroup_cpu_limit():
+    """Limite CPU du cgroup (cgroup v2 cpu.max, sinon v1 cfs_quota_us), None si aucune."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()[:2]
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+            period = int(f.read())
+        if quota > 0 and period > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def cpu_budget(requested=None):
+    """
+    Nombre de cœurs utilisables : CPU_BUDGET (ou requested) s'il est donné,
+    sinon le minimum entre l'affinité du processus et la limite du cgroup.
+    """
+    requested = requested or os.getenv("CPU_BUDGET")
+    if requested:
+        return max(1, int(requested))
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        available = os.cpu_count() or 1
+    limit = cgroup_cpu_limit()
+    if limit is not None:
+        # Un quota de 1.5 CPU autorise 1 cœur plein ; au moins 1
+        available = min(available, max(1, int(limit)))
+    return available
+
+
+def split_budget(budget, n_tasks, outer=None):
+    """
+    Répartit budget cœurs entre n_tasks tâches externes et les threads
+    internes de chaque tâche ; retourne (outer_jobs, inner_jobs) avec
+    outer_jobs × inner_jobs <= budget.
+    """
+    if outer is None:
+        outer = min(max(1, n_tasks), budget)
+    outer = max(1, min(outer, budget))
+    return outer, max(1, budget // outer)
+
+
+@contextmanager
+def limit_blas_threads(n_threads=1):
+    """
+    Borne les pools BLAS/OpenMP pendant le bloc. Les variables d'environnement
+    sont héritées par les processus lancés ensuite (joblib/loky) ; threadpoolctl
+    ajuste les bibliothèques déjà chargées dans le processus courant.
+    """
+    previous = {name: os.environ.get(name) for name in BLAS_ENV_VARS}
+    os.environ.update({name: str(n_threads) for name in BLAS_ENV_VARS})
+    try:
+        try:
+            from threadpoolctl import threadpool_limits
+        except ImportError:
+            yield
+        else:
+            with threadpool_limits(limits=n_threads):
+                yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+class FitTimings:
+    """Journal des durées d'entraînement, écrit en JSON pour choisir la répartition sur mesures."""
+
+    def __init__(self, path, budget, **info):
+        self.path = path
+        self.run = {"budget": budget, **info, "started": time.strftime("%Y-%m-%dT%H:%M:%S"), "fits": []}
+
+    def record(self, params, seconds, n_samples, **extra):
+        self.run["fits"].append({"params": params, "seconds": round(seconds, 4),
+                                 "n_samples": n_samples, **extra})
+
+    def save(self, total_seconds):
+        """Ajoute ce run au fichier (un run par exécution, les précédents sont conservés)."""
+        self.run["total_seconds"] = round(total_seconds, 3)
+        self.run["fit_seconds"] = round(sum(fit["seconds"] for fit in self.run["fits"]), 3)
+        runs = []
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                runs = json.load(f)
+        runs.append(self.run)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(runs, f, indent=2)
+        os.replace(tmp_path, self.path)
+        return self.path
@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+from forest import FlatForest
+
+# ======================
+#     SCORING HORS LIGNE EN MASSE
+# ======================
+# Exemple :
+#   python score_batch.py ../data/housing_data.csv ../data/scores --workers 4
+#   python score_batch.py ../data/housing_data.csv ../data/explained --explain
+#
+# Le fichier d'entrée (CSV ou Parquet) est lu par morceaux ; chaque morceau
+# est prédit dans un pool de processus qui partagent la forêt compilée
+# mappée en mémoire, puis écrit dans son propre fichier part-XXXXX. Le
+# fichier _progress.json liste les morceaux terminés : relancer avec
+# --resume ne recalcule que les morceaux manquants. Il enregistre aussi
+# l'exécution (fichier d'entrée, taille de morceau, format, --explain,
+# modèle) : une reprise avec d'autres paramètres est refusée, pour ne pas
+# mélanger dans un même répertoire des morceaux qui ne correspondent pas.
+#
+# --explain ajoute à chaque ligne la base (prix moyen du train) et une
+# colonne contribution_<feature> par feature (voir FlatForest.explain), avec
+# base + somme des contributions = prix_estime.
+
+FEATURES = ["surface", "chambres", "age_bien", "quartier_score", "distance_centre"]
+DEFAULT_MODEL = os.path.join(os.path.dirname(__file__), "..", "api", "model", "housing_model.forest")
+
+_forest = None
+
+
+def _init_worker(model_path):
+    """Chaque processus mappe la forêt une seule fois (pages partagées)."""
+    global _forest
+    _forest = FlatForest.load(model_path, mmap_mode="r")
+
+
+def _score_chunk(chunk_id, X, explain=False):
+    """
+    Prédit un morceau ; les lignes avec des features manquantes donnent NaN.
+    Avec explain, retourne aussi (base, contributions) pour chaque ligne.
+    """
+    prix = np.full(len(X), np.nan)
+    valid = ~np.isnan(X).any(axis=1)
+    if not explain:
+        if valid.any():
+            prix[valid] = _forest.predict(X[valid])
+        return chunk_id, prix, None
+
+    base = np.full(len(X), np.nan)
+    contributions = np.full(X.shape, np.nan)
+    if valid.any():
+        prix[valid], base[valid], contributions[valid] = _forest.explain(X[valid])
+    return chunk_id, prix, (base, contributions)
+
+
+def iter_chunks(path, chunksize):
+    """Produit (chunk_id, DataFrame) : morceaux CSV ou row groups Parquet."""
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+        parquet_file = pq.ParquetFile(path)
+        for i in range(parquet_file.num_row_groups):
+            df = parquet_file.read_row_group(i).to_pandas()
+            df.columns = df.columns.str.lower().str.strip()
+            yield i, df[FEATURES]
+    else:
+        reader = pd.read_csv(path, chunksize=chunksize, low_memory=False)
+        for i, df in enumerate(reader):
+            df.columns = df.columns.str.lower().str.strip()
+            yield i, df[FEATURES]
+
+
+def output_format(requested):
+    if requested != "auto":
+        return requested
+    try:
+        import pyarrow  # noqa: F401
+        return "parquet"
+    except ImportError:
+        return "csv"
+
+
+def write_part(output_dir, chunk_id, df, prix, fmt, explanation=None):
+    """Écrit un morceau scoré de façon atomique (fichier temporaire puis renommage)."""
+    out = df.reset_index(drop=True).astype(np.float64)
+    out["prix_estime"] = prix
+    if explanation is not None:
+        base, contributions = explanation
+        out["base"] = base
+        for j, feature in enumerate(FEATURES):
+            out[f"contribution_{feature}"] = contributions[:, j]
+    path = os.path.join(output_dir, f"part-{chunk_id:05d}.{fmt}")
+    tmp_path = path + ".tmp"
+    if fmt == "parquet":
+        out.to_parquet(tmp_path, index=False)
+    else:
+        out.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def _file_stamp(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def run_signature(input_path, chunksize, fmt, explain, model_path):
+    """Ce qui détermine le découpage et le contenu des morceaux : doit être identique pour reprendre."""
+    model_files = sorted(os.listdir(model_path))
+    return {
+        "input": {"path": os.path.abspath(input_path), **_file_stamp(input_path)},
+        "chunksize": chunksize,
+        "format": fmt,
+        "explain": explain,
+        "model": {"path": os.path.abspath(model_path),
+                  "files": {name: _file_stamp(os.path.join(model_path, name)) for name in model_files}}
+    }
+
+
+def load_progress(path, run):
+    """Morceaux terminés d'une exécution précédente, refusée si ses paramètres diffèrent de run."""
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        progress = json.load(f)
+    previous = progress.get("run", {})
+    changed = sorted(key for key in run if previous.get(key) != run[key])
+    if changed:
+        raise SystemExit(f"❌ Reprise impossible : {', '.join(changed)} différent(s) de l'exécution enregistrée "
+                         f"dans {path}. Relancer sans --resume, ou avec les mêmes paramètres.")
+    return set(progress["done"])
+
+
+def save_progress(path, done, run):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"run": run, "done": sorted(done)}, f)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scoring en masse d'un fichier CSV/Parquet.")
+    parser.add_argument("input", help="Fichier CSV ou Parquet avec les 5 features")
+    parser.add_argument("output_dir", help="Répertoire des fichiers part-XXXXX")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="Forêt compilée (répertoire .forest)")
+    parser.add_argument("--chunksize", type=int, default=100_000, help="Lignes par morceau CSV")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--format", choices=["auto", "parquet", "csv"], default="auto")
+    parser.add_argument("--resume", action="store_true", help="Reprendre après le dernier morceau terminé")
+    parser.add_argument("--explain", action="store_true",
+                        help="Ajouter la base et la contribution de chaque feature au prix estimé")
+    args = parser.parse_args()
+
+    if args.explain and FlatForest.load(args.model).contributions is None:
+        raise SystemExit(f"❌ {args.model} n'a pas de contributions précalculées : réentraîner avec etl_pipeline.py")
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    progress_path = os.path.join(args.output_dir, "_progress.json")
+    fmt = output_format(args.format)
+    run = run_signature(args.input, args.chunksize, fmt, args.explain, args.model)
+    done = load_progress(progress_path, run) if args.resume else set()
+
+    print(f"📦 Scoring de {args.input} avec {args.workers} processus (sortie {fmt})...")
+    if done:
+        print(f"⏩ Reprise : {len(done)} morceaux déjà terminés")
+
+    started = time.perf_counter()
+    n_rows = 0
+    pending = {}
+    max_pending = 2 * args.workers
+
+    def collect(futures):
+        nonlocal n_rows
+        for future in futures:
+            chunk_id, prix, explanation = future.result()
+            df = pending.pop(chunk_id)
+            write_part(args.output_dir, chunk_id, df, prix, fmt, explanation)
+            done.add(chunk_id)
+            save_progress(progress_path, done, run)
+            n_rows += len(df)
+            elapsed = time.perf_counter() - started
+            print(f"   ✅ Morceau {chunk_id} : {len(df):,} lignes ({n_rows / elapsed:,.0f} lignes/s)")
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.model,)) as pool:
+        futures = set()
+        for chunk_id, df in iter_chunks(args.input, args.chunksize):
+            if chunk_id in done:
+                continue
+            # Nombre de morceaux en vol borné : la mémoire ne dépend pas de la taille du fichier
+            if len(futures) >= max_pending:
+                finished, futures = wait(futures, return_when=FIRST_COMPLETED)
+                collect(finished)
+            pending[chunk_id] = df
+            futures.add(pool.submit(_score_chunk, chunk_id, df.to_numpy(dtype=np.float64), args.explain))
+        collect(wait(futures).done)
+
+    elapsed = time.perf_counter() - started
+    print(f"\n🎉 {n_rows:,} lignes scorées en {elapsed:.1f} s ({n_rows / max(elapsed, 1e-9):,.0f} lignes/s)")
+    print(f"💾 Résultats dans : {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,455 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# ======================
+#     BENCHMARK DE L'API : CHARGE EN BOUCLE OUVERTE + MICROBENCHMARKS
+# ======================
+# Exemples :
+#   python tests/benchmark.py micro                      # validation, cache, modèle
+#   python tests/benchmark.py load --rate 200 --duration 20
+#   python tests/benchmark.py load --url http://127.0.0.1:8080 --mix predict=80,batch=15,stream=5
+#   python tests/benchmark.py all                        # les deux, résultats JSON par commit
+#   python tests/benchmark.py compare data/benchmarks/abc1234.json data/benchmarks/def5678.json
+#
+# Charge : les requêtes partent à un débit fixe (--rate par seconde, ou
+# arrivées de Poisson avec --poisson), qu'il y ait ou non des réponses en
+# attente. La latence est mesurée depuis l'instant prévu d'envoi : un
+# serveur saturé voit ses percentiles grimper au lieu de ralentir le client.
+# Les biens envoyés sont tirés de data/housing_data.csv.
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+API_DIR = os.path.join(ROOT_DIR, "api")
+DATA_PATH = os.path.join(ROOT_DIR, "data", "housing_data.csv")
+RESULTS_DIR = os.path.join(ROOT_DIR, "data", "benchmarks")
+
+# Bornes de validation sans importer l'API (ni charger le modèle) : locust
+# tire ses biens d'ici dans chaque processus
+sys.path.insert(0, API_DIR)
+from schema import FEATURES, in_bounds  # noqa: E402
+
+BATCH_SIZES = [1, 8, 32, 128, 1024, 8192]
+
+
+# ---------- Jeu de requêtes ----------
+
+def load_request_mix(n, invalid_ratio=0.05, seed=0, data_path=DATA_PATH):
+    """
+    Tire n biens de housing_data.csv : une part invalid_ratio hors des
+    bornes de l'API (réponses 400), le reste valide. Les tirages avec remise
+    reproduisent les biens demandés plusieurs fois (hits de cache).
+    """
+    df = pd.read_csv(data_path, usecols=FEATURES).dropna()
+    accepted = in_bounds(df[FEATURES].to_numpy())
+
+    rng = np.random.default_rng(seed)
+    valid, invalid = df[accepted], df[~accepted]
+    n_invalid = int(round(n * invalid_ratio)) if len(invalid) else 0
+    n_valid = n - n_invalid if len(valid) else 0
+    rows = pd.concat([
+        valid.iloc[rng.integers(0, len(valid), n_valid)] if n_valid else valid.iloc[:0],
+        invalid.iloc[rng.integers(0, len(invalid), n_invalid)] if n_invalid else invalid.iloc[:0],
+    ])
+    rows = rows.iloc[rng.permutation(len(rows))]
+    return [
+        {"surface": float(r.surface), "chambres": int(r.chambres), "age_bien": float(r.age_bien),
+         "quartier_score": float(r.quartier_score), "distance_centre": float(r.distance_centre)}
+        for r in rows.itertuples(index=False)
+    ]
+
+
+ENDPOINTS = ("predict", "batch", "stream")
+# Réponses correctes : 200, ou 400 pour les biens hors bornes ; tout le reste est une erreur
+EXPECTED_STATUSES = (200, 400)
+
+
+def build_requests(items, mix, batch_size, stream_size, seed=0):
+    """Liste de (endpoint, chemin, corps, content-type) selon les poids de mix."""
+    unknown = set(mix) - set(ENDPOINTS)
+    if unknown:
+        raise ValueError(f"Endpoints inconnus dans --mix : {sorted(unknown)} (disponibles : {list(ENDPOINTS)})")
+    rng = random.Random(seed)
+    endpoints = list(mix)
+    weights = [mix[e] for e in endpoints]
+    requests, cursor = [], 0
+
+    def take(k):
+        nonlocal cursor
+        chunk = [items[(cursor + j) % len(items)] for j in range(k)]
+        cursor += k
+        return chunk
+
+    for _ in range(len(items)):
+        endpoint = rng.choices(endpoints, weights)[0]
+        if endpoint == "predict":
+            requests.append((endpoint, "/predict", json.dumps(take(1)[0]), "application/json"))
+        elif endpoint == "batch":
+            requests.append((endpoint, "/predict/batch?echo=false", json.dumps(take(batch_size)), "application/json"))
+        else:
+            body = "\n".join(json.dumps(item) for item in take(stream_size)) + "\n"
+            requests.append((endpoint, "/predict/stream", body, "application/x-ndjson"))
+    return requests
+
+
+# ---------- Charge en boucle ouverte ----------
+
+def summarize(latencies_ms, errors, elapsed):
+    latencies = np.asarray(latencies_ms)
+    if not len(latencies):
+        return {"requests": 0, "errors": errors}
+    return {
+        "requests": int(len(latencies)),
+        "errors": int(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "max_ms": round(float(latencies.max()), 2),
+    }
+
+
+def run_open_loop(host, port, requests, rate, duration, poisson=False, concurrency=256, seed=0):
+    """
+    Envoie les requêtes à débit fixe pendant duration secondes. Chaque
+    thread du pool garde sa connexion keep-alive. Retourne les statistiques
+    globales et par endpoint.
+    """
+    local = threading.local()
+    results = []
+    lock = threading.Lock()
+
+    def send(request, scheduled):
+        endpoint, path, body, content_type = request
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = http.client.HTTPConnection(host, port, timeout=30)
+        try:
+            conn.request("POST", path, body=body, headers={"Content-Type": content_type})
+            response = conn.getresponse()
+            response.read()
+            # 400 attendu pour les biens hors bornes ; un 404 (endpoint non servi) est une erreur
+            failed = response.status not in EXPECTED_STATUSES
+        except (OSError, http.client.HTTPException):
+            local.conn = None
+            failed = True
+        latency = (time.perf_counter() - scheduled) * 1000
+        with lock:
+            results.append((endpoint, latency, failed))
+
+    rng = np.random.default_rng(seed)
+    n = int(rate * duration)
+    gaps = rng.exponential(1 / rate, n) if poisson else np.full(n, 1 / rate)
+    schedule = np.cumsum(gaps) - gaps[0]
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for i, offset in enumerate(schedule):
+            scheduled = started + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, requests[i % len(requests)], scheduled)
+    elapsed = time.perf_counter() - started
+
+    report = {"target_rps": rate, "duration_s": round(elapsed, 2), "poisson": poisson}
+    report["all"] = summarize([r[1] for r in results], sum(r[2] for r in results), elapsed)
+    for endpoint in sorted({r[0] for r in results}):
+        subset = [r for r in results if r[0] == endpoint]
+        report[endpoint] = summarize([r[1] for r in subset], sum(r[2] for r in subset), elapsed)
+    return report
+
+
+def check_endpoints(host, port, requests):
+    """
+    Envoie une requête de chaque endpoint du mix avant la mesure : un
+    endpoint que le serveur ne sert pas arrête le benchmark au lieu de
+    fausser débit et latences avec des réponses 404 très rapides.
+    """
+    first = {}
+    for request in requests:
+        first.setdefault(request[0], request)
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    try:
+        for endpoint, path, body, content_type in first.values():
+            conn.request("POST", path, body=body, headers={"Content-Type": content_type})
+            response = conn.getresponse()
+            response.read()
+            if response.status not in EXPECTED_STATUSES:
+                raise RuntimeError(f"❌ {path} non servi (HTTP {response.status}) : retirez '{endpoint}' de --mix")
+    finally:
+        conn.close()
+
+
+def start_server(name, port, workers):
+    """Démarre un serveur de scripts/benchmark_servers.py et attend /health."""
+    sys.path.insert(0, os.path.join(ROOT_DIR, "scripts"))
+    from benchmark_servers import SERVERS, wait_until_ready
+
+    process = subprocess.Popen(SERVERS[name](port, workers), cwd=API_DIR,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(port)
+    except Exception:
+        process.terminate()
+        raise
+    return process
+
+
+def bench_load(args):
+    mix = {k: float(v) for k, v in (part.split("=") for part in args.mix.split(","))}
+    items = load_request_mix(args.items, args.invalid_ratio, args.seed)
+    requests = build_requests(items, mix, args.batch_size, args.stream_size, args.seed)
+
+    process = None
+    if args.url:
+        host, _, port = args.url.split("://")[-1].rstrip("/").partition(":")
+        port = int(port or 80)
+    else:
+        host, port = "127.0.0.1", args.port
+        print(f"🚀 {args.server} sur le port {port}...")
+        process = start_server(args.server, port, args.workers)
+
+    try:
+        check_endpoints(host, port, requests)
+        # Échauffement hors mesure
+        run_open_loop(host, port, requests, min(args.rate, 50), 1, seed=args.seed)
+        print(f"📈 Charge : {args.rate} req/s pendant {args.duration} s ({args.mix})...")
+        report = run_open_loop(host, port, requests, args.rate, args.duration, args.poisson,
+                               args.concurrency, args.seed)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    report.update({"server": args.url or args.server, "mix": mix, "batch_size": args.batch_size,
+                   "stream_size": args.stream_size})
+    for endpoint, stats in report.items():
+        if isinstance(stats, dict) and "p50_ms" in stats:
+            print(f"   {endpoint:<8} {stats['throughput_rps']:>8} req/s | p50 {stats['p50_ms']:>7} ms | "
+                  f"p95 {stats['p95_ms']:>7} ms | p99 {stats['p99_ms']:>7} ms | erreurs {stats['errors']}")
+    return report
+
+
+# ---------- Microbenchmarks ----------
+
+def time_per_call(func, min_time=0.2, repeat=5):
+    """Durée médiane d'un appel en µs : boucles calibrées pour durer au moins min_time secondes."""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - started >= min_time / repeat:
+            break
+        number *= 2
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - started) / number)
+    return round(float(np.median(samples)) * 1e6, 3)
+
+
+def import_app():
+    """Importe l'API avec des chemins absolus et sans surveillance du registre."""
+    model_dir = os.path.join(API_DIR, "model")
+    os.environ.setdefault("MODEL_PATH", os.path.join(model_dir, "housing_model.pkl"))
+    os.environ.setdefault("FOREST_PATH", os.path.join(model_dir, "housing_model.forest"))
+    os.environ.setdefault("COMPARABLES_PATH", os.path.join(model_dir, "housing_model.comparables"))
+    os.environ.setdefault("REFERENCE_PATH", os.path.join(model_dir, "housing_model.reference.json"))
+    os.environ.setdefault("MODEL_REGISTRY", os.path.join(model_dir, "registry"))
+    os.environ.setdefault("REGISTRY_POLL_SECONDS", "0")
+    import app
+    return app
+
+
+def bench_micro(args):
+    core = import_app()
+    if core.served is None:
+        raise RuntimeError("Aucun modèle chargé : lancer d'abord scripts/etl_pipeline.py")
+
+    items = load_request_mix(max(BATCH_SIZES), invalid_ratio=0.0, seed=args.seed)
+    payload = items[0]
+    row = core.parse_input(payload)[0]
+    model = core.served.model
+    report = {"model": type(model).__name__, "model_version": core.served.version}
+
+    print("🔬 Microbenchmarks (µs par appel, médiane)...")
+    report["validate_input_us"] = time_per_call(lambda: core.validate_input(payload))
+    report["parse_input_us"] = time_per_call(lambda: core.parse_input(payload))
+
+    # Hit : même bien en boucle ; miss : cache vidé avant chaque appel
+    core.predict_cached(*row)
+    report["predict_cached_hit_us"] = time_per_call(lambda: core.predict_cached(*row))
+
+    def cached_miss():
+        core.prediction_cache.clear()
+        core.predict_cached(*row)
+    report["predict_cached_miss_us"] = time_per_call(cached_miss)
+
+    X = pd.DataFrame(items)[FEATURES].to_numpy(dtype=np.float64)
+    quantiles = core.parse_interval("true")[0]
+    report["model_predict"] = {}
+    report["validate_batch"] = {}
+    for size in BATCH_SIZES:
+        batch = X[:size]
+        per_call = time_per_call(lambda: model.predict(batch))
+        report["model_predict"][str(size)] = {"us_per_call": per_call,
+                                              "rows_per_s": round(size / per_call * 1e6)}
+        # Intervalle (dispersion entre arbres) : surcoût par rapport à model.predict
+        interval = time_per_call(lambda: core.predict_interval(model, batch, quantiles))
+        report.setdefault("predict_interval", {})[str(size)] = {"us_per_call": interval,
+                                                                "overhead": round(interval / per_call, 2)}
+        if getattr(model, "contributions", None) is not None:
+            explain = time_per_call(lambda: model.explain(batch))
+            report.setdefault("model_explain", {})[str(size)] = {"us_per_call": explain,
+                                                                 "overhead": round(explain / per_call, 2)}
+        report["validate_batch"][str(size)] = {"us_per_call": time_per_call(lambda: core.validate_batch(items[:size]))}
+        if core.served.comparables is not None:
+            per_call = time_per_call(lambda: core.served.comparables.query(batch, core.Config.COMPARABLES_K))
+            report.setdefault("comparables_query", {})[str(size)] = {"us_per_call": per_call,
+                                                                     "rows_per_s": round(size / per_call * 1e6)}
+
+    # Référence sklearn (n_jobs=1) pour la forêt compilée : un gros lot plus
+    # lent que RandomForestRegressor.predict est une régression du parcours
+    pickle_path = (os.path.join(core.registry.path(core.served.version), core.ModelRegistry.PICKLE)
+                   if core.served.source == "registry" else core.Config.MODEL_PATH)
+    if isinstance(model, core.FlatForest) and os.path.exists(pickle_path):
+        import joblib
+        reference = joblib.load(pickle_path).set_params(n_jobs=1)
+        report["sklearn_predict"] = {}
+        for size in BATCH_SIZES:
+            batch = pd.DataFrame(X[:size], columns=FEATURES)
+            per_call = time_per_call(lambda: reference.predict(batch))
+            report["sklearn_predict"][str(size)] = {
+                "us_per_call": per_call,
+                "flat_forest_ratio": round(report["model_predict"][str(size)]["us_per_call"] / per_call, 2)
+            }
+
+    response = core.predict_many(items[:32], echo_input=True)[0]
+    report["dumps_json_batch32_us"] = time_per_call(lambda: core.dumps_json(response))
+
+    for name, value in report.items():
+        if isinstance(value, dict):
+            for size, stats in value.items():
+                print(f"   {name}[{size}] : {stats}")
+        else:
+            print(f"   {name} : {value}")
+    return report
+
+
+# ---------- Résultats par commit ----------
+
+def git_commit():
+    try:
+        sha = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+        dirty = bool(subprocess.check_output(["git", "status", "--porcelain", "--untracked-files=no"],
+                                             cwd=ROOT_DIR, text=True).strip())
+        return sha, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+
+
+def save_results(results, output=None):
+    sha, dirty = git_commit()
+    results = {
+        "commit": sha,
+        "dirty": dirty,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        **results
+    }
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"{sha}{'-dirty' if dirty else ''}.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"💾 Résultats enregistrés dans : {output}")
+    return output
+
+
+def flatten(results, prefix=""):
+    """{"micro": {"x_us": 1}} -> {"micro.x_us": 1}, valeurs numériques seulement."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old_path, new_path, threshold=0.10):
+    """Affiche les écarts entre deux fichiers de résultats ; retourne le nombre de régressions."""
+    with open(old_path) as f:
+        old = flatten(json.load(f))
+    with open(new_path) as f:
+        new = flatten(json.load(f))
+
+    regressions = 0
+    for name in sorted(set(old) & set(new)):
+        if old[name] == 0 or name.endswith(("cpu_count", "requests", "target_rps", "duration_s", "size")):
+            continue
+        change = (new[name] - old[name]) / abs(old[name])
+        # Débits : plus haut = mieux ; latences et durées : plus bas = mieux
+        higher_is_better = name.endswith(("rows_per_s", "throughput_rps"))
+        worse = change < -threshold if higher_is_better else change > threshold
+        regressions += worse
+        flag = "🔴" if worse else ("🟢" if abs(change) > threshold else "  ")
+        print(f"{flag} {name:<55} {old[name]:>12} → {new[name]:>12} ({change:+.1%})")
+    print(f"\n{'⚠️' if regressions else '✅'} {regressions} régression(s) au-delà de {threshold:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de l'API : charge en boucle ouverte et microbenchmarks.")
+    parser.add_argument("command", choices=["micro", "load", "all", "compare"])
+    parser.add_argument("files", nargs="*", help="compare : ancien.json nouveau.json")
+    parser.add_argument("--url", default="", help="API déjà démarrée (sinon --server est lancé localement)")
+    parser.add_argument("--server", default="flask-gunicorn", choices=["flask-gunicorn", "asgi-uvicorn"])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--port", type=int, default=8095)
+    parser.add_argument("--rate", type=float, default=100, help="Requêtes par seconde (débit d'arrivée)")
+    parser.add_argument("--duration", type=float, default=10, help="Durée de la charge en secondes")
+    parser.add_argument("--poisson", action="store_true", help="Arrivées de Poisson plutôt que régulières")
+    parser.add_argument("--concurrency", type=int, default=256, help="Connexions simultanées max")
+    parser.add_argument("--mix", default="predict=80,batch=15,stream=5", help="Poids des endpoints")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--stream-size", type=int, default=1000)
+    parser.add_argument("--items", type=int, default=5000, help="Biens distincts tirés du CSV")
+    parser.add_argument("--invalid-ratio", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threshold", type=float, default=0.10, help="compare : écart signalé comme régression")
+    parser.add_argument("--output", default=None, help="Fichier JSON (défaut : data/benchmarks/<commit>.json)")
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        if len(args.files) != 2:
+            parser.error("compare attend deux fichiers de résultats")
+        sys.exit(1 if compare(*args.files, threshold=args.threshold) else 0)
+
+    results = {}
+    if args.command in ("micro", "all"):
+        results["micro"] = bench_micro(args)
+    if args.command in ("load", "all"):
+        results["load"] = bench_load(args)
+    save_results(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+
+from locust import HttpUser, constant_throughput, task
+
+sys.path.insert(0, os.path.dirname(__file__))
+from benchmark import load_request_mix
+
+# ======================
+#     SCÉNARIOS LOCUST
+# ======================
+# Exemple :
+#   locust -f tests/locustfile.py --host http://127.0.0.1:8080 --headless -u 50 -r 10 -t 1m
+#
+# Chaque utilisateur envoie LOCUST_RPS requêtes par seconde (débit constant,
+# indépendant du temps de réponse tant que le serveur suit) ; les poids des
+# tâches reproduisent le mix par défaut de tests/benchmark.py load : 80 %
+# /predict, 15 % /predict/batch, 5 % /predict/stream. Les biens sont tirés de
+# data/housing_data.csv, dont 5 % hors bornes (réponses 400 attendues).
+
+RPS_PER_USER = float(os.getenv("LOCUST_RPS", "1"))
+BATCH_SIZE = int(os.getenv("LOCUST_BATCH_SIZE", "32"))
+STREAM_SIZE = int(os.getenv("LOCUST_STREAM_SIZE", "1000"))
+
+ITEMS = load_request_mix(10_000, seed=int(os.getenv("LOCUST_SEED", "0")))
+
+
+class HousingUser(HttpUser):
+    wait_time = constant_throughput(RPS_PER_USER)
+
+    def on_start(self):
+        self.cursor = hash(id(self)) % len(ITEMS)
+
+    def take(self, k):
+        chunk = [ITEMS[(self.cursor + j) % len(ITEMS)] for j in range(k)]
+        self.cursor += k
+        return chunk
+
+    def post(self, path, body, content_type, name):
+        with self.client.post(path, data=body, headers={"Content-Type": content_type},
+                              name=name, catch_response=True) as response:
+            # Un bien hors bornes doit être refusé : 400 est une réponse correcte
+            if response.status_code in (200, 400):
+                response.success()
+
+    @task(80)
+    def predict(self):
+        self.post("/predict", json.dumps(self.take(1)[0]), "application/json", "/predict")
+
+    @task(15)
+    def predict_batch(self):
+        self.post("/predict/batch?echo=false", json.dumps(self.take(BATCH_SIZE)),
+                  "application/json", "/predict/batch")
+
+    @task(5)
+    def predict_stream(self):
+        body = "\n".join(json.dumps(item) for item in self.take(STREAM_SIZE)) + "\n"
+        self.post("/predict/stream", body, "application/x-ndjson", "/predict/stream")
+
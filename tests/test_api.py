@@ -0,0 +1,207 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(__file__))
+from benchmark import import_app, load_request_mix
+
+# ======================
+#     TEST DE L'API (client de test Flask, sans serveur)
+# ======================
+# Vérifie le contrat des endpoints sur des biens tirés de housing_data.csv.
+# Nécessite un modèle entraîné (scripts/etl_pipeline.py).
+
+core = import_app()
+client = core.app.test_client()
+
+
+def require_model():
+    if core.served is None:
+        raise FileNotFoundError("❌ Aucun modèle chargé.\n"
+                                "➡️  Assurez-vous d’avoir exécuté etl_pipeline.py avant ce test.")
+
+
+def test_health():
+    require_model()
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "healthy"
+
+
+def test_predict():
+    require_model()
+    item = load_request_mix(1, invalid_ratio=0)[0]
+    response = client.post("/predict", json=item)
+    assert response.status_code == 200
+    assert response.get_json()["prix_estime"] > 0
+
+    invalid = {**item, "surface": -1}
+    assert client.post("/predict", json=invalid).status_code == 400
+    # JSON valide mais pas un objet : 400, pas une erreur interne
+    for body in (5, "texte", [item]):
+        response = client.post("/predict", json=body)
+        assert response.status_code == 400 and "error" in response.get_json()
+
+
+def test_predict_non_finite():
+    require_model()
+    item = load_request_mix(1, invalid_ratio=0)[0]
+    # 1e400, Infinity et NaN passent le parseur JSON : 400, pas une erreur interne
+    for field, literal in (("chambres", "1e400"), ("chambres", "Infinity"), ("surface", "1e400"), ("age_bien", "NaN")):
+        body = json.dumps({**item, field: 0}).replace(f'"{field}": 0', f'"{field}": {literal}')
+        response = client.post("/predict", data=body, content_type="application/json")
+        assert response.status_code == 400
+        assert response.get_json()["error"] == "Types de données invalides"
+
+
+def test_predict_batch():
+    require_model()
+    items = load_request_mix(32, invalid_ratio=0)
+    response = client.post("/predict/batch?echo=false", json=items)
+    assert response.status_code == 200
+    payload = response.get_json()
+    assert len(payload["predictions"]) == len(items)
+
+    # La prédiction d'un lot est identique à celle de chaque bien
+    single = client.post("/predict", json=items[0]).get_json()["prix_estime"]
+    assert abs(payload["predictions"][0]["prix_estime"] - single) < 1
+
+    # Une ligne qui déborde (1e400) n'invalide qu'elle-même
+    body = json.dumps([items[0], {**items[1], "chambres": 0}, items[2]]).replace('"chambres": 0', '"chambres": 1e400')
+    response = client.post("/predict/batch?echo=false", data=body, content_type="application/json")
+    assert response.status_code == 200
+    predictions = response.get_json()["predictions"]
+    assert predictions[1]["error"] == "Types de données invalides"
+    assert "prix_estime" in predictions[0] and "prix_estime" in predictions[2]
+
+
+def test_predict_interval():
+    require_model()
+    items = load_request_mix(16, invalid_ratio=0)
+    response = client.post("/predict/batch?echo=false&interval=0.1,0.5,0.9", json=items)
+    assert response.status_code == 200
+    for prediction in response.get_json()["predictions"]:
+        quantiles = prediction["intervalle"]["quantiles"]
+        assert quantiles["0.1"] <= quantiles["0.5"] <= quantiles["0.9"]
+
+    # Même estimation avec ou sans intervalle
+    single = client.post("/predict?interval=true", json=items[0]).get_json()
+    assert single["prix_estime"] == client.post("/predict", json=items[0]).get_json()["prix_estime"]
+    assert client.post("/predict?interval=2", json=items[0]).status_code == 400
+
+
+def test_predict_stream():
+    require_model()
+    items = load_request_mix(100, invalid_ratio=0)
+    body = "\n".join(json.dumps(item) for item in items) + "\n"
+    response = client.post("/predict/stream", data=body, content_type="application/x-ndjson")
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines() if line]
+    assert len(lines) == len(items)
+
+
+def test_explain():
+    require_model()
+    if getattr(core.served.model, "contributions", None) is None:
+        pytest.skip("Pas de contributions précalculées dans le modèle en service")
+    items = load_request_mix(8, invalid_ratio=0)
+    response = client.post("/explain", json=items)
+    assert response.status_code == 200
+    for item, explanation in zip(items, response.get_json()["results"]):
+        # Décomposition additive : base + contributions = prix estimé (à l'arrondi près)
+        total = explanation["base"] + sum(explanation["contributions"].values())
+        assert abs(total - explanation["prix_estime"]) < 1
+        assert explanation["prix_estime"] == client.post("/predict", json=item).get_json()["prix_estime"]
+
+
+def test_comparables():
+    require_model()
+    if core.served.comparables is None:
+        pytest.skip("Pas d'index des comparables pour le modèle en service")
+    items = load_request_mix(8, invalid_ratio=0)
+    response = client.post("/comparables?k=3", json=items[0])
+    assert response.status_code == 200
+    neighbours = response.get_json()["comparables"]
+    assert len(neighbours) == 3
+    assert [n["distance"] for n in neighbours] == sorted(n["distance"] for n in neighbours)
+
+    # Lot : une ligne invalide ne fait pas échouer les autres
+    response = client.post("/comparables?k=3", json=items + [{"surface": -1}])
+    payload = response.get_json()
+    assert payload["count"] == len(items) + 1 and payload["errors"] == 1
+    assert payload["results"][0]["comparables"] == neighbours
+
+
+def test_drift_metrics():
+    require_model()
+    if core.served.drift is None:
+        pytest.skip("Pas d'esquisses de référence pour le modèle en service")
+    items = load_request_mix(core.Config.DRIFT_MIN_ROWS, invalid_ratio=0)
+    assert client.post("/predict/batch?echo=false", json=items).status_code == 200
+    text = client.get("/metrics").get_data(as_text=True)
+    for name in core.FEATURES + ["prix_estime"]:
+        assert f'housing_drift_psi{{feature="{name}"' in text
+        assert f'housing_drift_ks{{feature="{name}"' in text
+
+
+def asgi_call(method, path, body=b"", parts=1):
+    """Appelle le serveur ASGI en mémoire ; le corps est envoyé en parts messages."""
+    import asgi
+
+    size = max(1, len(body) // parts + 1)
+    chunks = [body[i:i + size] for i in range(0, len(body), size)] or [b""]
+    messages = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+                for i, chunk in enumerate(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "method": method, "path": path, "query_string": b""}
+    asyncio.run(asgi.application(scope, receive, send))
+    return sent[0]["status"], b"".join(message.get("body", b"") for message in sent[1:])
+
+
+def test_asgi_routes():
+    require_model()
+    items = load_request_mix(300, invalid_ratio=0.05)
+    body = ("\n".join(json.dumps(item) for item in items) + "\n").encode()
+    status, streamed = asgi_call("POST", "/predict/stream", body, parts=7)
+    assert status == 200
+    # Lignes coupées entre deux messages : mêmes résultats que le serveur Flask
+    flask = client.post("/predict/stream", data=body, content_type="application/x-ndjson").get_data()
+    assert streamed == flask
+
+    status, text = asgi_call("GET", "/metrics")
+    assert status == 200 and b"housing_requests_total" in text
+    assert asgi_call("GET", "/")[0] == 200
+
+
+def test_model_info_and_metrics():
+    require_model()
+    assert client.get("/model/info").status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert b"requests" in response.get_data()
+
+
+def main():
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            try:
+                func()
+            except pytest.skip.Exception as skipped:
+                print(f"⏭️ {name} : {skipped}")
+                continue
+            print(f"✅ {name}")
+    print("\n🎉 Tous les tests de l'API sont passés")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+from batching import MicroBatcher
+
+# ======================
+#     TEST DU MICRO-BATCHING
+# ======================
+
+
+class ScaledModel:
+    """Modèle factice : première feature × facteur, avec le nombre d'appels à predict."""
+
+    def __init__(self, factor):
+        self.factor = factor
+        self.calls = 0
+
+    def predict(self, X):
+        self.calls += 1
+        return X[:, 0] * self.factor
+
+
+def test_rows_are_predicted_by_their_own_model():
+    # Lot mélangeant deux versions (bascule en cours) : chaque ligne garde son modèle
+    old, new = ScaledModel(1), ScaledModel(100)
+    batcher = MicroBatcher(lambda model, X: model.predict(X), max_batch_size=32, max_wait_ms=50)
+    futures = [batcher.submit((i, 0), old if i % 2 == 0 else new) for i in range(10)]
+    assert [future.result(5) for future in futures] == [i * (1 if i % 2 == 0 else 100) for i in range(10)]
+    assert old.calls + new.calls <= 4
+
+
+def test_errors_are_returned_to_each_caller():
+    class Broken:
+        def predict(self, X):
+            raise ValueError("modèle cassé")
+
+    batcher = MicroBatcher(lambda model, X: model.predict(X))
+    future = batcher.submit((1, 0), Broken())
+    assert isinstance(future.exception(5), ValueError)
+    assert batcher.predict(np.array([2.0, 0.0]), ScaledModel(3), timeout=5) == 6.0
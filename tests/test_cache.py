@@ -0,0 +1,108 @@
+import os
+import sys
+import types
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+import cache
+from cache import PredictionCache
+
+# ======================
+#     TEST DU CACHE DE PRÉDICTIONS (L1 + L2)
+# ======================
+# Le L2 est un faux client Redis en mémoire : PredictionCache n'utilise que
+# get(key) et set(key, value, ex=ttl).
+
+ROW_A, ROW_B, ROW_C = (75, 3, 10, 8, 5.5), (45, 1, 5, 6, 3.5), (150, 4, 20, 9, 1.2)
+
+
+class FakeRedis:
+    """Stand-in de redis.Redis : dictionnaire de bytes, erreurs simulées avec fail=True."""
+
+    def __init__(self):
+        self.data = {}
+        self.fail = False
+
+    def get(self, key):
+        if self.fail:
+            raise ConnectionError("Redis indisponible")
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        if self.fail:
+            raise ConnectionError("Redis indisponible")
+        self.data[key] = value.encode()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge monotone contrôlée par le test."""
+    now = [1000.0]
+    monkeypatch.setattr(cache, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_l1_ttl_expiry(clock):
+    c = PredictionCache(maxsize=10, ttl=5)
+    c.set(ROW_A, 100.0)
+    clock[0] += 4.9
+    assert c.get(ROW_A) == 100.0
+    clock[0] += 0.2
+    assert c.get(ROW_A) is None
+    assert c.stats["l1_hits"] == 1 and c.stats["misses"] == 1
+
+
+@pytest.mark.parametrize("eviction, survivor", [("lru", ROW_A), ("fifo", ROW_B)])
+def test_eviction_policy(eviction, survivor):
+    c = PredictionCache(maxsize=2, eviction=eviction)
+    c.set(ROW_A, 1.0)
+    c.set(ROW_B, 2.0)
+    # Lire A : en LRU il devient le plus récent, en FIFO l'ordre d'insertion ne change pas
+    assert c.get(ROW_A) == 1.0
+    c.set(ROW_C, 3.0)
+    evicted = ROW_B if survivor == ROW_A else ROW_A
+    assert c.get(survivor) is not None and c.get(evicted) is None
+    assert c.stats["evictions"] == 1
+
+
+def test_unknown_eviction_policy():
+    with pytest.raises(ValueError):
+        PredictionCache(eviction="random")
+
+
+def test_l2_fill_through():
+    redis = FakeRedis()
+    writer = PredictionCache(redis_client=redis)
+    writer.set(ROW_A, 123.5)
+    writer.set(ROW_B, (1.0, 2.5, -3.0))
+
+    # Un autre worker (L1 vide) lit la valeur du L2, puis la garde dans son L1
+    reader = PredictionCache(redis_client=redis)
+    assert reader.get(ROW_A) == 123.5
+    assert reader.get(ROW_B) == (1.0, 2.5, -3.0)
+    redis.data.clear()
+    assert reader.get(ROW_A) == 123.5
+    assert reader.stats["l2_hits"] == 2 and reader.stats["l1_hits"] == 1
+
+
+def test_l2_errors_are_counted_and_ignored():
+    redis = FakeRedis()
+    c = PredictionCache(redis_client=redis)
+    redis.fail = True
+    c.set(ROW_A, 10.0)
+    assert c.get(ROW_A) == 10.0          # servi par le L1
+    assert c.get(ROW_B) is None          # miss, pas d'exception
+    assert c.stats["l2_errors"] == 2 and c.stats["misses"] == 1
+
+
+def test_set_version_makes_old_keys_unreachable():
+    redis = FakeRedis()
+    c = PredictionCache(redis_client=redis, version="v1")
+    c.set(ROW_A, 10.0)
+    c.set_version("v2")
+    assert c.info()["l1_size"] == 0
+    # Ni le L1 ni le L2 ne servent la valeur de l'ancienne version...
+    assert c.get(ROW_A) is None
+    # ...qui reste lisible avec une version explicite (requête commencée avant la bascule)
+    assert c.get(ROW_A, version="v1") == 10.0
@@ -0,0 +1,59 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+from drift import DRIFT_COUNTER, DriftMonitor, build_reference, ks, psi
+from metrics import Metrics
+from schema import FEATURES, in_bounds
+
+# ======================
+#     TEST DU SUIVI DE DÉRIVE
+# ======================
+
+
+def make_reference(rng, n=5000):
+    columns = {name: rng.uniform(0, 10, n) for name in FEATURES}
+    columns["prix"] = rng.normal(2e5, 5e4, n)
+    columns["prix_estime"] = rng.normal(2e5, 3e4, n)
+    return build_reference(columns)
+
+
+def test_scores_on_identical_and_shifted_histograms():
+    counts = [10, 20, 30, 40]
+    assert psi(counts, counts) == 0 and ks(counts, counts) == 0
+    assert psi(counts, counts[::-1]) > 0.25 and ks(counts, counts[::-1]) > 0.2
+
+
+def test_monitor_ignores_columns_the_api_never_sees():
+    rng = np.random.default_rng(0)
+    monitor = DriftMonitor(make_reference(rng), FEATURES, "v1", Metrics())
+    # Le prix réel n'est jamais reçu par l'API : pas de jauge bloquée à 0
+    assert set(monitor.reference) == set(FEATURES) | {"prix_estime"}
+
+
+def test_batch_and_row_updates_agree():
+    rng = np.random.default_rng(1)
+    reference = make_reference(rng)
+    X = rng.uniform(0, 10, (300, len(FEATURES)))
+    prix = rng.normal(2e5, 3e4, len(X))
+
+    by_batch, by_row = Metrics(), Metrics()
+    DriftMonitor(reference, FEATURES, "v1", by_batch).observe_batch(X, prix)
+    monitor = DriftMonitor(reference, FEATURES, "v1", by_row)
+    for row, value in zip(X.tolist(), prix.tolist()):
+        monitor.observe_row(row, value)
+
+    counters = by_batch.collect()["counters"]
+    assert counters == by_row.collect()["counters"]
+    gauges = monitor.gauges(counters, min_rows=100)
+    psi_series = dict(gauges["housing_drift_psi"][0])
+    # Même distribution que la référence : pas de dérive
+    assert all(score < 0.1 for score in psi_series.values())
+    assert all(key[0] == DRIFT_COUNTER for key in counters)
+
+
+def test_in_bounds_mask():
+    X = np.array([[75, 3, 10, 8, 5.5], [5000, 3, 10, 8, 5.5], [75, 3, 10, 8, -1]])
+    assert in_bounds(X).tolist() == [True, False, False]
@@ -0,0 +1,40 @@
+import json
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+from etl_pipeline import load_clean_store, update_clean_store
+
+# ======================
+#     TEST DU STOCKAGE NETTOYÉ INCRÉMENTAL
+# ======================
+
+
+def write_partition(raw_dir, name, surface):
+    pd.DataFrame({
+        "surface": [surface, surface + 10], "chambres": [2, 3], "age_bien": [10, 20],
+        "quartier_score": [5, 6], "distance_centre": [3, 4], "prix": [150000, 180000],
+    }).to_csv(raw_dir / f"{name}.csv", index=False)
+
+
+def test_missing_parquet_in_manifest(tmp_path):
+    raw_dir, clean_dir = tmp_path / "raw", tmp_path / "clean"
+    raw_dir.mkdir()
+    write_partition(raw_dir, "2026-01", 100)
+    write_partition(raw_dir, "2026-02", 200)
+    assert sorted(update_clean_store(str(raw_dir), str(clean_dir))) == ["2026-01", "2026-02"]
+
+    # Parquet d'une partition encore présente supprimé à la main : reconstruit
+    (clean_dir / "2026-01.parquet").unlink()
+    assert update_clean_store(str(raw_dir), str(clean_dir)) == ["2026-01"]
+    assert (clean_dir / "2026-01.parquet").exists()
+
+    # Partition brute retirée et Parquet déjà absent (exécution interrompue) : pas d'erreur
+    (raw_dir / "2026-02.csv").unlink()
+    (clean_dir / "2026-02.parquet").unlink()
+    assert update_clean_store(str(raw_dir), str(clean_dir)) == ["2026-02"]
+    with open(clean_dir / "_manifest.json") as f:
+        assert list(json.load(f)) == ["2026-01"]
+    assert len(load_clean_store(str(clean_dir))) == 2
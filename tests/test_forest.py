@@ -0,0 +1,129 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+from forest import FlatForest
+
+# ======================
+#     TEST DE LA FORÊT COMPILÉE
+# ======================
+# Petite forêt entraînée sur des données synthétiques à 5 features : la
+# prédiction de FlatForest doit être identique bit à bit à celle de sklearn.
+
+
+@pytest.fixture(scope="module")
+def model():
+    from sklearn.ensemble import RandomForestRegressor
+
+    rng = np.random.default_rng(0)
+    X = rng.uniform(0, 10, (600, 5))
+    y = X @ [3.0, 1.0, 2.0, 0.5, -1.0] + rng.normal(0, 1, len(X))
+    return RandomForestRegressor(n_estimators=12, max_depth=8, random_state=0, n_jobs=1).fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def X_test(model):
+    rng = np.random.default_rng(1)
+    X = rng.uniform(-1, 11, (400, 5))
+    # Valeurs exactement sur des seuils de split : le cas limite x <= seuil
+    tree = model.estimators_[0].tree_
+    internal = np.flatnonzero(tree.children_left != -1)[:50]
+    X[internal % len(X), tree.feature[internal]] = tree.threshold[internal]
+    return X
+
+
+def test_predict_is_bit_identical_to_sklearn(model, X_test):
+    forest = FlatForest.from_sklearn(model)
+    assert forest.children.dtype == np.int32
+    assert np.array_equal(forest.predict(X_test), model.predict(X_test))
+    # Une ligne seule (chemin /predict)
+    assert forest.predict(X_test[:1])[0] == model.predict(X_test[:1])[0]
+
+
+def test_apply_by_blocks_of_trees(model, X_test):
+    # Gros lot parcouru par blocs d'arbres (ici 2 arbres par bloc, puis 1) : mêmes feuilles que sklearn
+    forest = FlatForest.from_sklearn(model)
+    expected = model.apply(X_test).T + forest.roots[:, None]
+    for block_size in (len(X_test) * 2, 1):
+        assert np.array_equal(forest.apply(X_test, block_size=block_size), expected)
+    assert forest.apply(X_test[:0]).shape == (forest.n_trees, 0)
+
+
+def test_int64_indices(model, X_test):
+    # Forêts de plus de 2^30 nœuds : indices int64, même parcours
+    forest = FlatForest.from_sklearn(model)
+    wide = FlatForest(forest.feature, forest.threshold, forest.children.astype(np.int64), forest.value,
+                      forest.roots.astype(np.int64), forest.max_depth, forest.n_features)
+    assert np.array_equal(wide.predict(X_test), model.predict(X_test))
+
+
+def test_float32_values_are_close(model, X_test):
+    forest = FlatForest.from_sklearn(model, value_dtype=np.float32)
+    np.testing.assert_allclose(forest.predict(X_test), model.predict(X_test), rtol=1e-6)
+
+
+def test_save_load_mmap_round_trip(model, X_test, tmp_path):
+    forest = FlatForest.from_sklearn(model, with_contributions=True)
+    forest.save(str(tmp_path / "model.forest"))
+    loaded = FlatForest.load(str(tmp_path / "model.forest"))
+    assert isinstance(loaded.value, np.memmap)
+    assert loaded.max_depth == forest.max_depth and loaded.n_trees == forest.n_trees
+    assert np.array_equal(loaded.predict(X_test), model.predict(X_test))
+    assert np.array_equal(loaded.contributions, forest.contributions)
+
+
+def test_explain_is_additive(model, X_test):
+    forest = FlatForest.from_sklearn(model, with_contributions=True)
+    prediction, base, contributions = forest.explain(X_test)
+    assert np.array_equal(prediction, model.predict(X_test))
+    np.testing.assert_allclose(base + contributions.sum(axis=1), prediction, rtol=1e-5)
+
+
+# ======================
+#     QUANTIFICATION EXACTE DES FEATURES
+# ======================
+
+def test_quantizer_keys_give_identical_predictions(model, X_test):
+    from forest import FeatureQuantizer
+
+    forest = FlatForest.from_sklearn(model)
+    quantizer = FeatureQuantizer.from_model(forest)
+    assert FeatureQuantizer.from_model(model).thresholds == quantizer.thresholds
+
+    # Petites perturbations : beaucoup de lignes restent dans le même intervalle
+    rng = np.random.default_rng(2)
+    jittered = X_test + rng.normal(0, 0.01, X_test.shape)
+    shared = 0
+    for a, b, pred_a, pred_b in zip(X_test, jittered, forest.predict(X_test), forest.predict(jittered)):
+        if quantizer.transform(a) == quantizer.transform(b):
+            shared += 1
+            assert pred_a == pred_b
+    assert shared > len(X_test) // 4
+
+
+def test_quantizer_threshold_boundaries(model):
+    from forest import FeatureQuantizer
+
+    quantizer = FeatureQuantizer.from_model(model)
+    # Un seuil isolé : aucun autre seuil entre les float32 voisins testés
+    thresholds = quantizer.thresholds[0]
+    threshold = next(t for low, t, high in zip(thresholds, thresholds[1:], thresholds[2:])
+                     if t - low > 1e-3 and high - t > 1e-3)
+    base = [5.0] * 5
+
+    # Les features sont comparées en float32 : last_left est le plus grand float32 <= seuil (à gauche),
+    # le float32 suivant part à droite, dans l'intervalle supérieur
+    last_left = np.float32(threshold)
+    if last_left > threshold:
+        last_left = np.nextafter(last_left, np.float32(-np.inf))
+    at = quantizer.transform([last_left] + base[1:])
+    below = quantizer.transform([np.nextafter(last_left, np.float32(-np.inf))] + base[1:])
+    above = quantizer.transform([np.nextafter(last_left, np.float32(np.inf))] + base[1:])
+    assert at == below and at[0] + 1 == above[0]
+
+    forest = FlatForest.from_sklearn(model)
+    rows = np.array([[last_left] + base[1:], [np.nextafter(last_left, np.float32(np.inf))] + base[1:]])
+    assert forest.apply(rows[:1]).tolist() != forest.apply(rows[1:]).tolist()
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+import etl_pipeline
+import optimize_model
+from registry import ModelRegistry
+
+# ======================
+#     TEST DE BOUT EN BOUT DE L'OPTIMISATION
+# ======================
+
+
+def test_optimize_on_data_with_missing_values(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    n = 300
+    df = pd.DataFrame({
+        "surface": rng.uniform(20, 1000, n),
+        "chambres": rng.integers(1, 8, n).astype(float),
+        "age_bien": rng.uniform(0, 100, n),
+        "quartier_score": rng.uniform(1, 10, n),
+        "distance_centre": rng.uniform(0, 30, n),
+    })
+    df["prix"] = df["surface"] * 2000 + df["quartier_score"] * 10000
+    # Valeurs manquantes comme dans data/housing_data.csv, plus une cible manquante
+    df.loc[::25, "surface"] = np.nan
+    df.loc[3, "prix"] = np.nan
+    data_path = tmp_path / "housing_data.csv"
+    df.to_csv(data_path, index=False)
+
+    registry_dir = tmp_path / "registry"
+    monkeypatch.setattr(etl_pipeline, "REGISTRY_DIR", str(registry_dir))
+    model_dir = tmp_path / "model"
+    optimize_model.main(cpus=1, data_path=str(data_path), model_dir=str(model_dir),
+                        checkpoint_path=str(tmp_path / "checkpoint.joblib"),
+                        timings_path=str(tmp_path / "timings.json"))
+
+    for suffix in (".pkl", ".forest", ".comparables", ".reference.json"):
+        assert (model_dir / f"housing_model_optimized{suffix}").exists()
+    # Le modèle optimisé est publié comme version active
+    registry = ModelRegistry(str(registry_dir))
+    assert registry.current() is not None
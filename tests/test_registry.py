@@ -0,0 +1,99 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "api"))
+import registry as registry_module
+from registry import ModelRegistry, RegistryWatcher
+
+# ======================
+#     TEST DU REGISTRE DE MODÈLES
+# ======================
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    """Une seconde de plus à chaque publication : versions ordonnées comme les publications."""
+    state = {"now": datetime(2026, 1, 1)}
+
+    class FakeDatetime:
+        @staticmethod
+        def utcnow():
+            state["now"] += timedelta(seconds=1)
+            return state["now"]
+
+    monkeypatch.setattr(registry_module, "datetime", FakeDatetime)
+
+
+def make_model(tmp_path, content):
+    """Fichiers d'un entraînement factice : pickle, forêt (répertoire) et esquisses de référence."""
+    model_path = tmp_path / f"{content}.pkl"
+    model_path.write_bytes(content.encode())
+    forest_path = tmp_path / f"{content}.forest"
+    forest_path.mkdir()
+    (forest_path / "value.npy").write_bytes(b"0")
+    reference_path = tmp_path / f"{content}.reference.json"
+    reference_path.write_text("{}")
+    return str(model_path), str(forest_path), str(reference_path)
+
+
+def test_publish_and_activate(tmp_path):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    assert registry.current() is None and registry.versions() == []
+
+    model_path, forest_path, reference_path = make_model(tmp_path, "a")
+    version = registry.publish(model_path, forest_path, metadata={"script": "test"}, reference_path=reference_path)
+    assert registry.current() == version
+    files = set(os.listdir(registry.path(version)))
+    assert {ModelRegistry.PICKLE, ModelRegistry.FOREST, ModelRegistry.REFERENCE, ModelRegistry.METADATA} <= files
+    metadata = registry.metadata(version)
+    assert metadata["script"] == "test" and version.endswith(metadata["sha256"][:8])
+
+    # Publication sans activation, puis retour arrière
+    other = registry.publish(make_model(tmp_path, "b")[0], activate=False)
+    assert registry.current() == version and registry.versions() == [version, other]
+    registry.activate(other)
+    assert registry.current() == other
+    with pytest.raises(KeyError):
+        registry.activate("inconnue")
+
+
+def test_prune_keeps_recent_versions_and_current(tmp_path):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    versions = [registry.publish(make_model(tmp_path, name)[0], keep=0) for name in "abcd"]
+    assert registry.versions() == versions
+
+    registry.prune(keep=2)
+    assert registry.versions() == versions[2:]
+
+    # Version active plus ancienne (retour arrière) : jamais supprimée
+    registry.activate(versions[2])
+    registry.publish(make_model(tmp_path, "e")[0], activate=False, keep=1)
+    assert registry.versions() == [versions[2], registry.versions()[-1]]
+
+
+def test_watcher_swaps_and_survives_load_failures(tmp_path):
+    registry = ModelRegistry(str(tmp_path / "registry"))
+    good = registry.publish(make_model(tmp_path, "a")[0])
+    loaded, failures = [], []
+
+    def on_change(version):
+        if version == broken:
+            failures.append(version)
+            raise ValueError("modèle illisible")
+        loaded.append(version)
+
+    broken = None
+    watcher = RegistryWatcher(registry, on_change, interval=60)
+    assert watcher.check() and loaded == [good]
+    assert not watcher.check()
+
+    broken = registry.publish(make_model(tmp_path, "b")[0])
+    assert not watcher.check() and failures == [broken]
+    # Pas de nouvelle tentative tant que CURRENT ne change pas
+    assert not watcher.check() and failures == [broken]
+
+    registry.activate(good)
+    assert watcher.check() and loaded == [good, good]